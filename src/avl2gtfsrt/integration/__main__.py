@@ -1,8 +1,6 @@
 import click
 import logging
 
-from avl2gtfsrt.integration.instancemanager import InstanceManager
-
 
 @click.group()
 def cli():
@@ -14,13 +12,101 @@ def run():
     # set logging default configuration
     logging.basicConfig(format="[%(levelname)s] %(asctime)s %(message)s", level=logging.INFO)
 
-    # startup instances regarding the config YAML file
+    from avl2gtfsrt.integration.config import Configuration
+    from avl2gtfsrt.integration.instancemanager import InstanceManager
+    from avl2gtfsrt.integration.supervisor import Supervisor
+
+    # startup instances regarding the config YAML file,
+    # either in this process or sharded over worker processes
     try:
-        mgr: InstanceManager = InstanceManager('config.yaml')
+        logging.info('Loading configuration file ...')
+        config: dict = Configuration.load('config.yaml')
+
+        if config['workers']['count'] != 0:
+            mgr: Supervisor = Supervisor('config.yaml', config)
+        else:
+            mgr: InstanceManager = InstanceManager('config.yaml', config)
+        
         mgr.run()
     except Exception as ex:
         logging.exception(ex)
 
+@cli.command()
+@click.option('--vehicles', default=100, help='Number of simulated vehicles.')
+@click.option('--interval', default=1, help='Polling interval in seconds.')
+@click.option('--update-interval', default=1, help='Interval in seconds between two positions of a vehicle.')
+@click.option('--provider-latency', default=0.0, help='Response latency of the simulated provider API in seconds.')
+@click.option('--response-latency', default=0.0, help='Response latency of the simulated log-on/log-off responses in seconds.')
+@click.option('--duration', default=10.0, help='Duration of the benchmark in seconds.')
+@click.option('--runtime', default='threading', type=click.Choice(['threading', 'asyncio']), help='Runtime of the instance.')
+@click.option('--chunk-size', default=100, help='Max. number of vehicles per position request.')
+@click.option('--columnar', is_flag=True, default=False, help='Keep the last positions in a columnar table.')
+@click.option('--incremental', is_flag=True, default=False, help='Request only positions newer than the last known ones.')
+@click.option('--memory/--no-memory', default=True, help='Measure memory per vehicle in a separate run.')
+@click.option('--min-throughput', type=float, default=None, help='Min. throughput in positions/s, fails the benchmark if below.')
+@click.option('--max-latency-p95', type=float, default=None, help='Max. p95 publish latency in ms, fails the benchmark if above.')
+@click.option('--max-memory-per-vehicle', type=float, default=None, help='Max. memory per vehicle in KiB, fails the benchmark if above.')
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False), default=None, help='Result of an earlier run saved with --save, fails the benchmark if worse by more than the tolerance.')
+@click.option('--tolerance', default=0.2, help='Relative tolerance to the baseline, e.g. 0.2 for 20%.')
+@click.option('--save', type=click.Path(dir_okay=False), default=None, help='Save the result as JSON file for use as baseline.')
+def benchmark(vehicles, interval, update_interval, provider_latency, response_latency, duration, runtime, chunk_size, columnar, incremental, memory, min_throughput, max_latency_p95, max_memory_per_vehicle, baseline, tolerance, save):
+
+    # set logging default configuration, only problems are of interest here
+    logging.basicConfig(format="[%(levelname)s] %(asctime)s %(message)s", level=logging.WARNING)
+
+    import json
+
+    from dataclasses import asdict
+
+    from avl2gtfsrt.integration.benchmark.runner import Benchmark, BenchmarkResult, BenchmarkThresholds
+
+    if max_memory_per_vehicle is not None and not memory:
+        raise click.UsageError('--max-memory-per-vehicle requires the memory to be measured.')
+
+    # thresholds are derived from the baseline, explicit thresholds take precedence
+    if baseline is not None:
+        with open(baseline, 'r') as baseline_file:
+            thresholds: BenchmarkThresholds = BenchmarkThresholds.from_baseline(BenchmarkResult(**json.load(baseline_file)), tolerance)
+    else:
+        thresholds: BenchmarkThresholds = BenchmarkThresholds()
+
+    if min_throughput is not None:
+        thresholds.min_throughput = min_throughput
+
+    if max_latency_p95 is not None:
+        thresholds.max_latency_p95 = max_latency_p95 / 1000
+
+    if max_memory_per_vehicle is not None:
+        thresholds.max_memory_per_vehicle = max_memory_per_vehicle * 1024
+
+    # run one instance end-to-end against simulated provider API, broker and avl2gtfsrt
+    bm: Benchmark = Benchmark(vehicles, interval, update_interval, provider_latency, response_latency, duration, runtime, chunk_size, columnar, incremental)
+    result: BenchmarkResult = bm.run(memory)
+
+    click.echo(f"Vehicles:              {result.vehicles}")
+    click.echo(f"Duration:              {result.duration:.2f}s")
+    click.echo(f"Published positions:   {result.published}")
+    click.echo(f"Throughput:            {result.throughput:.1f} positions/s")
+    click.echo(f"Publish latency:       p50 {result.latency_p50 * 1000:.1f}ms, p95 {result.latency_p95 * 1000:.1f}ms, p99 {result.latency_p99 * 1000:.1f}ms, max {result.latency_max * 1000:.1f}ms")
+    click.echo(f"Poll cycles:           {result.poll_cycles}, mean {result.poll_cycle_mean * 1000:.1f}ms, p95 {result.poll_cycle_p95 * 1000:.1f}ms")
+    click.echo(f"Log-on requests:       {result.log_on_requests}")
+    click.echo(f"Provider requests:     {result.provider_requests}, {result.provider_bytes / 1024:.1f}KiB")
+
+    if result.memory_total is not None:
+        click.echo(f"Memory:                {result.memory_total / 1024:.1f}KiB, {result.memory_per_vehicle / 1024:.2f}KiB per vehicle")
+
+    if save is not None:
+        with open(save, 'w') as save_file:
+            json.dump(asdict(result), save_file, indent=2)
+
+    # regressions fail the benchmark, e.g. in a CI pipeline
+    violations: list[str] = thresholds.check(result)
+    for violation in violations:
+        click.echo(f"Regression: {violation}", err=True)
+
+    if len(violations) > 0:
+        raise SystemExit(1)
+
 
 if __name__ == '__main__':
     cli()
\ No newline at end of file
@@ -0,0 +1,88 @@
+import asyncio
+
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor
+from datetime import datetime
+from typing import Callable
+
+from avl2gtfsrt.integration.adapter.baseadapter import BaseAdapter
+from avl2gtfsrt.integration.model.types import VehiclePosition, Vehicle
+
+
+class AsyncBaseAdapter(ABC):
+
+    def __init__(self, instance_id: str, config: dict) -> None:
+        self.instance_id: str = instance_id
+        self.endpoint: str = config['endpoint']
+        self.interval: int = config['interval']
+        self.autologoff: int = config['autologoff']
+
+        self._username: str|None = config['username']
+        self._password: str|None = config['password']
+        self._login_expiration: datetime|None = None
+
+        # called by adapters receiving data on their own, e.g. pushed by the provider
+        self._notify: Callable[[], None]|None = None
+
+    def set_notify(self, notify: Callable[[], None]|None) -> None:
+        self._notify = notify
+
+    def _get_url(self, resource: str) -> str:
+        return f"{self.endpoint}/{resource}"
+    
+    async def close(self) -> None:
+        pass
+
+    def get_state(self) -> dict:
+        return dict()
+    
+    def set_state(self, state: dict, vehicles: list[Vehicle]) -> None:
+        pass
+    
+    @abstractmethod
+    async def init(self) -> bool:
+        pass
+
+    @abstractmethod
+    async def get_vehicles(self) -> list[Vehicle]:
+        pass
+
+    @abstractmethod
+    async def get_vehicle_positions(self) -> list[VehiclePosition]:
+        pass
+
+
+class AsyncExecutorAdapter(AsyncBaseAdapter):
+
+    def __init__(self, instance_id: str, config: dict, adapter: BaseAdapter, executor: Executor|None = None) -> None:
+        super().__init__(instance_id, config)
+
+        # blocking adapter calls are run in the executor,
+        # the default executor of the event loop is used if none is set
+        self._adapter: BaseAdapter = adapter
+        self._executor: Executor|None = executor
+
+    def set_notify(self, notify: Callable[[], None]|None) -> None:
+        self._adapter.set_notify(notify)
+
+    async def init(self) -> bool:
+        return await self._run_in_executor(self._adapter.init)
+
+    async def get_vehicles(self) -> list[Vehicle]:
+        return await self._run_in_executor(self._adapter.get_vehicles)
+
+    async def get_vehicle_positions(self) -> list[VehiclePosition]:
+        return await self._run_in_executor(self._adapter.get_vehicle_positions)
+
+    async def close(self) -> None:
+        await self._run_in_executor(self._adapter.close)
+
+    def get_state(self) -> dict:
+        return self._adapter.get_state()
+    
+    def set_state(self, state: dict, vehicles: list[Vehicle]) -> None:
+        self._adapter.set_state(state, vehicles)
+    
+    async def _run_in_executor(self, func):
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func)
@@ -1,6 +1,15 @@
+import logging
+import time
+
 from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
+from requests import Response, Session
+from requests.adapters import HTTPAdapter
+from typing import Callable
+from urllib3.util.retry import Retry
 
+from avl2gtfsrt.integration.metrics import HTTP_REQUEST_DURATION, HTTP_REQUEST_ERRORS
 from avl2gtfsrt.integration.model.types import VehiclePosition, Vehicle
 
 
@@ -16,9 +25,121 @@ class BaseAdapter(ABC):
         self._password: str|None = config['password']
         self._login_expiration: datetime|None = None
 
+        # pooled HTTP session, connections are kept alive between polls
+        self._http_config: dict = config['http']
+        self._session: Session = self._create_session(config['http'])
+        self._timeout: tuple[float, float] = (config['http']['connect_timeout'], config['http']['read_timeout'])
+
+        # large ID lists are fetched in chunks on a bounded worker pool
+        self._chunk_size: int = config['chunk_size']
+        self._workers: int = config['workers']
+        self._executor: ThreadPoolExecutor|None = None
+
+        # called by adapters receiving data on their own, e.g. pushed by the provider
+        self._notify: Callable[[], None]|None = None
+
+    def set_notify(self, notify: Callable[[], None]|None) -> None:
+        self._notify = notify
+
     def _get_url(self, resource: str) -> str:
         return f"{self.endpoint}/{resource}"
     
+    def _create_session(self, config: dict) -> Session:
+        session: Session = Session()
+
+        # only idempotent methods are retried, a retried POST may repeat its side effect, e.g. a login
+        http_adapter: HTTPAdapter = self._create_http_adapter(config, Retry.DEFAULT_ALLOWED_METHODS)
+
+        session.mount('http://', http_adapter)
+        session.mount('https://', http_adapter)
+
+        if not config['keepalive']:
+            session.headers['Connection'] = 'close'
+
+        if not config['gzip']:
+            session.headers['Accept-Encoding'] = 'identity'
+
+        return session
+    
+    def _create_http_adapter(self, config: dict, allowed_methods: frozenset[str]) -> HTTPAdapter:
+        # retry failed connections and temporary server errors with exponential backoff,
+        # responses are returned as they are after the last retry
+        retry: Retry = Retry(
+            total=config['retries'],
+            backoff_factor=config['backoff'],
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=allowed_methods,
+            raise_on_status=False
+        )
+
+        return HTTPAdapter(
+            pool_connections=config['pool_size'],
+            pool_maxsize=config['pool_size'],
+            max_retries=retry
+        )
+    
+    def _allow_post_retries(self, resource: str) -> None:
+        # POST requests to resources which only read data, e.g. queries with a request body,
+        # are safe to retry and opted in here by adapters
+        http_adapter: HTTPAdapter = self._create_http_adapter(self._http_config, Retry.DEFAULT_ALLOWED_METHODS | {'POST'})
+        self._session.mount(self._get_url(resource), http_adapter)
+    
+    def _request(self, method: str, resource: str, **arguments) -> Response:
+        start: float = time.monotonic()
+        try:
+            response: Response = self._session.request(method, self._get_url(resource), timeout=self._timeout, **arguments)
+        except Exception:
+            HTTP_REQUEST_ERRORS.labels(self.instance_id, resource).inc()
+            raise
+        finally:
+            HTTP_REQUEST_DURATION.labels(self.instance_id, resource).observe(time.monotonic() - start)
+
+        if response.status_code >= 400:
+            HTTP_REQUEST_ERRORS.labels(self.instance_id, resource).inc()
+
+        return response
+    
+    def _fetch_chunked(self, ids: list[any], fetch: Callable[[list[any]], list[any]]) -> list[any]:
+        chunks: list[list[any]] = [ids[i:i + self._chunk_size] for i in range(0, len(ids), self._chunk_size)]
+        if len(chunks) <= 1:
+            return fetch(ids)
+        
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix=f"{self.instance_id}-{self.__class__.__name__}")
+
+        futures: list[Future] = [self._executor.submit(fetch, chunk) for chunk in chunks]
+
+        # merge results in order of the chunks,
+        # failed chunks are skipped unless all chunks failed
+        results: list[any] = list()
+        errors: list[Exception] = list()
+        for future in futures:
+            try:
+                results.extend(future.result())
+            except Exception as ex:
+                logging.error(f"{self.instance_id}/{self.__class__.__name__}: Failed to fetch chunk: {ex}")
+                errors.append(ex)
+
+        if len(errors) == len(chunks):
+            raise errors[-1]
+
+        return results
+    
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+        self._session.close()
+
+    def get_state(self) -> dict:
+        # adapters return their JSON serializable state here for warm restarts
+        return dict()
+    
+    def set_state(self, state: dict, vehicles: list[Vehicle]) -> None:
+        # restored vehicles are passed in order to keep the same objects as the instance
+        pass
+    
     @abstractmethod
     def init(self) -> bool:
         pass
@@ -29,4 +150,4 @@ class BaseAdapter(ABC):
 
     @abstractmethod
     def get_vehicle_positions(self) -> list[VehiclePosition]:
-        pass
\ No newline at end of file
+        pass
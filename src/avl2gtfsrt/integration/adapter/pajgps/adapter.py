@@ -1,10 +1,10 @@
 import logging
-import requests
 
 from datetime import datetime, timedelta
 from requests import Response
 
 from avl2gtfsrt.integration.adapter.baseadapter import BaseAdapter
+from avl2gtfsrt.integration.model.registry import VehicleRegistry
 from avl2gtfsrt.integration.model.types import VehiclePosition, Vehicle
 
 class PajGpsAdapter(BaseAdapter):
@@ -14,15 +14,24 @@ class PajGpsAdapter(BaseAdapter):
 
         self._login_token: str|None = None
 
-        self._vehicles: list[Vehicle] = list()
+        self._vehicles: VehicleRegistry = VehicleRegistry()
         self._vehicle_expiration: datetime|None = None
 
+        # in incremental mode, only positions newer than 
+        # the last known position per device are returned
+        self._incremental: bool = config['incremental']
+        self._high_water_marks: dict[int, int] = dict()
+
+        # querying the last positions is a POST, but only reads data, the login is never retried
+        self._allow_post_retries('trackerdata/getalllastpositions')
+
     def init(self) -> bool:
         if self._login_expiration is None or self._login_expiration <= datetime.now():
             logging.info(f"{self.instance_id}/{self.__class__.__name__}: Login inactive or expired. Performing login with configured credentials ...")
 
-            login_response: Response = requests.post(
-                self._get_url('login'), 
+            login_response: Response = self._request(
+                'POST',
+                'login', 
                 params={
                     'email': self._username,
                     'password': self._password
@@ -39,6 +48,8 @@ class PajGpsAdapter(BaseAdapter):
             self._login_expiration = datetime.now() + timedelta(
                 seconds=int(login_data['success']['expires_in'])
             )
+
+        return True
     
     def get_vehicles(self) -> list[Vehicle]:
         self.init()
@@ -46,8 +57,9 @@ class PajGpsAdapter(BaseAdapter):
         if self._vehicle_expiration is None or self._vehicle_expiration <= datetime.now():
             logging.info(f"{self.instance_id}/{self.__class__.__name__}: Vehicle cache expired. Discovering actual vehicles ...")
             
-            devices_response: Response = requests.get(
-                self._get_url('device'),
+            devices_response: Response = self._request(
+                'GET',
+                'device',
                 headers={
                     'Authorization': f"Bearer {self._login_token}"
                 }
@@ -57,14 +69,15 @@ class PajGpsAdapter(BaseAdapter):
 
             # extract data and store vehicles ...
             devices_data: dict = devices_response.json()
-            for device in devices_data['success']:
-                vehicle: Vehicle = Vehicle(
-                    id=device['id'],
+            _, removed_vehicles = self._vehicles.sync(
+                Vehicle(
+                    id=int(device['id']),
                     vehicle_ref=device['name']
-                )
+                ) for device in devices_data['success']
+            )
 
-                if vehicle not in self._vehicles:
-                    self._vehicles.append(vehicle)
+            for vehicle in removed_vehicles:
+                self._high_water_marks.pop(vehicle.id, None)
 
             self._vehicle_expiration = datetime.now() + timedelta(
                 minutes=30
@@ -73,31 +86,30 @@ class PajGpsAdapter(BaseAdapter):
             logging.info(f"{self.instance_id}/{self.__class__.__name__}: Vehicles already loaded within the last 30 minutes. Returning cached vehicles ...")
 
         # return internal loaded vehicle data
-        return self._vehicles
+        return list(self._vehicles)
     
     def get_vehicle_positions(self) -> list[VehiclePosition]:
         self.init()
 
-        all_last_positions_response: Response = requests.post(
-            self._get_url('trackerdata/getalllastpositions'),
-            headers={
-                'Authorization': f"Bearer {self._login_token}"
-            },
-            json={
-                'deviceIDs': [int(v.id) for v in self._vehicles],
-                'fromLastPoint': False
-            }
-        )
-
-        all_last_positions_response.raise_for_status()
+        # device IDs are requested in chunks running in parallel,
+        # in incremental mode ordered by their high-water marks, so each chunk gets a tight lower bound
+        device_ids: list[int] = self._vehicles.ids()
+        if self._incremental:
+            device_ids.sort(key=lambda device_id: self._high_water_marks.get(device_id, 0))
 
-        # extract data and return positions per vehicle
-        all_last_positions_data: dict = all_last_positions_response.json()
+        all_last_positions_data: list[dict] = self._fetch_chunked(device_ids, self._get_all_last_positions)
 
+        # extract data and return positions per vehicle in order of their timestamps
         positions: list[VehiclePosition] = list()
-        for position_data in all_last_positions_data['success']:
-            vehicle: Vehicle|None = next((v for v in self._vehicles if int(v.id) == position_data['iddevice']), None)
+        for position_data in sorted(all_last_positions_data, key=lambda d: d['dateunix']):
+            vehicle: Vehicle|None = self._vehicles.get(int(position_data['iddevice']))
             if vehicle is not None:
+                if self._incremental:
+                    if position_data['dateunix'] <= self._high_water_marks.get(vehicle.id, 0):
+                        continue
+
+                    self._high_water_marks[vehicle.id] = position_data['dateunix']
+
                 position: VehiclePosition = VehiclePosition(
                     vehicle=vehicle,
                     latitude=position_data['lat'],
@@ -107,6 +119,48 @@ class PajGpsAdapter(BaseAdapter):
 
                 positions.append(position)
 
-        logging.info(f"{self.instance_id}/{self.__class__.__name__}: Loaded {len(positions)} positions for vehicles {[int(v.id) for v in self._vehicles]}.")
+        logging.info(f"{self.instance_id}/{self.__class__.__name__}: Loaded {len(positions)} positions of {len(self._vehicles)} vehicles.")
         
-        return positions
\ No newline at end of file
+        return positions
+    
+    def _get_all_last_positions(self, device_ids: list[int]) -> list[dict]:
+        request_data: dict = {
+            'deviceIDs': device_ids,
+            'fromLastPoint': self._incremental
+        }
+
+        # in incremental mode, only points newer than the lowest high-water mark of the chunk are requested,
+        # devices without any mark yet are requested without lower bound
+        if self._incremental:
+            high_water_marks: list[int] = [self._high_water_marks.get(device_id, 0) for device_id in device_ids]
+            if len(high_water_marks) > 0 and min(high_water_marks) > 0:
+                request_data['dateStart'] = min(high_water_marks)
+
+        all_last_positions_response: Response = self._request(
+            'POST',
+            'trackerdata/getalllastpositions',
+            headers={
+                'Authorization': f"Bearer {self._login_token}"
+            },
+            json=request_data
+        )
+
+        all_last_positions_response.raise_for_status()
+
+        return all_last_positions_response.json()['success']
+
+    def get_state(self) -> dict:
+        # the login token is a credential and never persisted in plaintext,
+        # the adapter logs in again after a restart
+        return {
+            'vehicle_expiration': self._vehicle_expiration.timestamp() if self._vehicle_expiration is not None else None,
+            'high_water_marks': list(self._high_water_marks.items())
+        }
+    
+    def set_state(self, state: dict, vehicles: list[Vehicle]) -> None:
+        # the vehicle cache is reused as long as it's valid, login tokens of older states are ignored
+        self._vehicles.sync(vehicles)
+        if state.get('vehicle_expiration') is not None:
+            self._vehicle_expiration = datetime.fromtimestamp(state['vehicle_expiration'])
+
+        self._high_water_marks = {vehicle_id: timestamp for vehicle_id, timestamp in state.get('high_water_marks', [])}
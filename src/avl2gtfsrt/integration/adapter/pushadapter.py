@@ -0,0 +1,217 @@
+import hmac
+import json
+import logging
+import uvicorn
+
+from abc import abstractmethod
+from collections import deque
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+from threading import Lock, Thread
+from urllib.parse import urlparse
+
+from avl2gtfsrt.integration.adapter.baseadapter import BaseAdapter
+from avl2gtfsrt.integration.common.shared import MAX_TIMESTAMP
+from avl2gtfsrt.integration.model.registry import VehicleRegistry
+from avl2gtfsrt.integration.model.types import VehiclePosition, Vehicle
+
+
+class PushPosition(BaseModel):
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+
+    id: str
+    vehicle_ref: str|None = None
+    latitude: float = Field(ge=-90.0, le=90.0)
+    longitude: float = Field(ge=-180.0, le=180.0)
+    # UNIX timestamp in seconds, e.g. milliseconds are out of range
+    timestamp: int = Field(ge=0, le=MAX_TIMESTAMP)
+
+
+class PushAdapter(BaseAdapter):
+
+    def __init__(self, instance_id: str, config: dict) -> None:
+        super().__init__(instance_id, config)
+
+        # the endpoint is the local address the ingestion server is listening on,
+        # the password is used as bearer token for the clients if set
+        endpoint_url = urlparse(self.endpoint)
+
+        self._host: str = endpoint_url.hostname or '0.0.0.0'
+        self._port: int = endpoint_url.port or 8080
+        self._path: str = endpoint_url.path.rstrip('/') or '/'
+
+        self._max_body_size: int = config['push']['max_body_size']
+
+        # pushed positions are buffered until the next poll of the instance,
+        # the oldest positions are dropped if the buffer is full
+        self._vehicles: VehicleRegistry = VehicleRegistry()
+        self._buffer: deque[VehiclePosition] = deque(maxlen=config['push']['buffer_size'])
+        self._high_water_marks: dict[str, int] = dict()
+        self._lock: Lock = Lock()
+
+        self._server: uvicorn.Server|None = None
+        self._thread: Thread|None = None
+
+    def init(self) -> bool:
+        if self._thread is None or not self._thread.is_alive():
+            logging.info(f"{self.instance_id}/{self.__class__.__name__}: Starting ingestion server on {self._host}:{self._port}{self._path} ...")
+
+            self._server = uvicorn.Server(uvicorn.Config(
+                self._app,
+                host=self._host,
+                port=self._port,
+                interface='asgi3',
+                lifespan='off',
+                access_log=False,
+                log_level='warning',
+                timeout_graceful_shutdown=1
+            ))
+
+            self._thread = Thread(target=self._server.run, name=f"{self.instance_id}-{self.__class__.__name__}", daemon=True)
+            self._thread.start()
+
+        return True
+
+    def get_vehicles(self) -> list[Vehicle]:
+        self.init()
+
+        with self._lock:
+            return list(self._vehicles)
+
+    def get_vehicle_positions(self) -> list[VehiclePosition]:
+        self.init()
+
+        with self._lock:
+            positions: list[VehiclePosition] = list(self._buffer)
+            self._buffer.clear()
+
+        logging.info(f"{self.instance_id}/{self.__class__.__name__}: Received {len(positions)} pushed positions.")
+
+        return positions
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.should_exit = True
+
+        if self._thread is not None:
+            self._thread.join(2)
+            self._thread = None
+
+        super().close()
+
+    def get_state(self) -> dict:
+        with self._lock:
+            return {
+                'high_water_marks': list(self._high_water_marks.items())
+            }
+    
+    def set_state(self, state: dict, vehicles: list[Vehicle]) -> None:
+        with self._lock:
+            self._vehicles.sync(vehicles)
+            self._high_water_marks = {vehicle_id: timestamp for vehicle_id, timestamp in state.get('high_water_marks', [])}
+
+    @abstractmethod
+    def parse(self, body: bytes) -> list[PushPosition]:
+        pass
+
+    def _ingest(self, push_positions: list[PushPosition]) -> tuple[int, int]:
+        accepted: int = 0
+        duplicates: int = 0
+        dropped: int = 0
+
+        with self._lock:
+            for push_position in sorted(push_positions, key=lambda p: p.timestamp):
+                # positions not newer than the last one of a device are duplicates,
+                # e.g. resent by the client after a timeout
+                if push_position.timestamp <= self._high_water_marks.get(push_position.id, 0):
+                    duplicates = duplicates + 1
+                    continue
+
+                self._high_water_marks[push_position.id] = push_position.timestamp
+
+                vehicle: Vehicle = self._vehicles.add(Vehicle(
+                    id=push_position.id,
+                    vehicle_ref=push_position.vehicle_ref if push_position.vehicle_ref is not None else push_position.id
+                ))
+
+                if len(self._buffer) == self._buffer.maxlen:
+                    dropped = dropped + 1
+
+                self._buffer.append(VehiclePosition(
+                    vehicle=vehicle,
+                    latitude=push_position.latitude,
+                    longitude=push_position.longitude,
+                    timestamp=push_position.timestamp
+                ))
+
+                accepted = accepted + 1
+
+        if dropped > 0:
+            logging.warning(f"{self.instance_id}/{self.__class__.__name__}: Buffer full, dropped {dropped} oldest position(s).")
+
+        # start processing of the pushed positions immediately
+        if accepted > 0 and self._notify is not None:
+            self._notify()
+
+        return accepted, duplicates
+
+    async def _app(self, scope: dict, receive, send) -> None:
+        if scope['type'] != 'http':
+            return
+
+        if scope['path'].rstrip('/') != self._path.rstrip('/'):
+            await self._send_response(send, 404, {'error': 'Not found'})
+            return
+
+        if scope['method'] != 'POST':
+            await self._send_response(send, 405, {'error': 'Method not allowed'})
+            return
+
+        if self._password is not None:
+            authorization: bytes = dict(scope['headers']).get(b'authorization', b'')
+            if not hmac.compare_digest(authorization, f"Bearer {self._password}".encode('utf-8')):
+                await self._send_response(send, 401, {'error': 'Unauthorized'})
+                return
+
+        # read the request body, bounded by the max. body size
+        body: bytes = b''
+        more_body: bool = True
+        while more_body:
+            message: dict = await receive()
+            body = body + message.get('body', b'')
+            more_body = message.get('more_body', False)
+
+            if len(body) > self._max_body_size:
+                await self._send_response(send, 413, {'error': 'Request body too large'})
+                return
+
+        try:
+            push_positions: list[PushPosition] = self.parse(body)
+        except ValidationError as ex:
+            await self._send_response(send, 422, {'error': 'Invalid positions', 'details': ex.errors(include_url=False, include_context=False)})
+            return
+        except ValueError as ex:
+            await self._send_response(send, 400, {'error': str(ex)})
+            return
+
+        accepted, duplicates = self._ingest(push_positions)
+
+        logging.debug(f"{self.instance_id}/{self.__class__.__name__}: Accepted {accepted} pushed positions, {duplicates} duplicate(s).")
+
+        await self._send_response(send, 202, {'accepted': accepted, 'duplicates': duplicates})
+
+    async def _send_response(self, send, status: int, data: dict) -> None:
+        body: bytes = json.dumps(data, default=str).encode('utf-8')
+
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode('ascii'))
+            ]
+        })
+
+        await send({
+            'type': 'http.response.body',
+            'body': body
+        })
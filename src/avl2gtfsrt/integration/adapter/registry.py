@@ -0,0 +1,66 @@
+import importlib
+import logging
+
+from importlib.metadata import entry_points
+from threading import Lock
+
+
+# entry point group of adapters, external packages register their adapters here as
+# [project.entry-points."avl2gtfsrt.integration.adapters"] <type name> = "<module>:<class>"
+ENTRY_POINT_GROUP: str = 'avl2gtfsrt.integration.adapters'
+
+# built-in adapters, used when running from a source checkout without installed entry points
+BUILTIN_ADAPTERS: dict[str, str] = {
+    'pajgps': 'avl2gtfsrt.integration.adapter.pajgps.adapter:PajGpsAdapter',
+    'webhook': 'avl2gtfsrt.integration.adapter.webhook.adapter:WebhookAdapter',
+    'stream': 'avl2gtfsrt.integration.adapter.stream.adapter:StreamAdapter'
+}
+
+class AdapterRegistry:
+
+    def __init__(self, group: str = ENTRY_POINT_GROUP) -> None:
+        self._group: str = group
+        self._lock: Lock = Lock()
+
+        # adapter references by type name, the entry points are scanned once on first use
+        self._references: dict[str, str]|None = None
+
+        # adapter classes already imported by type name
+        self._adapters: dict[str, type] = dict()
+
+    def types(self) -> list[str]:
+        return sorted(self._get_references().keys())
+
+    def resolve(self, type_name: str) -> type|None:
+        with self._lock:
+            if type_name in self._adapters:
+                return self._adapters[type_name]
+
+        reference: str|None = self._get_references().get(type_name)
+        if reference is None:
+            return None
+
+        # only the module of the referenced adapter is imported
+        module_name, _, class_name = reference.partition(':')
+        adapter: type = getattr(importlib.import_module(module_name), class_name)
+
+        with self._lock:
+            self._adapters[type_name] = adapter
+
+        return adapter
+
+    def _get_references(self) -> dict[str, str]:
+        with self._lock:
+            if self._references is None:
+                references: dict[str, str] = dict(BUILTIN_ADAPTERS)
+                for entry_point in entry_points(group=self._group):
+                    if entry_point.name in references and references[entry_point.name] != entry_point.value:
+                        logging.warning(f"{self.__class__.__name__}: Adapter type \"{entry_point.name}\" of {entry_point.value} overrides {references[entry_point.name]}.")
+
+                    references[entry_point.name] = entry_point.value
+
+                self._references = references
+
+            return self._references
+
+ADAPTERS: AdapterRegistry = AdapterRegistry()
@@ -0,0 +1,280 @@
+import csv
+import json
+import logging
+import math
+import socket
+import time
+
+from collections import deque
+from datetime import datetime
+from threading import Condition, Event, Thread
+from typing import Iterable, Iterator
+from urllib.parse import urlparse
+
+from avl2gtfsrt.integration.adapter.baseadapter import BaseAdapter
+from avl2gtfsrt.integration.common.shared import MAX_TIMESTAMP
+from avl2gtfsrt.integration.model.registry import VehicleRegistry
+from avl2gtfsrt.integration.model.types import VehiclePosition, Vehicle
+
+
+# a parsed record as tuple of device ID, vehicle ref, latitude, longitude and timestamp
+StreamRecord = tuple[str, str, float, float, int]
+
+class StreamAdapter(BaseAdapter):
+
+    def __init__(self, instance_id: str, config: dict) -> None:
+        super().__init__(instance_id, config)
+
+        # the endpoint is the source of the records, one of file:///path/to/track.ndjson,
+        # pipe:///path/to/fifo or tcp://host:port, plain paths are read as files
+        endpoint_url = urlparse(self.endpoint)
+
+        self._scheme: str = endpoint_url.scheme or 'file'
+        self._path: str = endpoint_url.path
+        self._host: str = endpoint_url.hostname or '127.0.0.1'
+        self._port: int|None = endpoint_url.port
+
+        if self._scheme not in ['file', 'pipe', 'tcp'] or (self._scheme == 'tcp' and self._port is None):
+            raise ValueError(f"Unsupported stream source {self.endpoint} in instance \"{instance_id}\"!")
+
+        self._format: str = config['stream']['format']
+        if self._format == 'auto':
+            self._format = 'csv' if self._path.lower().endswith('.csv') else 'ndjson'
+
+        # recorded tracks are replayed at N times their original speed, 0 replays as fast as possible,
+        # rebased timestamps are shifted to the time of the replay
+        self._speed: float = config['stream']['speed']
+        self._rebase: bool = config['stream']['rebase']
+        self._loop: bool = config['stream']['loop']
+        self._batch_size: int = config['stream']['batch_size']
+
+        # replayed positions are buffered until the next poll of the instance,
+        # the reader waits for the poll if the buffer is full, so no records are lost
+        self._vehicles: VehicleRegistry = VehicleRegistry()
+        self._buffer: deque[VehiclePosition] = deque(maxlen=config['stream']['buffer_size'])
+        self._lock: Condition = Condition()
+
+        # counters are only written by the reader, the polls log their increase
+        self._records: int = 0
+        self._invalid_records: int = 0
+        self._dropped_records: int = 0
+        self._logged_counters: tuple[int, int, int] = (0, 0, 0)
+
+        self._socket: socket.socket|None = None
+        self._thread: Thread|None = None
+        self._should_stop: Event = Event()
+        self._finished: bool = False
+
+    def init(self) -> bool:
+        if not self._finished and (self._thread is None or not self._thread.is_alive()):
+            logging.info(f"{self.instance_id}/{self.__class__.__name__}: Starting {self._format} replay of {self.endpoint} at {self._speed}x speed ...")
+
+            self._should_stop.clear()
+
+            self._thread = Thread(target=self._run_reader, name=f"{self.instance_id}-{self.__class__.__name__}", daemon=True)
+            self._thread.start()
+
+        return True
+
+    def get_vehicles(self) -> list[Vehicle]:
+        self.init()
+
+        with self._lock:
+            return list(self._vehicles)
+
+    def get_vehicle_positions(self) -> list[VehiclePosition]:
+        self.init()
+
+        with self._lock:
+            positions: list[VehiclePosition] = list(self._buffer)
+            self._buffer.clear()
+
+            self._lock.notify_all()
+
+        counters: tuple[int, int, int] = (self._records, self._invalid_records, self._dropped_records)
+        records, invalid_records, dropped_records = [c - l for c, l in zip(counters, self._logged_counters)]
+        self._logged_counters = counters
+
+        logging.info(f"{self.instance_id}/{self.__class__.__name__}: Replayed {len(positions)} positions of {records} records.")
+
+        if invalid_records > 0:
+            logging.warning(f"{self.instance_id}/{self.__class__.__name__}: Skipped {invalid_records} invalid record(s).")
+
+        if dropped_records > 0:
+            logging.warning(f"{self.instance_id}/{self.__class__.__name__}: Buffer full, dropped {dropped_records} oldest position(s).")
+
+        return positions
+
+    def close(self) -> None:
+        self._should_stop.set()
+
+        with self._lock:
+            self._lock.notify_all()
+
+        # blocking reads of the socket are interrupted by shutting it down
+        if self._socket is not None:
+            try:
+                self._socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+        if self._thread is not None:
+            self._thread.join(2)
+            self._thread = None
+
+        super().close()
+
+    def _run_reader(self) -> None:
+        # each pass reads the source once, i.e. the file or a connection to the pipe or socket,
+        # streams are reconnected after they're closed, files are replayed again if looping
+        while not self._should_stop.is_set():
+            try:
+                for batch in self._pace(self._parse_records(self._read_lines())):
+                    self._ingest(batch)
+            except Exception as ex:
+                logging.error(f"{self.instance_id}/{self.__class__.__name__}: Failed to read {self.endpoint}: {ex}")
+
+            if self._scheme == 'file' and not self._loop:
+                logging.info(f"{self.instance_id}/{self.__class__.__name__}: Replay of {self.endpoint} finished.")
+                self._finished = True
+
+                return
+
+            # wait a moment before reconnecting, the source may not be available yet
+            if self._scheme != 'file':
+                self._should_stop.wait(1.0)
+
+    def _read_lines(self) -> Iterator[str]:
+        if self._scheme == 'tcp':
+            self._socket = socket.create_connection((self._host, self._port), timeout=10)
+            self._socket.settimeout(None)
+
+            try:
+                with self._socket.makefile('r', encoding='utf-8', newline='') as stream:
+                    yield from stream
+            finally:
+                self._socket.close()
+                self._socket = None
+        else:
+            # opening a named pipe blocks until a writer connected
+            with open(self._path, 'r', encoding='utf-8', newline='') as stream:
+                yield from stream
+
+    def _parse_records(self, lines: Iterable[str]) -> Iterator[StreamRecord]:
+        if self._format == 'csv':
+            rows: Iterator[dict] = csv.DictReader(lines)
+        else:
+            rows: Iterator[dict] = (self._parse_json(line) for line in lines if not line.isspace())
+
+        for row in rows:
+            if self._should_stop.is_set():
+                return
+
+            self._records = self._records + 1
+
+            # invalid records are skipped, a single one must not stop the replay
+            try:
+                latitude: float = float(row['latitude'])
+                longitude: float = float(row['longitude'])
+                if not -90.0 <= latitude <= 90.0 or not -180.0 <= longitude <= 180.0:
+                    raise ValueError('Coordinates out of range')
+
+                device_id: str = str(row['id'])
+                vehicle_ref: str = str(row.get('vehicle_ref') or device_id)
+
+                timestamp: int = self._parse_timestamp(row['timestamp'])
+            except (KeyError, TypeError, ValueError, OverflowError) as ex:
+                logging.debug(f"{self.instance_id}/{self.__class__.__name__}: Skipping invalid record {row}: {ex}")
+                self._invalid_records = self._invalid_records + 1
+
+                continue
+
+            yield (device_id, vehicle_ref, latitude, longitude, timestamp)
+
+    def _parse_json(self, line: str) -> dict:
+        try:
+            return json.loads(line)
+        except ValueError:
+            # passed on as invalid record
+            return dict()
+
+    def _parse_timestamp(self, value: any) -> int:
+        # UNIX timestamps or ISO 8601 date times,
+        # timestamps must be representable as date time, e.g. infinite values are invalid
+        try:
+            number: float = float(value)
+        except ValueError:
+            return int(datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp())
+
+        if not math.isfinite(number) or not 0 <= number <= MAX_TIMESTAMP:
+            raise ValueError(f"Timestamp {value} out of range")
+
+        return int(number)
+
+    def _pace(self, records: Iterable[StreamRecord]) -> Iterator[list[StreamRecord]]:
+        # records are collected into batches until the next record is due in the future,
+        # the timeline of the recorded track starts with the first record of each pass
+        batch: list[StreamRecord] = list()
+
+        record_start: int|None = None
+        replay_start: float = time.monotonic()
+        wall_start: float = time.time()
+
+        for device_id, vehicle_ref, latitude, longitude, timestamp in records:
+            if record_start is None:
+                record_start = timestamp
+
+            if self._speed > 0:
+                offset: float = (timestamp - record_start) / self._speed
+
+                delay: float = replay_start + offset - time.monotonic()
+                if delay > 0:
+                    if len(batch) > 0:
+                        yield batch
+                        batch = list()
+
+                    if self._should_stop.wait(delay):
+                        return
+            else:
+                offset: float = time.monotonic() - replay_start
+
+            if self._rebase:
+                timestamp = int(wall_start + offset)
+
+            batch.append((device_id, vehicle_ref, latitude, longitude, timestamp))
+
+            if len(batch) >= self._batch_size:
+                yield batch
+                batch = list()
+
+        if len(batch) > 0:
+            yield batch
+
+    def _ingest(self, batch: list[StreamRecord]) -> None:
+        with self._lock:
+            # a replay running ahead of the polls is slowed down to the pace of the instance,
+            # batches larger than the whole buffer drop their oldest positions anyway
+            while len(self._buffer) > 0 and len(self._buffer) + len(batch) > self._buffer.maxlen and not self._should_stop.is_set():
+                if self._notify is not None:
+                    self._notify()
+
+                self._lock.wait(1.0)
+
+            for device_id, vehicle_ref, latitude, longitude, timestamp in batch:
+                vehicle: Vehicle|None = self._vehicles.get(device_id)
+                if vehicle is None:
+                    vehicle = self._vehicles.add(Vehicle(id=device_id, vehicle_ref=vehicle_ref))
+
+                if len(self._buffer) == self._buffer.maxlen:
+                    self._dropped_records = self._dropped_records + 1
+
+                self._buffer.append(VehiclePosition(
+                    vehicle=vehicle,
+                    latitude=latitude,
+                    longitude=longitude,
+                    timestamp=timestamp
+                ))
+
+        # start processing of the replayed positions immediately
+        if self._notify is not None:
+            self._notify()
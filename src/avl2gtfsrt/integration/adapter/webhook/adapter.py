@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+
+from avl2gtfsrt.integration.adapter.pushadapter import PushAdapter, PushPosition
+
+
+class WebhookPositionBatch(BaseModel):
+    positions: list[PushPosition]
+
+
+class WebhookAdapter(PushAdapter):
+
+    def parse(self, body: bytes) -> list[PushPosition]:
+        # generic JSON format, e.g. {"positions": [{"id": 1, "latitude": 48.1, "longitude": 11.5, "timestamp": 1700000000}]}
+        return WebhookPositionBatch.model_validate_json(body).positions
@@ -0,0 +1,197 @@
+import asyncio
+import struct
+
+from paho.mqtt.client import topic_matches_sub
+from threading import Event, Thread
+
+
+class MqttBroker:
+
+    # minimal MQTT 5 broker for benchmarks, supports QoS handshakes and retained messages,
+    # but delivers all messages with QoS 0 and ignores all properties
+    def __init__(self, host: str = '127.0.0.1', port: int = 0) -> None:
+        self.host: str = host
+        self.port: int = port
+
+        self._sessions: set[MqttSession] = set()
+        self._retained: dict[str, bytes] = dict()
+
+        self._loop: asyncio.AbstractEventLoop|None = None
+        self._server: asyncio.AbstractServer|None = None
+        self._thread: Thread|None = None
+
+    def start(self) -> None:
+        started: Event = Event()
+
+        self._thread = Thread(target=self._run, args=(started,), name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+
+        started.wait()
+
+    def stop(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+
+        if self._thread is not None:
+            self._thread.join(2)
+            self._thread = None
+
+    def route(self, topic: str, payload: bytes, retain: bool) -> None:
+        if retain:
+            self._retained[topic] = payload
+
+        for session in list(self._sessions):
+            if session.is_subscribed(topic):
+                session.send_publish(topic, payload, False)
+
+    def retained(self, topic_filters: list[str]) -> list[tuple[str, bytes]]:
+        return [(topic, payload) for topic, payload in self._retained.items() if any(topic_matches_sub(f, topic) for f in topic_filters)]
+
+    def _run(self, started: Event) -> None:
+        self._loop = asyncio.new_event_loop()
+        self._server = self._loop.run_until_complete(asyncio.start_server(self._handle, self.host, self.port))
+        self.port = self._server.sockets[0].getsockname()[1]
+
+        started.set()
+
+        try:
+            self._loop.run_until_complete(self._server.wait_closed())
+        finally:
+            self._loop.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        session: MqttSession = MqttSession(self, reader, writer)
+        self._sessions.add(session)
+
+        try:
+            await session.run()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._sessions.discard(session)
+            writer.close()
+
+class MqttSession:
+
+    def __init__(self, broker: MqttBroker, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._broker: MqttBroker = broker
+        self._reader: asyncio.StreamReader = reader
+        self._writer: asyncio.StreamWriter = writer
+
+        self._topic_filters: set[str] = set()
+
+    def is_subscribed(self, topic: str) -> bool:
+        return any(topic_matches_sub(f, topic) for f in self._topic_filters)
+
+    def send(self, packet_type: int, body: bytes) -> None:
+        self._writer.write(bytes([packet_type]) + _encode_varint(len(body)) + body)
+
+    def send_publish(self, topic: str, payload: bytes, retain: bool) -> None:
+        self.send(0x30 | (1 if retain else 0), _encode_string(topic) + b'\x00' + payload)
+
+    async def run(self) -> None:
+        while True:
+            header: int = (await self._reader.readexactly(1))[0]
+
+            multiplier: int = 1
+            length: int = 0
+            while True:
+                b: int = (await self._reader.readexactly(1))[0]
+                length = length + (b & 0x7F) * multiplier
+                multiplier = multiplier * 128
+                if not b & 0x80:
+                    break
+
+            data: bytes = await self._reader.readexactly(length)
+            packet_type: int = header >> 4
+
+            if packet_type == 1:
+                # CONNECT > CONNACK
+                self.send(0x20, b'\x00\x00\x00')
+            elif packet_type == 3:
+                # PUBLISH > PUBACK/PUBREC
+                qos: int = (header >> 1) & 3
+                topic_length: int = struct.unpack('!H', data[:2])[0]
+                topic: str = data[2:2 + topic_length].decode('utf-8')
+
+                position: int = 2 + topic_length
+                if qos > 0:
+                    packet_id: bytes = data[position:position + 2]
+                    position = position + 2
+
+                properties_length, position = _decode_varint(data, position)
+                payload: bytes = data[position + properties_length:]
+
+                if qos == 1:
+                    self.send(0x40, packet_id)
+                elif qos == 2:
+                    self.send(0x50, packet_id)
+
+                self._broker.route(topic, payload, bool(header & 1))
+            elif packet_type == 6:
+                # PUBREL > PUBCOMP
+                self.send(0x70, data[:2])
+            elif packet_type == 8:
+                # SUBSCRIBE > SUBACK
+                topic_filters: list[str] = self._read_topic_filters(data, True)
+                self._topic_filters.update(topic_filters)
+
+                self.send(0x90, data[:2] + b'\x00' + bytes(len(topic_filters)))
+
+                for topic, payload in self._broker.retained(topic_filters):
+                    self.send_publish(topic, payload, True)
+            elif packet_type == 10:
+                # UNSUBSCRIBE > UNSUBACK
+                topic_filters: list[str] = self._read_topic_filters(data, False)
+                self._topic_filters.difference_update(topic_filters)
+
+                self.send(0xB0, data[:2] + b'\x00' + bytes(len(topic_filters)))
+            elif packet_type == 12:
+                # PINGREQ > PINGRESP
+                self.send(0xD0, b'')
+            elif packet_type == 14:
+                # DISCONNECT
+                return
+
+            await self._writer.drain()
+
+    def _read_topic_filters(self, data: bytes, with_options: bool) -> list[str]:
+        properties_length, position = _decode_varint(data, 2)
+        position = position + properties_length
+
+        topic_filters: list[str] = list()
+        while position < len(data):
+            topic_filter_length: int = struct.unpack('!H', data[position:position + 2])[0]
+            topic_filters.append(data[position + 2:position + 2 + topic_filter_length].decode('utf-8'))
+
+            position = position + 2 + topic_filter_length + (1 if with_options else 0)
+
+        return topic_filters
+
+def _encode_varint(value: int) -> bytes:
+    result: bytearray = bytearray()
+    while True:
+        b: int = value % 128
+        value = value // 128
+        if value > 0:
+            b = b | 0x80
+
+        result.append(b)
+        if value == 0:
+            return bytes(result)
+
+def _decode_varint(data: bytes, position: int) -> tuple[int, int]:
+    multiplier: int = 1
+    value: int = 0
+    while True:
+        b: int = data[position]
+        position = position + 1
+
+        value = value + (b & 0x7F) * multiplier
+        multiplier = multiplier * 128
+        if not b & 0x80:
+            return value, position
+
+def _encode_string(value: str) -> bytes:
+    encoded: bytes = value.encode('utf-8')
+    return struct.pack('!H', len(encoded)) + encoded
@@ -0,0 +1,119 @@
+import json
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+
+
+class PajGpsProvider:
+
+    # simulated PAJ GPS API for benchmarks, every vehicle delivers
+    # a new position each update interval, moving slowly to the north,
+    # requests from the last point return all points newer than their date start instead of the latest one
+    def __init__(self, vehicles: int, update_interval: float = 1.0, latency: float = 0.0, host: str = '127.0.0.1', port: int = 0) -> None:
+        self.vehicles: int = vehicles
+        self.update_interval: float = update_interval
+        self.latency: float = latency
+
+        # time when each position was delivered first, keyed by device ID and timestamp
+        self._served: dict[tuple[int, int], float] = dict()
+        self._lock: Lock = Lock()
+
+        self.requests: int = 0
+        self.bytes_sent: int = 0
+
+        self._server: ThreadingHTTPServer = ThreadingHTTPServer((host, port), self._create_handler())
+        self._server.daemon_threads = True
+
+        self._thread: Thread|None = None
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> None:
+        self._thread = Thread(target=self._server.serve_forever, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+        if self._thread is not None:
+            self._thread.join(2)
+            self._thread = None
+
+    def served_at(self, device_id: int, timestamp: int) -> float|None:
+        with self._lock:
+            return self._served.get((device_id, timestamp))
+
+    def positions(self, device_ids: list[int], date_start: int|None = None) -> list[dict]:
+        now: float = time.time()
+
+        # positions are updated on a fixed grid per vehicle,
+        # at most the last 10 points are returned since the date start
+        last_tick: int = int(now / self.update_interval)
+        first_tick: int = last_tick
+        if date_start is not None:
+            first_tick = max(int(date_start / self.update_interval) + 1, last_tick - 9)
+
+        positions: list[dict] = list()
+        for tick in range(first_tick, last_tick + 1):
+            timestamp: int = int(tick * self.update_interval)
+            for device_id in device_ids:
+                positions.append({
+                    'iddevice': device_id,
+                    'lat': 48.0 + device_id * 1e-3 + tick * 1e-4,
+                    'lng': 9.0 + device_id * 1e-3,
+                    'dateunix': timestamp
+                })
+
+        with self._lock:
+            for position in positions:
+                self._served.setdefault((position['iddevice'], position['dateunix']), now)
+
+        return positions
+
+    def _create_handler(self) -> type[BaseHTTPRequestHandler]:
+        provider: PajGpsProvider = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.startswith('/device'):
+                    self._respond([{'id': i, 'name': f"V{i}"} for i in range(1, provider.vehicles + 1)])
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                length: int = int(self.headers.get('Content-Length') or 0)
+                body: dict = json.loads(self.rfile.read(length) or b'{}')
+
+                if self.path.startswith('/login'):
+                    self._respond({'token': 'benchmark', 'expires_in': 86400})
+                elif self.path.startswith('/trackerdata/getalllastpositions'):
+                    self._respond(provider.positions(body['deviceIDs'], body.get('dateStart') if body.get('fromLastPoint') else None))
+                else:
+                    self.send_error(404)
+
+            def _respond(self, data: any) -> None:
+                provider.requests = provider.requests + 1
+                if provider.latency > 0:
+                    time.sleep(provider.latency)
+
+                response: bytes = json.dumps({'success': data}).encode('utf-8')
+                provider.bytes_sent = provider.bytes_sent + len(response)
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(response)))
+                self.end_headers()
+
+                self.wfile.write(response)
+
+        return Handler
@@ -0,0 +1,92 @@
+import re
+import time
+
+from datetime import datetime
+from paho.mqtt import client as mqtt
+from threading import Lock, Timer
+
+from avl2gtfsrt.integration.common.mqtt import get_tls_value
+from avl2gtfsrt.integration.common.shared import uid
+from avl2gtfsrt.integration.vdv.vdv435 import TechnicalVehicleLogOffResponseStructure, TechnicalVehicleLogOnResponseStructure
+
+
+TIMESTAMP_OF_MEASUREMENT: re.Pattern = re.compile(rb'<TimestampOfMeasurement>([^<]+)</TimestampOfMeasurement>')
+
+class Responder:
+
+    # simulated avl2gtfsrt counterpart for benchmarks, answers all log-on/log-off requests
+    # of the organisation and records the arrival of GNSS position updates
+    def __init__(self, host: str, port: int, organisation_id: str, latency: float = 0.0) -> None:
+        self.host: str = host
+        self.port: int = port
+        self.organisation_id: str = organisation_id
+        self.latency: float = latency
+
+        self.log_on_requests: int = 0
+        self.log_off_requests: int = 0
+
+        # arrivals of GNSS position updates as tuples of vehicle ref, timestamp of measurement and arrival time
+        self.arrivals: list[tuple[str, int, float]] = list()
+        self._lock: Lock = Lock()
+
+        self._mqtt: mqtt.Client = mqtt.Client(
+            mqtt.CallbackAPIVersion.VERSION2,
+            protocol=mqtt.MQTTv5,
+            client_id=f"avl2gtfsrt-benchmark-responder-{uid()}"
+        )
+
+        self._mqtt.on_connect = self._on_connect
+        self._mqtt.on_message = self._on_message
+
+    def start(self) -> None:
+        self._mqtt.connect(self.host, self.port)
+        self._mqtt.loop_start()
+
+        # wait for subscriptions before the benchmark starts
+        deadline: float = time.monotonic() + 5.0
+        while not self._mqtt.is_connected() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        time.sleep(0.1)
+
+    def stop(self) -> None:
+        self._mqtt.disconnect()
+        self._mqtt.loop_stop()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.arrivals.clear()
+
+    def _on_connect(self, client, userdata, flags, rc, properties):
+        client.subscribe(f"IoM/1.0/DataVersion/+/Inbox/ItcsInbox/Country/de/+/Organisation/{self.organisation_id}/#", 2)
+        client.subscribe(f"IoM/1.0/DataVersion/+/Country/de/+/Organisation/{self.organisation_id}/+/Vehicle/+/+/PhysicalPosition/GnssPhysicalPositionData", 0)
+
+    def _on_message(self, client, userdata, message):
+        if message.retain:
+            return
+
+        if message.topic.endswith('GnssPhysicalPositionData'):
+            arrival: float = time.time()
+
+            match: re.Match|None = TIMESTAMP_OF_MEASUREMENT.search(message.payload)
+            if match is not None:
+                timestamp: int = int(datetime.fromisoformat(match.group(1).decode('utf-8')).timestamp())
+                with self._lock:
+                    self.arrivals.append((get_tls_value(message.topic, 'Vehicle'), timestamp, arrival))
+
+            return
+
+        correlation_id: str = get_tls_value(message.topic, 'CorrelationId')
+        if b'TechnicalVehicleLogOnRequest' in message.payload:
+            self.log_on_requests = self.log_on_requests + 1
+            response: str = TechnicalVehicleLogOnResponseStructure().xml()
+        else:
+            self.log_off_requests = self.log_off_requests + 1
+            response: str = TechnicalVehicleLogOffResponseStructure().xml()
+
+        topic: str = f"IoM/1.0/DataVersion/any/Inbox/VehicleInbox/Country/de/any/Organisation/{self.organisation_id}/any/VehicleId/any/CorrelationId/{correlation_id}/ResponseData"
+
+        if self.latency > 0:
+            Timer(self.latency, client.publish, args=(topic, response, 2)).start()
+        else:
+            client.publish(topic, response, 2)
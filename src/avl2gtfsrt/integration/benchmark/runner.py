@@ -0,0 +1,272 @@
+import asyncio
+import statistics
+import time
+import tracemalloc
+
+from dataclasses import dataclass
+
+from avl2gtfsrt.integration.benchmark.broker import MqttBroker
+from avl2gtfsrt.integration.benchmark.provider import PajGpsProvider
+from avl2gtfsrt.integration.benchmark.responder import Responder
+from avl2gtfsrt.integration.config import Configuration
+from avl2gtfsrt.integration.instance import AsyncAvlDataInstance, AvlDataInstance
+from avl2gtfsrt.integration.iom.connection import AsyncMqttConnection, MqttConnection, MqttConnectionPool
+from avl2gtfsrt.integration.metrics import POLL_DURATION
+from avl2gtfsrt.integration.scheduler import Scheduler
+
+
+@dataclass
+class BenchmarkResult:
+    vehicles: int
+    duration: float
+    published: int
+    throughput: float
+    latency_p50: float
+    latency_p95: float
+    latency_p99: float
+    latency_max: float
+    poll_cycles: int
+    poll_cycle_mean: float
+    poll_cycle_p95: float
+    log_on_requests: int
+    provider_requests: int
+    provider_bytes: int
+    memory_total: int|None = None
+    memory_per_vehicle: float|None = None
+
+@dataclass
+class BenchmarkThresholds:
+    min_throughput: float|None = None
+    max_latency_p95: float|None = None
+    max_memory_per_vehicle: float|None = None
+
+    @classmethod
+    def from_baseline(cls, baseline: BenchmarkResult, tolerance: float) -> 'BenchmarkThresholds':
+        # a run is a regression if it's worse than the baseline run by more than the tolerance
+        return cls(
+            min_throughput=baseline.throughput * (1.0 - tolerance),
+            max_latency_p95=baseline.latency_p95 * (1.0 + tolerance),
+            max_memory_per_vehicle=baseline.memory_per_vehicle * (1.0 + tolerance) if baseline.memory_per_vehicle is not None else None
+        )
+
+    def check(self, result: BenchmarkResult) -> list[str]:
+        violations: list[str] = list()
+        if self.min_throughput is not None and result.throughput < self.min_throughput:
+            violations.append(f"Throughput {result.throughput:.1f} positions/s below {self.min_throughput:.1f} positions/s")
+
+        if self.max_latency_p95 is not None and result.latency_p95 > self.max_latency_p95:
+            violations.append(f"Publish latency p95 {result.latency_p95 * 1000:.1f}ms above {self.max_latency_p95 * 1000:.1f}ms")
+
+        # memory thresholds are only checked if the memory was measured
+        if self.max_memory_per_vehicle is not None and result.memory_per_vehicle is not None and result.memory_per_vehicle > self.max_memory_per_vehicle:
+            violations.append(f"Memory {result.memory_per_vehicle / 1024:.2f}KiB per vehicle above {self.max_memory_per_vehicle / 1024:.2f}KiB")
+
+        return violations
+
+class Benchmark:
+
+    def __init__(self, vehicles: int = 100, interval: int = 1, update_interval: int = 1, provider_latency: float = 0.0, response_latency: float = 0.0, duration: float = 10.0, runtime: str = 'threading', chunk_size: int = 100, columnar: bool = False, incremental: bool = False) -> None:
+        self.vehicles: int = vehicles
+        self.interval: int = interval
+        self.update_interval: int = update_interval
+        self.provider_latency: float = provider_latency
+        self.response_latency: float = response_latency
+        self.duration: float = duration
+        self.runtime: str = runtime
+        self.chunk_size: int = chunk_size
+        self.columnar: bool = columnar
+        self.incremental: bool = incremental
+
+        self._broker: MqttBroker = MqttBroker()
+        self._provider: PajGpsProvider = PajGpsProvider(vehicles, update_interval, provider_latency)
+        self._responder: Responder|None = None
+
+    def run(self, memory: bool = True) -> BenchmarkResult:
+        self._broker.start()
+        self._provider.start()
+
+        self._responder = Responder(self._broker.host, self._broker.port, 'benchmark', self.response_latency)
+        self._responder.start()
+
+        try:
+            result: BenchmarkResult = self._run_throughput()
+
+            # memory is measured in a separate run, as tracing slows down everything
+            if memory:
+                result.memory_total = self._run_memory()
+                result.memory_per_vehicle = result.memory_total / self.vehicles
+
+            return result
+        finally:
+            self._responder.stop()
+            self._provider.stop()
+            self._broker.stop()
+
+    def _run_throughput(self) -> BenchmarkResult:
+        instance_id: str = f"benchmark-{self.runtime}"
+
+        start: float = time.time()
+        self._run_instance(instance_id, self.duration)
+        end: float = time.time()
+
+        # the first poll including login, discovery and log-on of all vehicles is left out
+        warmup: float = min(self.interval + 1.0, self.duration / 2)
+        arrivals: list[tuple[str, int, float]] = [a for a in self._responder.arrivals if a[2] >= start + warmup]
+
+        latencies: list[float] = list()
+        for vehicle_ref, timestamp, arrival in arrivals:
+            served_at: float|None = self._provider.served_at(int(vehicle_ref[1:]), timestamp)
+            if served_at is not None:
+                latencies.append(arrival - served_at)
+
+        poll_samples: dict[str, list] = self._histogram_samples(instance_id)
+
+        return BenchmarkResult(
+            vehicles=self.vehicles,
+            duration=end - start,
+            published=len(self._responder.arrivals),
+            throughput=len(arrivals) / max(end - start - warmup, 1e-9),
+            latency_p50=self._quantile(latencies, 0.5),
+            latency_p95=self._quantile(latencies, 0.95),
+            latency_p99=self._quantile(latencies, 0.99),
+            latency_max=max(latencies, default=0.0),
+            poll_cycles=int(poll_samples['_count'][0][2]),
+            poll_cycle_mean=poll_samples['_sum'][0][2] / max(poll_samples['_count'][0][2], 1),
+            poll_cycle_p95=self._histogram_quantile(poll_samples['_bucket'], 0.95),
+            log_on_requests=self._responder.log_on_requests,
+            provider_requests=self._provider.requests,
+            provider_bytes=self._provider.bytes_sent
+        )
+
+    def _run_memory(self) -> int:
+        tracemalloc.start(25)
+
+        # only allocations of the integration itself are counted,
+        # the simulated counterparts run in the same process
+        filters: list[tracemalloc.Filter] = [
+            tracemalloc.Filter(True, '*avl2gtfsrt/integration/*', all_frames=True),
+            tracemalloc.Filter(False, '*avl2gtfsrt/integration/benchmark/*', all_frames=True)
+        ]
+
+        try:
+            baseline: tracemalloc.Snapshot = tracemalloc.take_snapshot().filter_traces(filters)
+            snapshot: tracemalloc.Snapshot = self._run_instance('benchmark-memory', self.interval + 1.0, True).filter_traces(filters)
+        finally:
+            tracemalloc.stop()
+
+        return sum(stat.size_diff for stat in snapshot.compare_to(baseline, 'filename'))
+
+    def _run_instance(self, instance_id: str, duration: float, snapshot: bool = False) -> tracemalloc.Snapshot|None:
+        config: dict = Configuration.default_config({
+            'runtime': self.runtime,
+            'scheduler': {
+                'spread': False
+            },
+            'instances': [{
+                'id': instance_id,
+                'adapter': {
+                    'type': 'pajgps',
+                    'endpoint': self._provider.endpoint,
+                    'username': 'benchmark',
+                    'password': 'benchmark',
+                    'interval': self.interval,
+                    'phase': 0,
+                    'chunk_size': self.chunk_size,
+                    'incremental': self.incremental
+                },
+                'broker': {
+                    'host': self._broker.host,
+                    'port': self._broker.port
+                },
+                'vdv435': {
+                    'organisation': 'benchmark',
+                    'itcs': 1
+                },
+                'columnar': self.columnar
+            }]
+        })
+
+        scheduler: Scheduler = Scheduler(config['scheduler'])
+        result: tracemalloc.Snapshot|None = None
+
+        if self.runtime == 'asyncio':
+            async def run_async() -> tracemalloc.Snapshot|None:
+                instance: AsyncAvlDataInstance = AsyncAvlDataInstance(config['instances'][0], MqttConnectionPool(AsyncMqttConnection), scheduler)
+                task: asyncio.Task = asyncio.create_task(instance.run_async())
+
+                await asyncio.sleep(duration)
+                while snapshot and not self._polls_completed(instance_id, 2):
+                    await asyncio.sleep(0.1)
+
+                snapshot_result: tracemalloc.Snapshot|None = self._take_snapshot() if snapshot else None
+
+                instance.stop(config['shutdown_timeout'] * 0.9)
+                await asyncio.wait_for(task, config['shutdown_timeout'])
+
+                return snapshot_result
+
+            result = asyncio.run(run_async())
+        else:
+            instance: AvlDataInstance = AvlDataInstance(config['instances'][0], MqttConnectionPool(MqttConnection), scheduler)
+            instance.run()
+
+            time.sleep(duration)
+            while snapshot and not self._polls_completed(instance_id, 2):
+                time.sleep(0.1)
+
+            result = self._take_snapshot() if snapshot else None
+
+            instance.stop(config['shutdown_timeout'] * 0.9)
+            instance.join(config['shutdown_timeout'])
+
+        return result
+
+    def _polls_completed(self, instance_id: str, count: int) -> bool:
+        # the snapshot is only meaningful after the first poll logged on the whole fleet
+        return self._histogram_samples(instance_id)['_count'][0][2] >= count
+
+    def _take_snapshot(self) -> tracemalloc.Snapshot:
+        # tracing is stopped right away, otherwise the log-off of
+        # large fleets at shutdown runs into the request timeout
+        snapshot: tracemalloc.Snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+        return snapshot
+
+    def _histogram_samples(self, instance_id: str) -> dict[str, list]:
+        samples: dict[str, list] = {'_bucket': list(), '_sum': list(), '_count': list()}
+        for sample in POLL_DURATION.labels(instance_id).samples():
+            samples[sample[0]].append(sample)
+
+        return samples
+
+    def _histogram_quantile(self, buckets: list[tuple[str, tuple, float]], q: float) -> float:
+        # linear interpolation within the bucket containing the quantile, like Prometheus does
+        total: float = buckets[-1][2]
+        if total == 0:
+            return 0.0
+
+        rank: float = q * total
+        lower_bound: float = 0.0
+        lower_count: float = 0.0
+        for _, labels, count in buckets:
+            upper_bound: float = float(labels[0][1])
+            if count >= rank:
+                if upper_bound == float('inf'):
+                    return lower_bound
+
+                return lower_bound + (upper_bound - lower_bound) * (rank - lower_count) / max(count - lower_count, 1e-9)
+
+            lower_bound = upper_bound
+            lower_count = count
+
+        return lower_bound
+
+    def _quantile(self, values: list[float], q: float) -> float:
+        if len(values) == 0:
+            return 0.0
+
+        if len(values) == 1:
+            return values[0]
+
+        return statistics.quantiles(values, n=100, method='inclusive')[int(q * 100) - 1]
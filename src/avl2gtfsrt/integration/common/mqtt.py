@@ -8,4 +8,81 @@ def get_tls_value(topic: str, key: str, fail_on_error: bool = True) -> str|None:
         if fail_on_error:
             raise LookupError(f"Key {key} not found in topic {topic}")
     
-    return None
\ No newline at end of file
+    return None
+
+class TopicMatcher:
+
+    def __init__(self) -> None:
+        # trie of topic filter levels, each node keeps its children 
+        # and the values registered for the filter ending there
+        self._root: _TopicNode = _TopicNode()
+
+    def add(self, topic_filter: str, value: any) -> None:
+        node: _TopicNode = self._root
+        for level in topic_filter.split('/'):
+            node = node.children.setdefault(level, _TopicNode())
+
+        node.values.append(value)
+
+    def remove(self, topic_filter: str, value: any) -> None:
+        nodes: list[tuple[_TopicNode, str]] = list()
+
+        node: _TopicNode = self._root
+        for level in topic_filter.split('/'):
+            if level not in node.children:
+                return
+            
+            nodes.append((node, level))
+            node = node.children[level]
+
+        if value in node.values:
+            node.values.remove(value)
+
+        # prune empty branches bottom up
+        for parent, level in reversed(nodes):
+            child: _TopicNode = parent.children[level]
+            if len(child.values) > 0 or len(child.children) > 0:
+                break
+
+            del parent.children[level]
+
+    def match(self, topic: str) -> list[any]:
+        # walk all matching branches level by level,
+        # wildcards do not match topics starting with $ at the first level
+        values: list[any] = list()
+        
+        nodes: list[_TopicNode] = [self._root]
+        for index, level in enumerate(topic.split('/')):
+            next_nodes: list[_TopicNode] = list()
+            for node in nodes:
+                if index > 0 or not level.startswith('$'):
+                    if '#' in node.children:
+                        values.extend(node.children['#'].values)
+
+                    if '+' in node.children:
+                        next_nodes.append(node.children['+'])
+
+                if level in node.children:
+                    next_nodes.append(node.children[level])
+
+            nodes = next_nodes
+            if len(nodes) == 0:
+                return values
+
+        for node in nodes:
+            values.extend(node.values)
+
+            # a multi level wildcard matches the parent level too
+            if '#' in node.children:
+                values.extend(node.children['#'].values)
+
+        return values
+
+
+class _TopicNode:
+
+    __slots__ = ('children', 'values')
+
+    def __init__(self) -> None:
+        self.children: dict[str, _TopicNode] = dict()
+        self.values: list[any] = list()
@@ -1,9 +1,15 @@
 import json
 
+from lxml import etree
 from pydantic import BaseModel
-from xmltodict import parse, unparse
+from xml.sax.saxutils import escape, quoteattr
+from xmltodict import unparse
 
 __registry: dict = {}
+__encoders: dict = {}
+
+XML_DECLARATION: str = '<?xml version="1.0" encoding="utf-8"?>\n'
+XML_PARSER: etree.XMLParser = etree.XMLParser(resolve_entities=False, no_network=True, remove_comments=True, remove_pis=True)
 
 class Serializable(BaseModel):
 
@@ -20,22 +26,130 @@ class Serializable(BaseModel):
 
         return json_str
 
-    def xml(self):
-        data: dict = json.loads(self.json())
-        xml: str = unparse(data, pretty=True)
+    def xml(self, pretty: bool = False):
+        if pretty:
+            data: dict = json.loads(self.json())
+            xml: str = unparse(data, pretty=True)
+
+            return xml
+        
+        # compact XML is encoded directly from the model fields,
+        # output equals to xmltodict without pretty printing
+        return XML_DECLARATION + self._xml_element(self.__class__.__name__)
+    
+    def _xml_element(self, tag: str) -> str:
+        attributes: list[str] = list()
+        children: list[str] = list()
+        text: str = ''
+
+        for alias, name, kind in self.__class__._xml_encoder():
+            value: any = getattr(self, name)
+            if value is None:
+                continue
+
+            if kind == '@':
+                attributes.append(f"{alias}{quoteattr(_xml_str(value))}")
+            elif kind == '#':
+                text = escape(_xml_str(value))
+            else:
+                for item in (value if isinstance(value, list) else [value]):
+                    if isinstance(item, Serializable):
+                        children.append(item._xml_element(alias))
+                    else:
+                        children.append(f"<{alias}>{escape(_xml_str(item))}</{alias}>")
+
+        return f"<{tag}{''.join(attributes)}>{''.join(children)}{text}</{tag}>"
+    
+    @classmethod
+    def _xml_encoder(cls) -> list[tuple[str, str, str]]:
+        # precompile the field layout once per class,
+        # attribute names already contain the leading space and the equal sign
+        encoder: list[tuple[str, str, str]]|None = globals()['__encoders'].get(cls)
+        if encoder is None:
+            encoder = list()
+            for name, field in cls.model_fields.items():
+                alias: str = field.alias or name
+                if alias == '#text':
+                    encoder.append((alias, name, '#'))
+                elif alias.startswith('@'):
+                    encoder.append((f" {alias[1:]}=", name, '@'))
+                else:
+                    encoder.append((alias, name, ''))
 
-        return xml
+            globals()['__encoders'][cls] = encoder
+
+        return encoder
     
     @classmethod
-    def load(cls, raw: str):
-        try:
+    def load(cls, raw: str|bytes):
+        if isinstance(raw, str):
+            raw = raw.encode('utf-8')
+
+        # dispatch on the first significant byte instead of
+        # trying to parse JSON first for every XML message
+        raw = raw.lstrip(b'\xef\xbb\xbf \t\r\n')
+        if raw[:1] == b'<':
+            root: etree._Element = etree.fromstring(raw, parser=XML_PARSER)
+            
+            class_name: str = _xml_name(root.tag, root.nsmap)
+            data: dict|str|None = _xml_to_dict(root, dict())
+        else:
             data: dict = json.loads(raw)
-        except json.JSONDecodeError:
-            data: dict = parse(raw)
-        
-        class_name: str = next(iter(data))
+
+            class_name: str = next(iter(data))
+            data = next(iter(data.values()))
 
         cls = globals()['__registry'][class_name]
-        data = next(iter(data.values()))
 
-        return cls(**data)
\ No newline at end of file
+        return cls(**(data if isinstance(data, dict) else dict()))
+    
+def _xml_str(value: any) -> str:
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    
+    return str(value)
+
+def _xml_name(name: str, nsmap: dict) -> str:
+    # restore prefixed names like netex:VehicleRef as written in the document
+    if name[0] == '{':
+        uri, local_name = name[1:].split('}', 1)
+        prefix: str|None = next((p for p, u in nsmap.items() if u == uri), None)
+
+        return f"{prefix}:{local_name}" if prefix is not None else local_name
+    
+    return name
+
+def _xml_to_dict(element: etree._Element, parent_nsmap: dict) -> dict|str|None:
+    # build the same structure as xmltodict.parse does
+    data: dict = dict()
+
+    nsmap: dict = element.nsmap
+    for prefix, uri in nsmap.items():
+        if parent_nsmap.get(prefix) != uri:
+            data[f"@xmlns:{prefix}" if prefix is not None else '@xmlns'] = uri
+
+    for name, value in element.attrib.items():
+        data[f"@{_xml_name(name, nsmap)}"] = value
+
+    text: str = element.text or ''
+    for child in element:
+        text = text + (child.tail or '')
+
+        key: str = _xml_name(child.tag, nsmap)
+        value: dict|str|None = _xml_to_dict(child, nsmap)
+        
+        if key not in data:
+            data[key] = value
+        elif isinstance(data[key], list):
+            data[key].append(value)
+        else:
+            data[key] = [data[key], value]
+
+    text = text.strip()
+    if len(data) == 0:
+        return text if len(text) > 0 else None
+    
+    if len(text) > 0:
+        data['#text'] = text
+
+    return data
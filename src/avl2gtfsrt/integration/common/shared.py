@@ -1,10 +1,18 @@
+import math
 import uuid
 
 from datetime import datetime, timezone
 
+EARTH_RADIUS: float = 6371008.8
+
+# latest UNIX timestamp accepted from providers, 9999-12-31T23:59:59Z
+MAX_TIMESTAMP: int = 253402300799
+
+
 def isotimestamp() -> str:
     return datetime.now(timezone.utc).replace(microsecond=0).isoformat()
 
+
 def unixtimestamp(iso_str: str|None = None) -> int:
     if iso_str is not None:
         timestamp: float = datetime.fromisoformat(iso_str).timestamp()
@@ -13,8 +21,34 @@ def unixtimestamp(iso_str: str|None = None) -> int:
         timestamp: float = datetime.now(timezone.utc).timestamp()
         return int(timestamp)
 
+
 def uid() -> str:
     return str(uuid.uuid4())
 
+
 def clamp(value: float|int, min_value: float|int, max_value: float|int) -> float|int:
-    return max(min_value, min(max_value, value))
\ No newline at end of file
+    return max(min_value, min(max_value, value))
+
+
+def haversine_distance(latitude1: float, longitude1: float, latitude2: float, longitude2: float) -> float:
+    # great circle distance in metres
+    phi1: float = math.radians(latitude1)
+    phi2: float = math.radians(latitude2)
+    delta_phi: float = math.radians(latitude2 - latitude1)
+    delta_lambda: float = math.radians(longitude2 - longitude1)
+
+    a: float = math.sin(delta_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
+    
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(clamp(a, 0.0, 1.0)))
+
+
+def initial_bearing(latitude1: float, longitude1: float, latitude2: float, longitude2: float) -> float:
+    # compass bearing in degrees clockwise from north at the first point towards the second one
+    phi1: float = math.radians(latitude1)
+    phi2: float = math.radians(latitude2)
+    delta_lambda: float = math.radians(longitude2 - longitude1)
+
+    y: float = math.sin(delta_lambda) * math.cos(phi2)
+    x: float = math.cos(phi1) * math.sin(phi2) - math.sin(phi1) * math.cos(phi2) * math.cos(delta_lambda)
+
+    return math.degrees(math.atan2(y, x)) % 360.0
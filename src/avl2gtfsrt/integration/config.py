@@ -1,23 +1,146 @@
+import yaml
+
 class Configuration:
 
+    @classmethod
+    def load(cls, config_filename: str) -> dict:
+        # load config and set default values
+        with open(config_filename, 'r') as config_file:
+            config: dict = yaml.safe_load(config_file)
+
+        return cls.default_config(config)
+
     @classmethod
     def default_config(cls, config: dict) -> dict:
         if 'instances' not in config or not isinstance(config['instances'], list):
             raise RuntimeError('Configuration key "instances" missing or invalid.')
         
+        # default configuration at global level
+        default_global_config: dict = {
+            'runtime': 'threading',
+            'shutdown_timeout': 25,
+            'executor': {
+                'workers': 0
+            },
+            'scheduler': {
+                'spread': True,
+                'jitter': 0
+            },
+            'state': {
+                'path': None,
+                'interval': 60,
+                'max_age': 3600
+            },
+            'metrics': {
+                'endpoint': None
+            },
+            'workers': {
+                'count': 0,
+                'restart_delay': 1,
+                'health_interval': 5,
+                'health_timeout': 60
+            },
+            'reload': {
+                'watch': False
+            }
+        }
+
+        config = cls._merge_config(default_global_config, config)
+
+        if config['runtime'] not in ['threading', 'asyncio']:
+            raise RuntimeError('Configuration key "runtime" invalid, must be one of "threading" or "asyncio".')
+        
+        if not isinstance(config['shutdown_timeout'], (int, float)) or config['shutdown_timeout'] < 0:
+            raise RuntimeError('Configuration key "shutdown_timeout" invalid.')
+        
+        if not isinstance(config['executor']['workers'], int) or config['executor']['workers'] < 0:
+            raise RuntimeError('Configuration key "executor.workers" invalid.')
+        
+        if not isinstance(config['scheduler']['jitter'], (int, float)) or config['scheduler']['jitter'] < 0:
+            raise RuntimeError('Configuration key "scheduler.jitter" invalid.')
+        
+        if config['state']['path'] is not None and not isinstance(config['state']['path'], str):
+            raise RuntimeError('Configuration key "state.path" invalid.')
+        
+        for key in ['interval', 'max_age']:
+            if not isinstance(config['state'][key], (int, float)) or config['state'][key] < 0:
+                raise RuntimeError(f"Configuration key \"state.{key}\" invalid.")
+        
+        if config['metrics']['endpoint'] is not None and not isinstance(config['metrics']['endpoint'], str):
+            raise RuntimeError('Configuration key "metrics.endpoint" invalid.')
+        
+        if config['workers']['count'] != 'auto' and (not isinstance(config['workers']['count'], int) or config['workers']['count'] < 0):
+            raise RuntimeError('Configuration key "workers.count" invalid, must be a number or "auto".')
+        
+        for key in ['restart_delay', 'health_timeout']:
+            if not isinstance(config['workers'][key], (int, float)) or config['workers'][key] < 0:
+                raise RuntimeError(f"Configuration key \"workers.{key}\" invalid.")
+        
+        if not isinstance(config['workers']['health_interval'], (int, float)) or config['workers']['health_interval'] <= 0:
+            raise RuntimeError('Configuration key "workers.health_interval" invalid.')
+        
+        if not isinstance(config['reload']['watch'], bool):
+            raise RuntimeError('Configuration key "reload.watch" invalid.')
+
         # default configuration at instance level
         default_instance_config: dict = {
             'adapter': {
                 'username': None,
                 'password': None,
                 'interval': 10,
-                'autologoff': 1800
+                'phase': None,
+                'autologoff': 1800,
+                'chunk_size': 100,
+                'workers': 4,
+                'incremental': False,
+                'push': {
+                    'buffer_size': 10000,
+                    'max_body_size': 1048576
+                },
+                'stream': {
+                    'format': 'auto',
+                    'speed': 1,
+                    'rebase': True,
+                    'loop': False,
+                    'buffer_size': 100000,
+                    'batch_size': 1000
+                },
+                'http': {
+                    'pool_size': 10,
+                    'keepalive': True,
+                    'connect_timeout': 5,
+                    'read_timeout': 30,
+                    'retries': 3,
+                    'backoff': 0.5,
+                    'gzip': True
+                }
             },
             'broker': {
                 'port': 1883,
                 'username': None,
-                'password': None
-            }
+                'password': None,
+                'connections': 1,
+                'max_queued': 1000
+            },
+            'queue': {
+                'size': 1000,
+                'spill': None
+            },
+            'vdv435': {
+                'request_timeout': 30
+            },
+            'filter': {
+                'distance': 0,
+                'min_interval': 0,
+                'max_silence': 0
+            },
+            'history': {
+                'size': 4,
+                'max_speed': 70,
+                'min_distance': 5
+            },
+            'columnar': False,
+            'weight': 1
         }
         
         # run over each instance configured, then verify and enhance it with defaults
@@ -40,12 +163,56 @@ class Configuration:
             if 'interval' in instance['adapter'] and not isinstance(instance['adapter']['interval'], int):
                 cls._raise_invalid_key_exception('adapter.interval', instance['id'])
 
+            if 'phase' in instance['adapter'] and instance['adapter']['phase'] is not None and not isinstance(instance['adapter']['phase'], (int, float)):
+                cls._raise_invalid_key_exception('adapter.phase', instance['id'])
+
+            for key in ['chunk_size', 'workers']:
+                if key in instance['adapter'] and (not isinstance(instance['adapter'][key], int) or instance['adapter'][key] < 1):
+                    cls._raise_invalid_key_exception(f"adapter.{key}", instance['id'])
+
+            if 'push' in instance['adapter']:
+                for key in ['buffer_size', 'max_body_size']:
+                    if key in instance['adapter']['push'] and (not isinstance(instance['adapter']['push'][key], int) or instance['adapter']['push'][key] < 1):
+                        cls._raise_invalid_key_exception(f"adapter.push.{key}", instance['id'])
+
+            if 'stream' in instance['adapter']:
+                if 'format' in instance['adapter']['stream'] and instance['adapter']['stream']['format'] not in ['auto', 'ndjson', 'csv']:
+                    cls._raise_invalid_key_exception('adapter.stream.format', instance['id'])
+
+                if 'speed' in instance['adapter']['stream'] and (not isinstance(instance['adapter']['stream']['speed'], (int, float)) or instance['adapter']['stream']['speed'] < 0):
+                    cls._raise_invalid_key_exception('adapter.stream.speed', instance['id'])
+
+                for key in ['rebase', 'loop']:
+                    if key in instance['adapter']['stream'] and not isinstance(instance['adapter']['stream'][key], bool):
+                        cls._raise_invalid_key_exception(f"adapter.stream.{key}", instance['id'])
+
+                for key in ['buffer_size', 'batch_size']:
+                    if key in instance['adapter']['stream'] and (not isinstance(instance['adapter']['stream'][key], int) or instance['adapter']['stream'][key] < 1):
+                        cls._raise_invalid_key_exception(f"adapter.stream.{key}", instance['id'])
+
+            if 'http' in instance['adapter'] and not isinstance(instance['adapter']['http'], dict):
+                cls._raise_invalid_key_exception('adapter.http', instance['id'])
+
             # verify required broker parameters
             if 'broker' not in instance:
                 cls._raise_invalid_key_exception('broker', instance['id'])
             
             if 'host' not in instance['broker']:
                 cls._raise_invalid_key_exception('broker.host', instance['id'])
+
+            if 'connections' in instance['broker'] and (not isinstance(instance['broker']['connections'], int) or instance['broker']['connections'] < 1):
+                cls._raise_invalid_key_exception('broker.connections', instance['id'])
+
+            if 'max_queued' in instance['broker'] and (not isinstance(instance['broker']['max_queued'], int) or instance['broker']['max_queued'] < 0):
+                cls._raise_invalid_key_exception('broker.max_queued', instance['id'])
+
+            # verify queue parameters
+            if 'queue' in instance:
+                if 'size' in instance['queue'] and (not isinstance(instance['queue']['size'], int) or instance['queue']['size'] < 1):
+                    cls._raise_invalid_key_exception('queue.size', instance['id'])
+
+                if 'spill' in instance['queue'] and instance['queue']['spill'] is not None and not isinstance(instance['queue']['spill'], str):
+                    cls._raise_invalid_key_exception('queue.spill', instance['id'])
             
             # verify vdv435 parameters
             if 'vdv435' not in instance:
@@ -56,12 +223,41 @@ class Configuration:
             
             if 'itcs' not in instance['vdv435']:
                 cls._raise_invalid_key_exception('vdv435.itcs', instance['id'])
+
+            if 'request_timeout' in instance['vdv435'] and not isinstance(instance['vdv435']['request_timeout'], int):
+                cls._raise_invalid_key_exception('vdv435.request_timeout', instance['id'])
+            
+            # verify filter parameters
+            if 'filter' in instance:
+                for key in ['distance', 'min_interval', 'max_silence']:
+                    if key in instance['filter'] and (not isinstance(instance['filter'][key], (int, float)) or instance['filter'][key] < 0):
+                        cls._raise_invalid_key_exception(f"filter.{key}", instance['id'])
+
+            # verify history parameters
+            if 'history' in instance:
+                if 'size' in instance['history'] and (not isinstance(instance['history']['size'], int) or instance['history']['size'] == 1 or instance['history']['size'] < 0):
+                    cls._raise_invalid_key_exception('history.size', instance['id'])
+
+                for key in ['max_speed', 'min_distance']:
+                    if key in instance['history'] and (not isinstance(instance['history'][key], (int, float)) or instance['history'][key] < 0):
+                        cls._raise_invalid_key_exception(f"history.{key}", instance['id'])
+
+            if 'columnar' in instance and not isinstance(instance['columnar'], bool):
+                cls._raise_invalid_key_exception('columnar', instance['id'])
+
+            if 'weight' in instance and (not isinstance(instance['weight'], (int, float)) or instance['weight'] <= 0):
+                cls._raise_invalid_key_exception('weight', instance['id'])
             
             # merge default configuration per instance afterwards
             config['instances'][idx] = cls._merge_config(default_instance_config, instance)
 
         return config
 
+    @classmethod
+    def changed_keys(cls, old: dict, new: dict) -> set[str]:
+        # top level keys with different values in both configurations
+        return {k for k in set(old) | set(new) if old.get(k) != new.get(k)}
+
     @classmethod
     def _raise_invalid_key_exception(cls, key: str, inst: str) -> None:
         raise RuntimeError(f"Configuration key \"{key}\" missing or invalid in instance \"{inst}\".")
@@ -71,4 +267,4 @@ class Configuration:
         if isinstance(defaults, dict) and isinstance(actual, dict):
             return {k: cls._merge_config(defaults.get(k, {}), actual.get(k, {})) for k in set(defaults) | set(actual)}
         
-        return actual if actual else defaults
\ No newline at end of file
+        return defaults if actual is None or actual == {} else actual
\ No newline at end of file
@@ -0,0 +1,64 @@
+import time
+
+from dataclasses import dataclass
+
+from avl2gtfsrt.integration.common.shared import haversine_distance
+from avl2gtfsrt.integration.model.types import VehiclePosition
+
+
+@dataclass(slots=True, frozen=True)
+class PublishedPosition:
+    latitude: float
+    longitude: float
+    timestamp: int
+    published_at: float
+
+class PositionFilter:
+
+    def __init__(self, config: dict) -> None:
+        self.configure(config)
+
+        # last published position per vehicle ID
+        self._published_positions: dict[any, PublishedPosition] = dict()
+
+    def configure(self, config: dict) -> None:
+        # parameters may change at runtime, published positions are kept
+        self.distance: float = config['distance']
+        self.min_interval: int = config['min_interval']
+        self.max_silence: int = config['max_silence']
+
+    def should_publish(self, vehicle_position: VehiclePosition) -> bool:
+        published_position: PublishedPosition|None = self._published_positions.get(vehicle_position.vehicle.id)
+        if published_position is None:
+            return True
+        
+        # publish at least once per max. silence as heartbeat,
+        # even if the vehicle reports more often than the minimum interval
+        if self.max_silence > 0 and time.monotonic() - published_position.published_at >= self.max_silence:
+            return True
+        
+        # otherwise never publish positions measured closer than the minimum interval
+        if self.min_interval > 0 and vehicle_position.timestamp - published_position.timestamp < self.min_interval:
+            return False
+        
+        # publish only if the vehicle moved farther than the dead-band distance,
+        # GNSS jitter of parked vehicles is dropped this way
+        distance: float = haversine_distance(
+            published_position.latitude, 
+            published_position.longitude, 
+            vehicle_position.latitude, 
+            vehicle_position.longitude
+        )
+
+        return distance > self.distance
+    
+    def mark_published(self, vehicle_position: VehiclePosition) -> None:
+        self._published_positions[vehicle_position.vehicle.id] = PublishedPosition(
+            latitude=vehicle_position.latitude,
+            longitude=vehicle_position.longitude,
+            timestamp=vehicle_position.timestamp,
+            published_at=time.monotonic()
+        )
+
+    def forget(self, vehicle_id: any) -> None:
+        self._published_positions.pop(vehicle_id, None)
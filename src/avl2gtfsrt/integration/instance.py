@@ -1,139 +1,539 @@
+import asyncio
 import logging
 import time
 
+from concurrent.futures import Executor
 from datetime import datetime, timedelta
 from threading import Event, Thread
 
+from avl2gtfsrt.integration.adapter.asyncadapter import AsyncBaseAdapter, AsyncExecutorAdapter
 from avl2gtfsrt.integration.adapter.baseadapter import BaseAdapter
+from avl2gtfsrt.integration.adapter.registry import ADAPTERS
+from avl2gtfsrt.integration.filter import PositionFilter
+from avl2gtfsrt.integration.metrics import POLL_DURATION, POLL_LAG, POSITION_AGE, POSITIONS_FILTERED, POSITIONS_PUBLISHED, POSITIONS_RECEIVED, POSITIONS_REJECTED
+from avl2gtfsrt.integration.model.history import PositionHistory
+from avl2gtfsrt.integration.model.registry import VehicleRegistry
+from avl2gtfsrt.integration.model.table import PositionMap, PositionTable
 from avl2gtfsrt.integration.model.types import Vehicle, VehiclePosition
+from avl2gtfsrt.integration.scheduler import Scheduler
+from avl2gtfsrt.integration.state import StateStore
+from avl2gtfsrt.integration.iom.asyncclient import AsyncIomClient
 from avl2gtfsrt.integration.iom.client import IomClient
+from avl2gtfsrt.integration.iom.connection import AsyncMqttConnection, MqttConnection, MqttConnectionPool
+from avl2gtfsrt.integration.iom.queue import PublishQueue
 
 
 class AvlDataInstance:
 
-    def __init__(self, config: dict) -> None:
+    def __init__(self, config: dict, connections: MqttConnectionPool|None = None, scheduler: Scheduler|None = None, state: StateStore|None = None) -> None:
         self.id = config['id']
 
-        self._iom: IomClient = IomClient(
-            self.id,
-            config['vdv435']['organisation'],
-            config['vdv435']['itcs'],
-            config['broker']
-        )
+        # state is checkpointed periodically for warm restarts if a store is set
+        self._state: StateStore|None = state
+        self._state_checkpoint: float = time.monotonic()
+
+        # polls are triggered by the scheduler on fixed deadlines
+        self._scheduler: Scheduler = scheduler if scheduler is not None else Scheduler({'spread': False, 'jitter': 0})
+
+        # instances sharing the same broker share their MQTT connections
+        self._connections: MqttConnectionPool = connections if connections is not None else self._create_connection_pool()
+
+        self._iom: IomClient = self._create_iom_client(config)
+
+        self._vehicles: VehicleRegistry = VehicleRegistry()
+
+        # last published position per vehicle, optionally in a columnar table for large fleets
+        self._vehicle_positions: PositionMap = PositionTable() if config['columnar'] else PositionMap()
 
-        self._vehicles: list[Vehicle] = list()
-        self._vehicle_positions: dict[any, VehiclePosition] = dict()
+        # recent positions per vehicle for deriving bearing and velocity and rejecting implausible positions
+        self._history: PositionHistory = PositionHistory(config['history'])
+
+        # filter stage between adapter output and publishing
+        self._filter: PositionFilter = PositionFilter(config['filter'])
 
         # setup everything for the adapter and thread management
-        if config['adapter']['type'] == 'pajgps':
-            from avl2gtfsrt.integration.adapter.pajgps.adapter import PajGpsAdapter
-            self._adapter: BaseAdapter = PajGpsAdapter(self.id, config['adapter'])
-        else:
-            raise ValueError(f"Unknown adapter type {config['adapter']} in instance \"{self.id}\"!")
+        self._adapter: BaseAdapter = self._create_adapter(config)
+        self._thread: Thread|None = None
 
-        self._thread = Thread(target=self._run_internal)
+        self._scheduler.register(self.id, self._adapter.interval, config['adapter']['phase'])
+
+        # adapters receiving pushed data trigger a poll immediately
+        self._adapter.set_notify(lambda: self._scheduler.trigger(self.id))
 
         # keep track of stopping flag
         # required here for 'cooperative stopping'
         self._should_run = Event()
         self._should_run.set()
 
+        self._shutdown_deadline: float|None = None
+
+        # instances resume their vehicles after a restart if a state store is set,
+        # instances removed for good log off their vehicles anyway
+        self._resume: bool = True
+
+        # metrics of this instance
+        self._poll_duration = POLL_DURATION.labels(self.id)
+        self._positions_received = POSITIONS_RECEIVED.labels(self.id)
+        self._positions_published = POSITIONS_PUBLISHED.labels(self.id)
+        self._positions_filtered = {reason: POSITIONS_FILTERED.labels(self.id, reason) for reason in ['unchanged', 'suppressed', 'outdated']}
+        self._position_age = POSITION_AGE.labels(self.id)
+        POLL_LAG.labels(self.id).track(lambda: self._scheduler.lag(self.id))
+
     def run(self) -> None:
+        # daemon thread, the process must not wait for instances
+        # which did not finish their shutdown in time
+        self._thread = Thread(target=self._run_internal, daemon=True)
         self._thread.start()
 
-    def stop(self) -> None:
+    def stop(self, timeout: float|None = None, resume: bool = True) -> None:
+        if timeout is not None:
+            self._shutdown_deadline = time.monotonic() + timeout
+
+        self._resume = resume
+
+        # wake up the instance from waiting for the next poll
+        # and interrupt running requests of the current poll
         self._should_run.clear()
+        self._scheduler.cancel(self.id)
+        self._iom.interrupt(self._shutdown_deadline)
+
+    def join(self, timeout: float|None = None) -> bool:
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+            return not self._thread.is_alive()
+        
+        return True
+
+    def is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def reconfigure(self, config: dict) -> None:
+        # only the filter and the history are changed at runtime,
+        # other changes require a restart of the instance
+        self._filter.configure(config['filter'])
+        self._history.configure(config['history'])
+
+    def _create_connection_pool(self) -> MqttConnectionPool:
+        return MqttConnectionPool(MqttConnection)
+
+    def _create_iom_client(self, config: dict) -> IomClient:
+        connection: MqttConnection = self._connections.acquire(config['broker'])
+
+        return IomClient(
+            self.id,
+            config['vdv435']['organisation'],
+            config['vdv435']['itcs'],
+            connection,
+            config['vdv435']['request_timeout'],
+            PublishQueue(self.id, connection, config['queue']['size'], config['queue']['spill'])
+        )
+
+    def _create_adapter(self, config: dict) -> BaseAdapter:
+        # adapters are imported on first use, so only the configured ones are loaded
+        adapter: type|None = ADAPTERS.resolve(config['adapter']['type'])
+        if adapter is None:
+            raise ValueError(f"Unknown adapter type {config['adapter']} in instance \"{self.id}\"!")
+
+        return adapter(self.id, config['adapter'])
 
     def _run_internal(self) -> None:
+
+        # resume from the last state snapshot
+        self._restore_state()
         
         # startup IoM client
         self._iom.start()
 
         # main loop, run adapter logic here ...
-        while self._should_run.is_set():
+        # wait for the next deadline of this instance before each poll
+        while self._should_run.is_set() and self._scheduler.wait(self.id):
 
+            poll_start: float = time.monotonic()
             try:
                 # call configured adapter in order to get all current vehicle positions
                 logging.info(f"{self.id}/{self.__class__.__name__}: Loading current vehicles ...")
                 vehicles_result: list[Vehicle] = self._adapter.get_vehicles()
 
-                # sync vehicle list
-                # log off vehicles which are not appearing in 
-                # adapters vehicle list anymore 
-                for vehicle in vehicles_result:
-                    if vehicle not in self._vehicles:
-                        self._vehicles.append(vehicle)
-
-                for vehicle in self._vehicles:
-                    if vehicle not in vehicles_result:
-                        logging.info(f"{self.id}/{self.__class__.__name__}: Vehicle \"{vehicle.vehicle_ref}\" disappeared.")
-                        logging.info(f"{self.id}/{self.__class__.__name__}: Logging off vehicle \"{vehicle.vehicle_ref}\" ...")
-                        
-                        self._vehicles.remove(vehicle)
-                        del self._vehicle_positions[vehicle]
-                        
-                        if vehicle.is_logged_on:
-                            try:
-                                self._iom.log_off_vehicle(vehicle)
-                            except Exception as ex:
-                                logging.error(ex)
+                # sync vehicle list and log off disappeared vehicles,
+                # they're not known anymore at shutdown, so they're logged off within the shutdown deadline if stopping
+                self._log_off_vehicles(self._sync_vehicles(vehicles_result), self._get_shutdown_timeout())
 
                 # load and process vehicle positions for all vehicles
-                # log on vehicles if they have delivered new data
-                # log off vehicles which have not delivered data for the last 60 minutes
                 logging.info(f"{self.id}/{self.__class__.__name__}: Loading current vehicle positions of {len(vehicles_result)} vehicles ...")
                 vehicle_positions_result: list[VehiclePosition] = self._adapter.get_vehicle_positions()
-                vehicle_positions_published: bool = False
-
-                for vehicle_position in vehicle_positions_result:
-                    reference_timestamp: int = int((datetime.now() - timedelta(seconds=self._adapter.autologoff)).timestamp())
-                    last_vehicle_position: VehiclePosition|None = self._vehicle_positions[vehicle_position.vehicle.id] if vehicle_position.vehicle.id in self._vehicle_positions else None
-
-                    if vehicle_position.timestamp >= reference_timestamp and (last_vehicle_position is None or vehicle_position.latitude != last_vehicle_position.latitude or vehicle_position.longitude != last_vehicle_position.longitude):
-                        if not vehicle_position.vehicle.is_logged_on:
-                            try:
-                                logging.info(f"{self.id}/{self.__class__.__name__}: Logging on vehicle \"{vehicle.vehicle_ref}\" ...")
-                                
-                                self._iom.log_on_vehicle(vehicle_position.vehicle)
-                                vehicle_position.vehicle.is_logged_on = True
-                            except Exception as ex:
-                                logging.error(ex)
-
-                                continue
-                        
-                        logging.info(f"{self.id}/{self.__class__.__name__}: Publishing GNSS position update for vehicle \"{vehicle.vehicle_ref}\" ...")
-                        self._iom.publish_gnss_position_update(vehicle_position)
-
-                        self._vehicle_positions[vehicle_position.vehicle.id] = vehicle_position 
-
-                        vehicle_positions_published = True
-                        
-                    elif vehicle_position.timestamp < reference_timestamp and vehicle_position.vehicle.is_logged_on:
-                        try:
-                            logging.info(f"{self.id}/{self.__class__.__name__}: Logging off vehicle \"{vehicle.vehicle_ref}\" ...")
-                                
-                            self._iom.log_off_vehicle(vehicle_position.vehicle)
-                            vehicle_position.vehicle.is_logged_on = False
-                        except Exception as ex:
-                            logging.error(ex)
-
-                if not vehicle_positions_published:
-                    logging.info(f"{self.id}/{self.__class__.__name__}: No actual vehicle positions found.")
+
+                vehicle_positions_to_publish, vehicles_to_log_on, vehicles_to_log_off = self._evaluate_vehicle_positions(vehicle_positions_result)
+
+                # skip the rest of the poll if the instance is stopping meanwhile
+                if not self._should_run.is_set():
+                    break
+
+                # log on and log off all vehicles at once,
+                # requests of a batch are running concurrently,
+                # the instance may be stopped during each batch, the rest is left to the shutdown then
+                self._log_on_vehicles(vehicles_to_log_on)
+                if not self._should_run.is_set():
+                    break
+
+                self._log_off_vehicles(vehicles_to_log_off)
+                if not self._should_run.is_set():
+                    break
+
+                self._publish_vehicle_positions(vehicle_positions_to_publish)
+
+                self._checkpoint_state()
+
+            except Exception as ex:
+                logging.error(ex)
+            finally:
+                self._poll_duration.observe(time.monotonic() - poll_start)
+
+        # shutdown the instance here ...
+        # log off all actively monitored vehicles, unless they're resumed after a restart,
+        # the log off is bounded by the shutdown deadline
+        if self._state is None or not self._resume:
+            self._log_off_vehicles([v for v in self._vehicles if v.is_logged_on], self._get_shutdown_timeout())
+
+        self._finish_state()
+
+        self._adapter.close()
+        self._iom.terminate()
+
+    def _sync_vehicles(self, vehicles_result: list[Vehicle]) -> list[Vehicle]:
+        # sync vehicle list
+        # return vehicles which are not appearing in 
+        # adapters vehicle list anymore and need to be logged off
+        _, disappeared_vehicles = self._vehicles.sync(vehicles_result)
+        for vehicle in disappeared_vehicles:
+            logging.info(f"{self.id}/{self.__class__.__name__}: Vehicle \"{vehicle.vehicle_ref}\" disappeared.")
+            
+            self._vehicle_positions.remove(vehicle.id)
+            self._filter.forget(vehicle.id)
+            self._history.remove(vehicle.id)
+
+        return [v for v in disappeared_vehicles if v.is_logged_on]
+
+    def _evaluate_vehicle_positions(self, vehicle_positions_result: list[VehiclePosition]) -> tuple[list[VehiclePosition], list[Vehicle], list[Vehicle]]:
+        # log on vehicles if they have delivered new data
+        # log off vehicles which have not delivered data within the autologoff duration
+        vehicle_positions_to_publish: list[VehiclePosition] = list()
+        vehicles_to_log_on: dict[any, Vehicle] = dict()
+        vehicles_to_log_off: dict[any, Vehicle] = dict()
+
+        # adapters may deliver multiple positions per vehicle,
+        # they're evaluated and published in order of their timestamps
+        reference_timestamp: int = int((datetime.now() - timedelta(seconds=self._adapter.autologoff)).timestamp())
+        vehicle_positions_sorted: list[VehiclePosition] = sorted(vehicle_positions_result, key=lambda p: p.timestamp)
+
+        # positions equal to the last published ones are detected for the whole fleet at once,
+        # they are only passed to the filter if it may publish them as heartbeat
+        vehicle_positions_changed: list[bool] = self._vehicle_positions.changed(vehicle_positions_sorted)
+        heartbeat: bool = self._filter.max_silence > 0
+
+        # positions not published are counted by their reason, implausible ones are counted as rejected
+        filtered: dict[str, int] = {reason: 0 for reason in self._positions_filtered}
+
+        for vehicle_position, changed in zip(vehicle_positions_sorted, vehicle_positions_changed):
+            vehicle: Vehicle = vehicle_position.vehicle
+
+            if not changed and not heartbeat:
+                filtered['unchanged'] = filtered['unchanged'] + 1
+                continue
+
+            # implausible positions are rejected before the filter,
+            # bearing and velocity of the others are derived from the recent positions
+            if vehicle_position.timestamp >= reference_timestamp:
+                vehicle_position, reason = self._history.add(vehicle_position)
+                if vehicle_position is None:
+                    logging.debug(f"{self.id}/{self.__class__.__name__}: Rejected {reason} position of vehicle \"{vehicle.vehicle_ref}\".")
+                    POSITIONS_REJECTED.labels(self.id, reason).inc()
+                    continue
+            
+            if vehicle_position.timestamp < reference_timestamp:
+                filtered['outdated'] = filtered['outdated'] + 1
+                if vehicle.is_logged_on:
+                    vehicles_to_log_off[vehicle.id] = vehicle
+
+            elif self._filter.should_publish(vehicle_position):
+                if not vehicle.is_logged_on:
+                    vehicles_to_log_on[vehicle.id] = vehicle
+                
+                vehicle_positions_to_publish.append(vehicle_position)
+                self._filter.mark_published(vehicle_position)
+
+            else:
+                # unchanged positions only passed for a possible heartbeat are still unchanged
+                reason: str = 'suppressed' if changed else 'unchanged'
+                filtered[reason] = filtered[reason] + 1
+
+        self._positions_received.inc(len(vehicle_positions_result))
+        for reason, count in filtered.items():
+            self._positions_filtered[reason].inc(count)
+
+        # log off vehicles which did not deliver any position at all for the autologoff duration
+        published_vehicle_ids: set[any] = {p.vehicle.id for p in vehicle_positions_to_publish}
+        for vehicle in self._vehicle_positions.older_than(reference_timestamp):
+            if vehicle.is_logged_on and vehicle.id not in published_vehicle_ids:
+                vehicles_to_log_off[vehicle.id] = vehicle
+
+        return vehicle_positions_to_publish, list(vehicles_to_log_on.values()), list(vehicles_to_log_off.values())
+
+    def _publish_vehicle_positions(self, vehicle_positions: list[VehiclePosition]) -> None:
+        # publish positions of all vehicles which are logged on successfully
+        vehicle_positions_published: bool = False
+        for vehicle_position in vehicle_positions:
+            if not vehicle_position.vehicle.is_logged_on:
+                self._filter.forget(vehicle_position.vehicle.id)
+                continue
+
+            logging.debug(f"{self.id}/{self.__class__.__name__}: Publishing GNSS position update for vehicle \"{vehicle_position.vehicle.vehicle_ref}\" ...")
+
+            # a single invalid position must not stop publishing the positions of the remaining vehicles
+            try:
+                self._iom.publish_gnss_position_update(vehicle_position)
+            except Exception as ex:
+                logging.error(f"{self.id}/{self.__class__.__name__}: Failed to publish GNSS position update for vehicle \"{vehicle_position.vehicle.vehicle_ref}\": {ex}")
+                continue
+
+            self._positions_published.inc()
+            self._position_age.observe(max(0.0, time.time() - vehicle_position.timestamp))
+
+            self._vehicle_positions.update(vehicle_position)
+
+            vehicle_positions_published = True
+
+        if not vehicle_positions_published:
+            logging.info(f"{self.id}/{self.__class__.__name__}: No actual vehicle positions found.")
+
+    def _log_on_vehicles(self, vehicles: list[Vehicle]) -> None:
+        if len(vehicles) == 0:
+            return
+        
+        logging.info(f"{self.id}/{self.__class__.__name__}: Logging on vehicles {[v.vehicle_ref for v in vehicles]} ...")
+        
+        results: dict[any, bool] = self._iom.log_on_vehicles(vehicles)
+        self._apply_log_on_results(vehicles, results)
+
+    def _log_off_vehicles(self, vehicles: list[Vehicle], timeout: float|None = None) -> None:
+        if len(vehicles) == 0:
+            return
+        
+        logging.info(f"{self.id}/{self.__class__.__name__}: Logging off vehicles {[v.vehicle_ref for v in vehicles]} ...")
+        
+        results: dict[any, bool] = self._iom.log_off_vehicles(vehicles, timeout)
+        self._apply_log_off_results(vehicles, results)
+
+    def _restore_state(self) -> None:
+        if self._state is None:
+            return
+        
+        state: dict|None = self._state.load(self.id)
+        if state is None:
+            return
+        
+        for vehicle_data in state['vehicles']:
+            self._vehicles.add(Vehicle(
+                id=vehicle_data['id'],
+                vehicle_ref=vehicle_data['vehicle_ref'],
+                is_logged_on=vehicle_data['is_logged_on']
+            ))
+
+        # last published positions are restored into the filter as well,
+        # so unchanged positions are not published again after the restart
+        for vehicle_position_data in state['vehicle_positions']:
+            vehicle: Vehicle|None = self._vehicles.get(vehicle_position_data['id'])
+            if vehicle is not None:
+                vehicle_position: VehiclePosition = VehiclePosition(
+                    vehicle=vehicle,
+                    latitude=vehicle_position_data['latitude'],
+                    longitude=vehicle_position_data['longitude'],
+                    timestamp=vehicle_position_data['timestamp']
+                )
+
+                self._vehicle_positions.update(vehicle_position)
+                self._filter.mark_published(vehicle_position)
+
+        self._adapter.set_state(state['adapter'], list(self._vehicles))
+
+        logging.info(f"{self.id}/{self.__class__.__name__}: Restored {len(self._vehicles)} vehicles, {len([v for v in self._vehicles if v.is_logged_on])} of them logged on.")
+
+    def _checkpoint_state(self, force: bool = False) -> None:
+        if self._state is None:
+            return
+        
+        if not force and time.monotonic() - self._state_checkpoint < self._state.interval:
+            return
+        
+        try:
+            self._state.save(self.id, {
+                'vehicles': [{
+                    'id': v.id,
+                    'vehicle_ref': v.vehicle_ref,
+                    'is_logged_on': v.is_logged_on
+                } for v in self._vehicles],
+                'vehicle_positions': [{
+                    'id': p.vehicle.id,
+                    'latitude': p.latitude,
+                    'longitude': p.longitude,
+                    'timestamp': p.timestamp
+                } for p in self._vehicle_positions],
+                'adapter': self._adapter.get_state()
+            })
+
+            self._state_checkpoint = time.monotonic()
+        except Exception as ex:
+            logging.error(f"{self.id}/{self.__class__.__name__}: Failed to checkpoint state: {ex}")
+
+    def _finish_state(self) -> None:
+        if self._state is None:
+            return
+        
+        # the snapshot of an instance not resuming anymore would be outdated
+        if self._resume:
+            self._checkpoint_state(True)
+        else:
+            try:
+                self._state.delete(self.id)
+            except Exception as ex:
+                logging.error(f"{self.id}/{self.__class__.__name__}: Failed to delete state: {ex}")
+
+    def _get_shutdown_timeout(self) -> float|None:
+        if self._shutdown_deadline is None:
+            return None
+        
+        return max(0.0, self._shutdown_deadline - time.monotonic())
+
+    def _apply_log_on_results(self, vehicles: list[Vehicle], results: dict[any, bool]) -> None:
+        for vehicle in vehicles:
+            if results[vehicle.id]:
+                vehicle.is_logged_on = True
+
+    def _apply_log_off_results(self, vehicles: list[Vehicle], results: dict[any, bool]) -> None:
+        for vehicle in vehicles:
+            if results[vehicle.id]:
+                vehicle.is_logged_on = False
+
+
+class AsyncAvlDataInstance(AvlDataInstance):
+
+    def __init__(self, config: dict, connections: MqttConnectionPool|None = None, scheduler: Scheduler|None = None, state: StateStore|None = None, executor: Executor|None = None) -> None:
+        # blocking adapters are run in this executor, it's required by the adapter created below
+        self._executor: Executor|None = executor
+
+        super().__init__(config, connections, scheduler, state)
+
+        # task running this instance in the event loop
+        self._task: asyncio.Task|None = None
+
+    def run(self) -> None:
+        raise RuntimeError(f"Instance \"{self.id}\" runs in the asyncio runtime, use run_async instead!")
+
+    async def run_async(self) -> None:
+        self._task = asyncio.current_task()
+
+        # resume from the last state snapshot
+        self._restore_state()
+
+        # startup IoM client
+        await self._iom.start()
+
+        # main loop, run adapter logic here ...
+        # wait for the next deadline of this instance before each poll
+        while self._should_run.is_set() and await self._scheduler.wait_async(self.id):
+
+            poll_start: float = time.monotonic()
+            try:
+                # call configured adapter in order to get all current vehicle positions
+                logging.info(f"{self.id}/{self.__class__.__name__}: Loading current vehicles ...")
+                vehicles_result: list[Vehicle] = await self._adapter.get_vehicles()
+
+                # sync vehicle list and log off disappeared vehicles,
+                # they're not known anymore at shutdown, so they're logged off within the shutdown deadline if stopping
+                await self._log_off_vehicles_async(self._sync_vehicles(vehicles_result), self._get_shutdown_timeout())
+
+                # load and process vehicle positions for all vehicles
+                logging.info(f"{self.id}/{self.__class__.__name__}: Loading current vehicle positions of {len(vehicles_result)} vehicles ...")
+                vehicle_positions_result: list[VehiclePosition] = await self._adapter.get_vehicle_positions()
+
+                vehicle_positions_to_publish, vehicles_to_log_on, vehicles_to_log_off = self._evaluate_vehicle_positions(vehicle_positions_result)
+
+                # skip the rest of the poll if the instance is stopping meanwhile
+                if not self._should_run.is_set():
+                    break
+
+                # log on and log off all vehicles at once,
+                # requests of a batch are running concurrently
+                await asyncio.gather(
+                    self._log_on_vehicles_async(vehicles_to_log_on),
+                    self._log_off_vehicles_async(vehicles_to_log_off)
+                )
+
+                # the instance may be stopped during the batch, the rest is left to the shutdown then
+                if not self._should_run.is_set():
+                    break
+
+                self._publish_vehicle_positions(vehicle_positions_to_publish)
+
+                self._checkpoint_state()
 
             except Exception as ex:
                 logging.error(ex)
             finally:
-                # wait for the adapter configured timespan until the next request
-                time.sleep(self._adapter.interval)
+                self._poll_duration.observe(time.monotonic() - poll_start)
 
         # shutdown the instance here ...
-        # log off all actively monitored vehicles
-        for vehicle in self._vehicles:
-            if vehicle.is_logged_on:
-                try:
-                    logging.info(f"{self.id}/{self.__class__.__name__}: Logging off vehicle \"{vehicle.vehicle_ref}\" ...")
-                    self._iom.log_off_vehicle(vehicle)
-                except Exception as ex:
-                    logging.error(ex)
-
-        self._iom.terminate()
\ No newline at end of file
+        # log off all actively monitored vehicles, unless they're resumed after a restart,
+        # the log off is bounded by the shutdown deadline
+        if self._state is None or not self._resume:
+            await self._log_off_vehicles_async([v for v in self._vehicles if v.is_logged_on], self._get_shutdown_timeout())
+
+        self._finish_state()
+
+        await self._adapter.close()
+        self._iom.terminate()
+
+    def is_alive(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _create_connection_pool(self) -> MqttConnectionPool:
+        return MqttConnectionPool(AsyncMqttConnection)
+
+    def _create_iom_client(self, config: dict) -> AsyncIomClient:
+        connection: MqttConnection = self._connections.acquire(config['broker'])
+
+        return AsyncIomClient(
+            self.id,
+            config['vdv435']['organisation'],
+            config['vdv435']['itcs'],
+            connection,
+            config['vdv435']['request_timeout'],
+            PublishQueue(self.id, connection, config['queue']['size'], config['queue']['spill'])
+        )
+
+    def _create_adapter(self, config: dict) -> AsyncBaseAdapter:
+        adapter: BaseAdapter|AsyncBaseAdapter = super()._create_adapter(config)
+        if isinstance(adapter, AsyncBaseAdapter):
+            return adapter
+        
+        # blocking adapters are run in the executor shared by all instances,
+        # or the default executor of the event loop if none is set
+        return AsyncExecutorAdapter(self.id, config['adapter'], adapter, self._executor)
+
+    async def _log_on_vehicles_async(self, vehicles: list[Vehicle]) -> None:
+        if len(vehicles) == 0:
+            return
+        
+        logging.info(f"{self.id}/{self.__class__.__name__}: Logging on vehicles {[v.vehicle_ref for v in vehicles]} ...")
+        
+        results: dict[any, bool] = await self._iom.log_on_vehicles(vehicles)
+        self._apply_log_on_results(vehicles, results)
+
+    async def _log_off_vehicles_async(self, vehicles: list[Vehicle], timeout: float|None = None) -> None:
+        if len(vehicles) == 0:
+            return
+        
+        logging.info(f"{self.id}/{self.__class__.__name__}: Logging off vehicles {[v.vehicle_ref for v in vehicles]} ...")
+        
+        results: dict[any, bool] = await self._iom.log_off_vehicles(vehicles, timeout)
+        self._apply_log_off_results(vehicles, results)
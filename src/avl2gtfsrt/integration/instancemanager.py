@@ -1,60 +1,343 @@
+import asyncio
 import logging
+import os
 import signal
 import time
-import yaml
 
-from threading import Event
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock
 
-from avl2gtfsrt.integration.instance import AvlDataInstance
+from avl2gtfsrt.integration.instance import AvlDataInstance, AsyncAvlDataInstance
 from avl2gtfsrt.integration.config import Configuration
+from avl2gtfsrt.integration.iom.connection import AsyncMqttConnection, MqttConnection, MqttConnectionPool
+from avl2gtfsrt.integration.metrics import REGISTRY, MetricsServer
+from avl2gtfsrt.integration.scheduler import Scheduler
+from avl2gtfsrt.integration.state import StateStore
+
+
+# changed instance blocks requiring a restart of the instance,
+# vehicles are logged off before moving them to another broker or organisation
+RESTART_KEYS: set[str] = {'adapter', 'broker', 'vdv435', 'queue', 'columnar'}
+RELOCATE_KEYS: set[str] = {'broker', 'vdv435'}
+
+# global keys applied when reloading the configuration
+RELOAD_KEYS: set[str] = {'instances', 'shutdown_timeout', 'reload'}
 
 class InstanceManager():
-    
-    def __init__(self, config_filename: str) -> None:
-        logging.info(f"{self.__class__.__name__}: Loading configuration file ...")
-        
-        # load config and set default values
-        with open(config_filename, 'r') as config_file:
-            self._config = yaml.safe_load(config_file)
 
-        self._config: dict = Configuration.default_config(self._config)
+    def __init__(self, config_filename: str|None, config: dict|None = None) -> None:
+        self._config_filename: str|None = config_filename
 
-        # keep track of all instance threads
+        # load config and set default values, unless it's passed by the supervisor already
+        if config is None:
+            logging.info(f"{self.__class__.__name__}: Loading configuration file ...")
+            config = Configuration.load(config_filename)
+
+        self._config: dict = Configuration.default_config(config)
+
+        # keep track of all instances
         self._instances: list[AvlDataInstance] = list()
 
-        # start a thread for each configured instance
-        for i in self._config['instances']:
-            logging.info(f"{self.__class__.__name__}: Creating instance \"{i['id']}\" ...")
+        # MQTT connections are shared between all instances using the same broker
+        if self._config['runtime'] == 'asyncio':
+            self._connections: MqttConnectionPool = MqttConnectionPool(AsyncMqttConnection)
+        else:
+            self._connections: MqttConnectionPool = MqttConnectionPool(MqttConnection)
 
-            instance: AvlDataInstance = AvlDataInstance(i)
-            instance.run()
+        # blocking adapters in the asyncio runtime share one executor sized for all instances,
+        # the default executor of the event loop has a few threads only
+        self._executor: ThreadPoolExecutor|None = self._create_executor() if self._config['runtime'] == 'asyncio' else None
+
+        # the scheduler triggers the polls of all instances
+        self._scheduler: Scheduler = Scheduler(self._config['scheduler'])
+
+        # state snapshots of all instances are stored in one file, if enabled
+        self._state: StateStore|None = StateStore(self._config['state']) if self._config['state']['path'] is not None else None
+
+        # metrics are served on a local endpoint, if enabled
+        self._metrics: MetricsServer|None = MetricsServer(self._config['metrics']['endpoint']) if self._config['metrics']['endpoint'] is not None else None
+
+        # create an instance for each configured instance
+        # all instances share one event loop when running the asyncio runtime
+        for i in self._config['instances']:
+            self._instances.append(self._create_instance(i))
 
-            self._instances.append(instance)
+        # tasks of all instances when running the asyncio runtime
+        self._tasks: dict[asyncio.Task, AvlDataInstance] = dict()
 
         # keep track of stopping flag
         self._should_run = Event()
         self._should_run.set()
 
+        # reloads are requested by SIGHUP, modifications of the config file or the supervisor,
+        # they're applied by the main loop
+        self._should_reload = Event()
+        self._reload_config: dict|None = None
+        self._reload_lock: Lock = Lock()
+
+        self._config_mtime: float|None = self._get_config_mtime()
+
+    def health(self) -> dict[str, dict]:
+        lags: dict[str, float] = self._scheduler.lags()
+        return {instance.id: {
+            'alive': instance.is_alive(),
+            'lag': lags.get(instance.id, 0.0)
+        } for instance in self._instances}
+
+    def reload(self, config: dict|None = None) -> None:
+        # without config, the config file is loaded again
+        with self._reload_lock:
+            self._reload_config = config
+
+        self._should_reload.set()
+
     def run(self) -> None:
         # register signal handlers for graceful shutdown
         signal.signal(signal.SIGINT, self._signal_handler)
         signal.signal(signal.SIGTERM, self._signal_handler)
 
+        # workers get their configuration from the supervisor only
+        if self._config_filename is not None:
+            signal.signal(signal.SIGHUP, self._reload_handler)
+        else:
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+        if self._metrics is not None:
+            self._metrics.start()
+
+        if self._config['runtime'] == 'asyncio':
+            asyncio.run(self._run_async())
+        else:
+            # start a thread for each instance
+            for instance in self._instances:
+                instance.run()
+
+            try:
+                while self._should_run.is_set():
+                    time.sleep(1)
+
+                    config: dict|None = self._check_reload()
+                    if config is not None:
+                        self._reload(config)
+            except KeyboardInterrupt:
+                pass
+
+            self.stop()
+
+        if self._state is not None:
+            self._state.close()
+
+        if self._metrics is not None:
+            self._metrics.stop()
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stop(self) -> None:
+        # stop all instances at once, so they're logging off their vehicles concurrently
+        # instances get a part of the shutdown timeout for logging off, the rest is left for terminating
+        shutdown_timeout: float = self._config['shutdown_timeout']
+        shutdown_deadline: float = time.monotonic() + shutdown_timeout
+
+        for instance in self._instances:
+            logging.info(f"{self.__class__.__name__}: Shutting down instance \"{instance.id}\" ...")
+
+            instance.stop(shutdown_timeout * 0.9)
+
+        if self._config['runtime'] == 'asyncio':
+            return
+
+        # wait for all instances within the shutdown deadline
+        for instance in self._instances:
+            if not instance.join(max(0.0, shutdown_deadline - time.monotonic())):
+                logging.warning(f"{self.__class__.__name__}: Instance \"{instance.id}\" did not shut down within {shutdown_timeout}s.")
+
+    async def _run_async(self) -> None:
+        # schedule all instances in the running event loop
+        self._tasks = {asyncio.create_task(instance.run_async()): instance for instance in self._instances}
+
         try:
             while self._should_run.is_set():
-                time.sleep(1)
+                await asyncio.sleep(1)
+
+                config: dict|None = self._check_reload()
+                if config is not None:
+                    await self._reload_async(config)
         except KeyboardInterrupt:
             pass
 
         self.stop()
 
-    def stop(self) -> None:
-        for instance in self._instances:
-            logging.info(f"{self.__class__.__name__}: Shutting down instance \"{instance.id}\" ...")
-            
-            instance.stop()
-    
+        # wait for all instances to finish their shutdown within the shutdown deadline
+        await self._wait_tasks(list(self._tasks.keys()))
+
+    def _create_instance(self, config: dict) -> AvlDataInstance:
+        logging.info(f"{self.__class__.__name__}: Creating instance \"{config['id']}\" ...")
+
+        if self._config['runtime'] == 'asyncio':
+            return AsyncAvlDataInstance(config, self._connections, self._scheduler, self._state, self._executor)
+        else:
+            return AvlDataInstance(config, self._connections, self._scheduler, self._state)
+
+    def _create_executor(self) -> ThreadPoolExecutor:
+        # each instance runs one blocking adapter call at a time, so one thread per instance is enough,
+        # threads are started on demand only
+        workers: int = self._config['executor']['workers']
+        if workers == 0:
+            workers = max(1, len(self._config['instances']))
+
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='adapter')
+
+    def _check_reload(self) -> dict|None:
+        if self._config['reload']['watch']:
+            config_mtime: float|None = self._get_config_mtime()
+            if config_mtime != self._config_mtime:
+                self._config_mtime = config_mtime
+                self._should_reload.set()
+
+        if not self._should_reload.is_set():
+            return None
+
+        self._should_reload.clear()
+
+        with self._reload_lock:
+            config: dict|None = self._reload_config
+            self._reload_config = None
+
+        # an invalid configuration must not stop the running instances
+        try:
+            if config is None:
+                logging.info(f"{self.__class__.__name__}: Reloading configuration file ...")
+                config = Configuration.load(self._config_filename)
+            else:
+                config = Configuration.default_config(config)
+        except Exception as ex:
+            logging.error(f"{self.__class__.__name__}: Failed to reload configuration, keeping the current one: {ex}")
+            return None
+
+        ignored_keys: set[str] = Configuration.changed_keys(self._config, config) - RELOAD_KEYS
+        if len(ignored_keys) > 0:
+            logging.warning(f"{self.__class__.__name__}: Changes of {sorted(ignored_keys)} require a restart and are ignored.")
+
+            config = dict(self._config, **{k: config[k] for k in RELOAD_KEYS})
+
+        return config
+
+    def _plan_reload(self, config: dict) -> tuple[list[tuple[AvlDataInstance, bool]], list[dict]]:
+        # diff the instances by their ID, returns the instances to stop
+        # with their resume flag and the configs of instances to start
+        current_configs: dict[str, dict] = {i['id']: i for i in self._config['instances']}
+        actual_configs: dict[str, dict] = {i['id']: i for i in config['instances']}
+        instances: dict[str, AvlDataInstance] = {i.id: i for i in self._instances}
+
+        instances_to_stop: list[tuple[AvlDataInstance, bool]] = list()
+        configs_to_start: list[dict] = list()
+
+        for instance_id, current_config in current_configs.items():
+            if instance_id not in actual_configs:
+                logging.info(f"{self.__class__.__name__}: Removing instance \"{instance_id}\" ...")
+                instances_to_stop.append((instances[instance_id], False))
+
+                continue
+
+            changed_keys: set[str] = Configuration.changed_keys(current_config, actual_configs[instance_id])
+            if len(changed_keys & RESTART_KEYS) > 0:
+                logging.info(f"{self.__class__.__name__}: Restarting instance \"{instance_id}\" for changes of {sorted(changed_keys & RESTART_KEYS)} ...")
+                instances_to_stop.append((instances[instance_id], len(changed_keys & RELOCATE_KEYS) == 0))
+                configs_to_start.append(actual_configs[instance_id])
+
+            elif len(changed_keys) > 0:
+                logging.info(f"{self.__class__.__name__}: Reconfiguring instance \"{instance_id}\" ...")
+                instances[instance_id].reconfigure(actual_configs[instance_id])
+
+        for instance_id, actual_config in actual_configs.items():
+            if instance_id not in current_configs:
+                configs_to_start.append(actual_config)
+
+        self._config = config
+
+        return instances_to_stop, configs_to_start
+
+    def _reload(self, config: dict) -> None:
+        instances_to_stop, configs_to_start = self._plan_reload(config)
+
+        # stop all affected instances at once within the shutdown timeout
+        shutdown_timeout: float = self._config['shutdown_timeout']
+        shutdown_deadline: float = time.monotonic() + shutdown_timeout
+
+        for instance, resume in instances_to_stop:
+            instance.stop(shutdown_timeout * 0.9, resume)
+
+        for instance, _ in instances_to_stop:
+            if not instance.join(max(0.0, shutdown_deadline - time.monotonic())):
+                logging.warning(f"{self.__class__.__name__}: Instance \"{instance.id}\" did not shut down within {shutdown_timeout}s.")
+
+        self._remove_instances([i for i, _ in instances_to_stop])
+
+        for instance_config in configs_to_start:
+            instance: AvlDataInstance = self._create_instance(instance_config)
+            self._instances = self._instances + [instance]
+
+            instance.run()
+
+    async def _reload_async(self, config: dict) -> None:
+        instances_to_stop, configs_to_start = self._plan_reload(config)
+
+        for instance, resume in instances_to_stop:
+            instance.stop(self._config['shutdown_timeout'] * 0.9, resume)
+
+        stopped_instances: list[AvlDataInstance] = [i for i, _ in instances_to_stop]
+        stopped_tasks: list[asyncio.Task] = [t for t, i in self._tasks.items() if i in stopped_instances]
+
+        await self._wait_tasks(stopped_tasks)
+
+        for task in stopped_tasks:
+            del self._tasks[task]
+
+        self._remove_instances(stopped_instances)
+
+        for instance_config in configs_to_start:
+            instance: AvlDataInstance = self._create_instance(instance_config)
+            self._instances = self._instances + [instance]
+
+            self._tasks[asyncio.create_task(instance.run_async())] = instance
+
+    async def _wait_tasks(self, tasks: list[asyncio.Task]) -> None:
+        if len(tasks) == 0:
+            return
+
+        # wait for the instances to finish their shutdown within the shutdown deadline
+        _, pending = await asyncio.wait(tasks, timeout=self._config['shutdown_timeout'])
+        for task in pending:
+            logging.warning(f"{self.__class__.__name__}: Instance \"{self._tasks[task].id}\" did not shut down within {self._config['shutdown_timeout']}s.")
+            task.cancel()
+
+    def _remove_instances(self, instances: list[AvlDataInstance]) -> None:
+        # the list is replaced instead of modified, as it's read by the health reports
+        self._instances = [i for i in self._instances if i not in instances]
+
+        actual_instance_ids: set[str] = {i['id'] for i in self._config['instances']}
+        for instance in instances:
+            self._scheduler.unregister(instance.id)
+
+            # metrics of restarted instances are continued
+            if instance.id not in actual_instance_ids:
+                REGISTRY.remove_label('instance', instance.id)
+
+    def _get_config_mtime(self) -> float|None:
+        if self._config_filename is None:
+            return None
+
+        try:
+            return os.stat(self._config_filename).st_mtime
+        except OSError:
+            return None
+
     def _signal_handler(self, signum, frame):
         logging.info(f'{self.__class__.__name__}: Received signal {signum}')
         self._should_run.clear()
-        
\ No newline at end of file
+
+    def _reload_handler(self, signum, frame):
+        logging.info(f'{self.__class__.__name__}: Received signal {signum}')
+        self.reload()
+
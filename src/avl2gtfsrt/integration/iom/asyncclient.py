@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import time
+
+from avl2gtfsrt.integration.iom.client import IomClient, PendingRequest
+from avl2gtfsrt.integration.iom.connection import AsyncMqttConnection
+from avl2gtfsrt.integration.iom.queue import PublishQueue
+from avl2gtfsrt.integration.model.types import Vehicle
+from avl2gtfsrt.integration.vdv.vdv435 import AbstractResponseStructure
+
+class AsyncIomClient(IomClient):
+
+    def __init__(self, instance_id: str,  organisation_id: str, itcs_id: str, connection: AsyncMqttConnection, request_timeout: int = 30, queue: PublishQueue|None = None) -> None:
+        super().__init__(instance_id, organisation_id, itcs_id, connection, request_timeout, queue)
+
+    async def start(self) -> None:
+        # subscribe before starting the connection,
+        # subscriptions are established once connected
+        for topic, qos in self.get_subscribed_topics():
+            self._connection.subscribe(topic, qos, self.process)
+
+        self._connection.add_connect_handler(self._queue.flush)
+        
+        await self._connection.start()
+
+    async def log_on_vehicle(self, vehicle: Vehicle) -> None:
+        pending_request: PendingRequest = self._submit_log_on_vehicle(vehicle)
+        response: AbstractResponseStructure = await self._await_response_async(pending_request)
+
+        self._verify_log_on_response(vehicle, response)
+
+    async def log_off_vehicle(self, vehicle: Vehicle) -> None:
+        pending_request: PendingRequest = self._submit_log_off_vehicle(vehicle)
+        response: AbstractResponseStructure = await self._await_response_async(pending_request)
+
+        self._verify_log_off_response(vehicle, response)
+
+    async def log_on_vehicles(self, vehicles: list[Vehicle], timeout: float|None = None) -> dict[any, bool]:
+        return await self._request_batch_async(vehicles, self._submit_log_on_vehicle, self._verify_log_on_response, timeout)
+
+    async def log_off_vehicles(self, vehicles: list[Vehicle], timeout: float|None = None) -> dict[any, bool]:
+        return await self._request_batch_async(vehicles, self._submit_log_off_vehicle, self._verify_log_off_response, timeout)
+
+    async def _request_batch_async(self, vehicles: list[Vehicle], submit, verify, timeout: float|None = None) -> dict[any, bool]:
+        results: dict[any, bool] = dict()
+
+        # fan out all requests first, so they're in flight at the same time ...
+        pending_requests: list[tuple[Vehicle, PendingRequest]] = list()
+        for vehicle in vehicles:
+            try:
+                pending_requests.append((vehicle, submit(vehicle, timeout)))
+            except Exception as ex:
+                logging.error(ex)
+                results[vehicle.id] = False
+
+        # ... then gather the responses, the whole batch takes one timeout at most
+        responses: list = await asyncio.gather(
+            *[self._await_response_async(p) for _, p in pending_requests], 
+            return_exceptions=True
+        )
+
+        for (vehicle, _), response in zip(pending_requests, responses):
+            try:
+                if isinstance(response, BaseException):
+                    raise response
+                
+                verify(vehicle, response)
+                results[vehicle.id] = True
+            except Exception as ex:
+                logging.error(ex)
+                results[vehicle.id] = False
+
+        return results
+
+    async def _await_response_async(self, pending_request: PendingRequest) -> AbstractResponseStructure:
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(pending_request.future), 
+                timeout=max(0.0, pending_request.deadline - time.monotonic())
+            )
+        except asyncio.TimeoutError:
+            self._discard_request(pending_request)
+            self._request_timeouts.inc()
+            raise RuntimeError(f"No valid response to request with correlation ID {pending_request.correlation_id}!")
+        except asyncio.CancelledError:
+            # only interrupted requests are turned into errors,
+            # cancellation of the awaiting task itself is passed on
+            if not pending_request.interrupted:
+                raise
+            
+            raise RuntimeError(f"Request with correlation ID {pending_request.correlation_id} was interrupted!")
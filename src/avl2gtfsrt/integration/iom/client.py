@@ -1,36 +1,59 @@
 import logging
-import re
+import time
 
+from concurrent.futures import CancelledError, Future, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from paho.mqtt import client as mqtt
-from threading import Condition
-
-from avl2gtfsrt.integration.common.mqtt import get_tls_value
+from threading import Lock
+from typing import Callable
+
+from avl2gtfsrt.integration.common.mqtt import TopicMatcher, get_tls_value
+from avl2gtfsrt.integration.common.serialization import Serializable
+from avl2gtfsrt.integration.common.shared import uid
+from avl2gtfsrt.integration.iom.connection import MqttConnection
+from avl2gtfsrt.integration.iom.queue import PublishQueue
+from avl2gtfsrt.integration.metrics import IOM_PENDING_REQUESTS, IOM_REQUEST_DURATION, IOM_REQUEST_TIMEOUTS
 from avl2gtfsrt.integration.model.types import Vehicle, VehiclePosition
-from avl2gtfsrt.integration.vdv.vdv435 import *
+from avl2gtfsrt.integration.vdv.vdv435 import AbstractResponseStructure, GnssPhysicalPosition, GnssPhysicalPositionDataStructure, TechnicalVehicleLogOffRequestStructure, TechnicalVehicleLogOffResponseStructure, TechnicalVehicleLogOnRequestStructure, TechnicalVehicleLogOnResponseStructure, VehicleRef, WGS84PhysicalPosition
 
 class TopicLevelStructureDict(dict):
     def __missing__(self, key):
         return f"{{{key}}}"
 
+@dataclass
+class PendingRequest:
+    correlation_id: str
+    deadline: float
+    submitted: float = field(default_factory=time.monotonic)
+    future: Future = field(default_factory=Future)
+    interrupted: bool = False
+
 class IomClient:
 
-    def __init__(self, instance_id: str,  organisation_id: str, itcs_id: str, config: dict) -> None:
+    def __init__(self, instance_id: str,  organisation_id: str, itcs_id: str, connection: MqttConnection, request_timeout: int = 30, queue: PublishQueue|None = None) -> None:
         self.instance_id: str = instance_id
         self.organisation_id: str = organisation_id
         self.itcs_id: str = itcs_id
+        self.publisher_id: str = f"avl2gtfsrt-integration-IoM-{self.organisation_id}"
 
-        # correlation ID and latch for running requests via MQTT
-        self._correlation_id: str|None = None
-        self._correlation_result: str|None = None
-        self._correlation_condition: Condition = Condition()
+        # pending requests via MQTT, keyed by their correlation ID
+        # multiple requests may be in flight at the same time
+        self._pending_requests: dict[str, PendingRequest] = dict()
+        self._pending_requests_lock: Lock = Lock()
+        self._request_timeout: int = request_timeout
 
-        # create MQTT client
-        self._mqtt: mqtt.Client = mqtt.Client(
-            mqtt.CallbackAPIVersion.VERSION2, 
-            protocol=mqtt.MQTTv5, 
-            client_id=f"avl2gtfsrt-integration-IoM-{self.organisation_id}"
-        )
+        # deadline of all requests submitted after an interrupt, e.g. while shutting down
+        self._interrupt_deadline: float|None = None
+
+        self._request_duration = IOM_REQUEST_DURATION.labels(self.instance_id)
+        self._request_timeouts = IOM_REQUEST_TIMEOUTS.labels(self.instance_id)
+        IOM_PENDING_REQUESTS.labels(self.instance_id).track(lambda: len(self._pending_requests))
+
+        # MQTT connection, possibly shared with other instances using the same broker
+        self._connection: MqttConnection = connection
+
+        # outbound messages are passing a bounded queue per instance
+        self._queue: PublishQueue = queue if queue is not None else PublishQueue(self.instance_id, self._connection)
 
         # create TLS topic structures
         self._tls_pub_itcs_inbox: tuple[str, int] = ("IoM/1.0/DataVersion/any/Inbox/ItcsInbox/Country/de/any/Organisation/{organisation_id}/any/ItcsId/{itcs_id}/CorrelationId/{correlation_id}/RequestData", 2)
@@ -43,11 +66,14 @@ class IomClient:
         self._tls_dict['organisation_id'] = self.organisation_id
         self._tls_dict['itcs_id'] = self.itcs_id
 
-        # set MQTT parameters
-        self._mqtt_host: str = config['host']
-        self._mqtt_port: str = config['port']
-        self._mqtt_username: str = config['username']
-        self._mqtt_password: str = config['password']        
+        # resolve global placeholders of all TLS once,
+        # memoize resolved publish topics per TLS and arguments
+        self._tls_cache: dict[str, tuple[str, int]] = dict()
+        self._topic_cache: dict[tuple, str] = dict()
+
+        # dispatch inbound messages by subscribed TLS
+        self._tls_handlers: TopicMatcher = TopicMatcher()
+        self._tls_handlers.add(self._get_tls('sub_vehicle_inbox')[0], self._handle_reponse)
 
     def get_subscribed_topics(self) -> tuple[str, int]:
         subscribed_topics: list = [
@@ -57,75 +83,81 @@ class IomClient:
         return subscribed_topics
     
     def start(self) -> None:
-        # define MQTT callback methods
-        self._mqtt.on_connect = self._on_connect
-        self._mqtt.on_message = self._on_message
-        self._mqtt.on_disconnect = self._on_disconnect
-
-        # set username and password if provided
-        if self._mqtt_username is not None and self._mqtt_password is not None:
-            self._mqtt.username_pw_set(username=self._mqtt_username, password=self._mqtt_password)
-
-        # finally connect to the broker ...
-        logging.info(f"{self.instance_id}/{self.__class__.__name__}: Connecting to MQTT broker at {self._mqtt_host}:{self._mqtt_port} ...")
-        self._mqtt.connect(self._mqtt_host, int(self._mqtt_port))
+        # subscribe before starting the connection,
+        # subscriptions are established once connected
+        for topic, qos in self.get_subscribed_topics():
+            self._connection.subscribe(topic, qos, self.process)
+
+        self._connection.add_connect_handler(self._queue.flush)
         
-        self._mqtt.loop_start()
+        self._connection.start()
 
     def process(self, topic: str, payload: bytes) -> None:
-        logging.info(f"{self.instance_id}/{self.__class__.__name__}: Received message in topic {topic}")
+        logging.debug(f"{self.instance_id}/{self.__class__.__name__}: Received message in topic {topic}")
         
-        if self._tls_matches(topic, 'sub_vehicle_inbox'):
-            self._handle_reponse(topic, payload)
+        for handler in self._tls_handlers.match(topic):
+            handler(topic, payload)
         """else:
             self._handle_message(topic, payload)"""
 
     def terminate(self) -> None:
-        logging.info(f"{self.instance_id}/{self.__class__.__name__}: Shutting down MQTT connection ...")
-        self._mqtt.disconnect()
+        logging.info(f"{self.instance_id}/{self.__class__.__name__}: Releasing MQTT connection ...")
+        for topic, qos in self.get_subscribed_topics():
+            self._connection.unsubscribe(topic, self.process)
 
-        self._mqtt.loop_stop()
+        self._connection.remove_connect_handler(self._queue.flush)
+        self._connection.release()
+
+        self._queue.close()
+
+        self.interrupt()
+
+    def interrupt(self, deadline: float|None = None) -> None:
+        # cancel all requests which are still waiting for a response,
+        # waiting callers are woken up immediately
+        with self._pending_requests_lock:
+            # requests submitted afterwards, e.g. by a poll still running, must not outlast the deadline
+            if deadline is not None:
+                self._interrupt_deadline = deadline
+
+            for pending_request in self._pending_requests.values():
+                pending_request.interrupted = True
+                pending_request.future.cancel()
+
+            self._pending_requests.clear()
     
-    def log_on_vehicle(self, vehicle: Vehicle) -> bool:
-        vehicle_ref: VehicleRef = VehicleRef(**{'#text': vehicle.vehicle_ref})
-        
-        log_on_message: TechnicalVehicleLogOnRequestStructure = TechnicalVehicleLogOnRequestStructure(**{
-            'netex:VehicleRef': vehicle_ref
-        })
+    def log_on_vehicle(self, vehicle: Vehicle) -> None:
+        pending_request: PendingRequest = self._submit_log_on_vehicle(vehicle)
+        response: TechnicalVehicleLogOnResponseStructure = self._await_response(pending_request)
 
-        response: TechnicalVehicleLogOnResponseStructure = self._request('pub_itcs_inbox', log_on_message.xml())
-        if response.technical_vehicle_log_on_response_error is not None:
-            response_code: str = response.technical_vehicle_log_on_response_error.technical_vehicle_log_on_response_code
-            raise RuntimeError(f"Failed to log on vehicle {vehicle.vehicle_ref}, Response: {response_code}!")
-        else:
-            logging.info(f"{self.instance_id}/{self.__class__.__name__}: Vehicle {vehicle.vehicle_ref} successfully logged on.")
+        self._verify_log_on_response(vehicle, response)
 
-    def log_off_vehicle(self, vehicle: Vehicle) -> bool:
-        vehicle_ref: VehicleRef = VehicleRef(**{'#text': vehicle.vehicle_ref})
-        
-        log_off_message: TechnicalVehicleLogOffRequestStructure = TechnicalVehicleLogOffRequestStructure(**{
-            'netex:VehicleRef': vehicle_ref
-        })
+    def log_off_vehicle(self, vehicle: Vehicle) -> None:
+        pending_request: PendingRequest = self._submit_log_off_vehicle(vehicle)
+        response: TechnicalVehicleLogOffResponseStructure = self._await_response(pending_request)
 
-        response: TechnicalVehicleLogOffResponseStructure = self._request('pub_itcs_inbox', log_off_message.xml())
-        if response.technical_vehicle_log_off_response_error is not None:
-            response_code: str = response.technical_vehicle_log_off_response_error.technical_vehicle_log_off_response_code
-            raise RuntimeError(f"Failed to log on vehicle {vehicle.vehicle_ref}, Response: {response_code}!")
-        else:
-            logging.info(f"{self.instance_id}/{self.__class__.__name__}: Vehicle {vehicle.vehicle_ref} successfully logged off.")
+        self._verify_log_off_response(vehicle, response)
+
+    def log_on_vehicles(self, vehicles: list[Vehicle], timeout: float|None = None) -> dict[any, bool]:
+        return self._request_batch(vehicles, self._submit_log_on_vehicle, self._verify_log_on_response, timeout)
+
+    def log_off_vehicles(self, vehicles: list[Vehicle], timeout: float|None = None) -> dict[any, bool]:
+        return self._request_batch(vehicles, self._submit_log_off_vehicle, self._verify_log_off_response, timeout)
 
     def publish_gnss_position_update(self, vehicle_position: VehiclePosition) -> None:
         dt: datetime = datetime.fromtimestamp(vehicle_position.timestamp, tz=timezone.utc)
         timestamp_of_measurement: str = dt.replace(microsecond=0).isoformat()
         
         gnss_physical_position_structure: GnssPhysicalPositionDataStructure = GnssPhysicalPositionDataStructure(
-            PublisherId=self._mqtt._client_id,
+            PublisherId=self.publisher_id,
             TimestampOfMeasurement=timestamp_of_measurement,
             GnssPhysicalPosition=GnssPhysicalPosition(
                 WGS84PhysicalPosition=WGS84PhysicalPosition(
                     Latitude=vehicle_position.latitude,
                     Longitude=vehicle_position.longitude
-                )
+                ),
+                CompassBearing=vehicle_position.bearing,
+                Velocity=vehicle_position.velocity
             )
         )
 
@@ -133,95 +165,168 @@ class IomClient:
             'pub_vehicle_physical_position', 
             gnss_physical_position_structure.xml(), 
             retain=True,
+            memoize=True,
+            coalesce=True,
             vehicle_ref=vehicle_position.vehicle.vehicle_ref
         )
-    
-    def _on_connect(self, client, userdata, flags, rc, properties):
-        if not rc.is_failure:
-            for topic, qos in self.get_subscribed_topics():
-                logging.info(f"{self.instance_id}/{self.__class__.__name__}: Subscribing to topic: {topic}")
-                self._mqtt.subscribe(topic, qos=qos)
+
+    def _submit_log_on_vehicle(self, vehicle: Vehicle, timeout: float|None = None) -> PendingRequest:
+        vehicle_ref: VehicleRef = VehicleRef(**{'#text': vehicle.vehicle_ref})
+        
+        log_on_message: TechnicalVehicleLogOnRequestStructure = TechnicalVehicleLogOnRequestStructure(**{
+            'netex:VehicleRef': vehicle_ref
+        })
+
+        return self._submit_request('pub_itcs_inbox', log_on_message.xml(), timeout)
+
+    def _verify_log_on_response(self, vehicle: Vehicle, response: TechnicalVehicleLogOnResponseStructure) -> None:
+        if response.technical_vehicle_log_on_response_error is not None:
+            response_code: str = response.technical_vehicle_log_on_response_error.technical_vehicle_log_on_response_code
+            raise RuntimeError(f"Failed to log on vehicle {vehicle.vehicle_ref}, Response: {response_code}!")
         else:
-            raise RuntimeError("Failed to connect to the IoM MQTT broker.")
+            logging.info(f"{self.instance_id}/{self.__class__.__name__}: Vehicle {vehicle.vehicle_ref} successfully logged on.")
 
-    def _on_message(self, client, userdata, message):
-        try:
-            self.process(message.topic, message.payload)
-        except Exception as ex:
-            logging.error(str(ex))                
+    def _submit_log_off_vehicle(self, vehicle: Vehicle, timeout: float|None = None) -> PendingRequest:
+        vehicle_ref: VehicleRef = VehicleRef(**{'#text': vehicle.vehicle_ref})
+        
+        log_off_message: TechnicalVehicleLogOffRequestStructure = TechnicalVehicleLogOffRequestStructure(**{
+            'netex:VehicleRef': vehicle_ref
+        })
 
-    def _on_disconnect(self, client, userdata, flags, rc, properties):
-        for topic, qos in self.get_subscribed_topics():
-            logging.info(f"{self.instance_id}/{self.__class__.__name__}: Unsubscribing from topic: {topic}")
-            self._mqtt.unsubscribe(topic)
+        return self._submit_request('pub_itcs_inbox', log_off_message.xml(), timeout)
 
+    def _verify_log_off_response(self, vehicle: Vehicle, response: TechnicalVehicleLogOffResponseStructure) -> None:
+        if response.technical_vehicle_log_off_response_error is not None:
+            response_code: str = response.technical_vehicle_log_off_response_error.technical_vehicle_log_off_response_code
+            raise RuntimeError(f"Failed to log off vehicle {vehicle.vehicle_ref}, Response: {response_code}!")
+        else:
+            logging.info(f"{self.instance_id}/{self.__class__.__name__}: Vehicle {vehicle.vehicle_ref} successfully logged off.")
+    
     def _get_tls(self, tls_name: str) -> tuple[str, int]:
         if not tls_name.startswith('_tls_'):
             tls_name = f"_tls_{tls_name}"
 
+        if tls_name in self._tls_cache:
+            return self._tls_cache[tls_name]
+
         tls: tuple = getattr(self, tls_name, None)
         if tls is not None and isinstance(tls, tuple):
             tls_str: str = tls[0]
             tls_str = tls_str.format_map(self._tls_dict)
 
-            return (tls_str, tls[1])
+            self._tls_cache[tls_name] = (tls_str, tls[1])
+
+            return self._tls_cache[tls_name]
         else:
             raise ValueError(f"Undefined TLS {tls_name} not found!")
         
-    def _tls_matches(self, topic: str, tls_name: str) -> bool:
-        tls_str: str = self._get_tls(tls_name)[0]
+    def _get_topic(self, tls_name: str, memoize: bool, **arguments) -> tuple[str, int]:
+        tls: tuple[str, int] = self._get_tls(tls_name)
+        if not memoize:
+            return (tls[0].format(**arguments), tls[1])
         
-        regex = re.escape(tls_str)
-        regex = regex.replace(r'\+', '[^/]+')
-        regex = regex.replace(r'\#', '.*')
-        regex = '^' + regex + '$'
+        key: tuple = (tls_name, *arguments.items())
+        if key not in self._topic_cache:
+            self._topic_cache[key] = tls[0].format(**arguments)
 
-        return re.match(regex, topic) is not None
+        return (self._topic_cache[key], tls[1])
         
-    def _publish(self, tls_name: str, payload: str, retain=False, **arguments):
-        tls: tuple[str, int] = self._get_tls(tls_name)
-
-        tls_str: str = tls[0]
-        tls_str = tls_str.format(**arguments)
+    def _publish(self, tls_name: str, payload: str, retain=False, memoize=False, coalesce=False, **arguments):
+        tls_str, qos = self._get_topic(tls_name, memoize, **arguments)
 
-        self._mqtt.publish(
+        # coalesced messages are replaced by newer ones to the same topic
+        # as long as they're queued, other messages are never dropped
+        self._queue.publish(
             tls_str,
             payload,
-            tls[1],
-            retain
+            qos,
+            retain,
+            tls_str if coalesce else None
         )
 
-        logging.info(f"{self.instance_id}/{self.__class__.__name__}: Published message to topic {tls_str}")
+        logging.debug(f"{self.instance_id}/{self.__class__.__name__}: Published message to topic {tls_str}")
     
     def _request(self, tls_name: str, payload: str, **arguments) -> AbstractResponseStructure:
-        if self._correlation_id is None:
-            self._correlation_id = '1'
-        
-        self._publish(tls_name, payload, False, correlation_id=self._correlation_id)
-
-        with self._correlation_condition:
-            self._correlation_condition.wait(timeout=30)   
-
-            if self._correlation_result is not None:
-                response: AbstractResponseStructure = Serializable.load(self._correlation_result)
-                return response
-            else:
-                self._correlation_id = None
-                self._correlation_result = None
-                
-                raise RuntimeError(f"No valid response to request with correlation ID {self._correlation_id}!")
+        pending_request: PendingRequest = self._submit_request(tls_name, payload, **arguments)
+        return self._await_response(pending_request)
+
+    def _request_batch(self, vehicles: list[Vehicle], submit: Callable[[Vehicle, float|None], PendingRequest], verify: Callable[[Vehicle, AbstractResponseStructure], None], timeout: float|None = None) -> dict[any, bool]:
+        results: dict[any, bool] = dict()
+
+        # fan out all requests first, so they're in flight at the same time ...
+        pending_requests: list[tuple[Vehicle, PendingRequest]] = list()
+        for vehicle in vehicles:
+            try:
+                pending_requests.append((vehicle, submit(vehicle, timeout)))
+            except Exception as ex:
+                logging.error(ex)
+                results[vehicle.id] = False
+
+        # ... then gather the responses, the whole batch takes one timeout at most
+        for vehicle, pending_request in pending_requests:
+            try:
+                verify(vehicle, self._await_response(pending_request))
+                results[vehicle.id] = True
+            except Exception as ex:
+                logging.error(ex)
+                results[vehicle.id] = False
+
+        return results
+
+    def _submit_request(self, tls_name: str, payload: str, timeout: float|None = None, **arguments) -> PendingRequest:
+        # register the request with a unique correlation ID before publishing
+        # otherwise a fast response could arrive before the request is known
+        pending_request: PendingRequest = PendingRequest(
+            correlation_id=uid(),
+            deadline=time.monotonic() + (timeout if timeout is not None else self._request_timeout)
+        )
+
+        with self._pending_requests_lock:
+            if self._interrupt_deadline is not None:
+                pending_request.deadline = min(pending_request.deadline, self._interrupt_deadline)
+
+            self._pending_requests[pending_request.correlation_id] = pending_request
+
+        try:
+            self._publish(tls_name, payload, False, correlation_id=pending_request.correlation_id, **arguments)
+        except Exception:
+            self._discard_request(pending_request)
+            raise
+
+        return pending_request
+
+    def _await_response(self, pending_request: PendingRequest) -> AbstractResponseStructure:
+        # wait only for the remaining time of the request,
+        # requests submitted together expire together
+        try:
+            return pending_request.future.result(timeout=max(0.0, pending_request.deadline - time.monotonic()))
+        except FutureTimeoutError:
+            self._discard_request(pending_request)
+            self._request_timeouts.inc()
+            raise RuntimeError(f"No valid response to request with correlation ID {pending_request.correlation_id}!")
+        except CancelledError:
+            raise RuntimeError(f"Request with correlation ID {pending_request.correlation_id} was interrupted!")
+
+    def _discard_request(self, pending_request: PendingRequest) -> None:
+        with self._pending_requests_lock:
+            self._pending_requests.pop(pending_request.correlation_id, None)
     
     def _handle_reponse(self, topic: str, payload: bytes) -> None:
         # lookup for correlation ID in the topic
         correlation_id: str = get_tls_value(topic, 'CorrelationId')
 
-        # check whether correlation ID matches to the last request
-        if correlation_id == self._correlation_id:
+        # check whether correlation ID matches to a pending request
+        with self._pending_requests_lock:
+            pending_request: PendingRequest|None = self._pending_requests.pop(correlation_id, None)
 
-            # set result
-            self._correlation_id = None
-            self._correlation_result = payload
+        if pending_request is None:
+            return
+        
+        self._request_duration.observe(time.monotonic() - pending_request.submitted)
 
-            # raise condition update
-            with self._correlation_condition:
-                self._correlation_condition.notify()
+        # set result or exception, the waiting caller is woken up by the future
+        try:
+            response: AbstractResponseStructure = Serializable.load(payload)
+            pending_request.future.set_result(response)
+        except Exception as ex:
+            pending_request.future.set_exception(ex)
@@ -0,0 +1,265 @@
+import asyncio
+import logging
+
+from paho.mqtt import client as mqtt
+from threading import Lock
+from typing import Callable
+
+from avl2gtfsrt.integration.common.mqtt import TopicMatcher
+from avl2gtfsrt.integration.common.shared import uid
+
+
+class MqttConnection:
+
+    def __init__(self, config: dict) -> None:
+        self._mqtt_host: str = config['host']
+        self._mqtt_port: str = config['port']
+        self._mqtt_username: str = config['username']
+        self._mqtt_password: str = config['password']
+
+        # create MQTT client
+        # the client ID must be unique as the connection is shared by several instances
+        self._mqtt: mqtt.Client = mqtt.Client(
+            mqtt.CallbackAPIVersion.VERSION2, 
+            protocol=mqtt.MQTTv5, 
+            client_id=f"avl2gtfsrt-integration-IoM-{uid()}"
+        )
+
+        # bound the messages buffered by the client itself,
+        # publishing fails with MQTT_ERR_QUEUE_SIZE once exceeded
+        self._mqtt.max_queued_messages_set(config['max_queued'])
+
+        # subscribed topics with their QoS and handlers per topic filter
+        # inbound messages are routed to all handlers of matching topic filters
+        self._subscriptions: dict[str, tuple[int, list[Callable[[str, bytes], None]]]] = dict()
+        self._matcher: TopicMatcher = TopicMatcher()
+        self._lock: Lock = Lock()
+
+        # handlers called after each (re)connect, e.g. for flushing queued messages
+        self._connect_handlers: list[Callable[[], None]] = list()
+
+        self._references: int = 0
+        self._started: bool = False
+
+    @property
+    def references(self) -> int:
+        return self._references
+
+    def acquire(self) -> None:
+        with self._lock:
+            self._references = self._references + 1
+
+    def release(self) -> None:
+        with self._lock:
+            self._references = self._references - 1
+            should_terminate: bool = self._references <= 0 and self._started
+
+        # the last one leaving closes the connection
+        if should_terminate:
+            self.terminate()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._started:
+                return
+            
+            self._started = True
+
+        self._connect()
+        
+        self._mqtt.loop_start()
+
+    def terminate(self) -> None:
+        with self._lock:
+            self._started = False
+
+        logging.info(f"{self.__class__.__name__}: Shutting down MQTT connection to {self._mqtt_host}:{self._mqtt_port} ...")
+        self._mqtt.disconnect()
+
+        self._mqtt.loop_stop()
+
+    def is_connected(self) -> bool:
+        return self._mqtt.is_connected()
+
+    def publish(self, topic: str, payload: str|bytes, qos: int = 0, retain: bool = False) -> mqtt.MQTTMessageInfo:
+        return self._mqtt.publish(topic, payload, qos, retain)
+
+    def add_connect_handler(self, handler: Callable[[], None]) -> None:
+        with self._lock:
+            self._connect_handlers.append(handler)
+
+    def remove_connect_handler(self, handler: Callable[[], None]) -> None:
+        with self._lock:
+            if handler in self._connect_handlers:
+                self._connect_handlers.remove(handler)
+
+    def subscribe(self, topic: str, qos: int, handler: Callable[[str, bytes], None]) -> None:
+        with self._lock:
+            if topic not in self._subscriptions:
+                self._subscriptions[topic] = (qos, list())
+                subscribe_required: bool = True
+            else:
+                subscribe_required: bool = False
+
+            self._subscriptions[topic][1].append(handler)
+            self._matcher.add(topic, handler)
+
+        # topics subscribed before the connection is established
+        # are subscribed in _on_connect
+        if subscribe_required and self._mqtt.is_connected():
+            logging.info(f"{self.__class__.__name__}: Subscribing to topic: {topic}")
+            self._mqtt.subscribe(topic, qos=qos)
+
+    def unsubscribe(self, topic: str, handler: Callable[[str, bytes], None]) -> None:
+        with self._lock:
+            if topic not in self._subscriptions:
+                return
+            
+            handlers: list[Callable[[str, bytes], None]] = self._subscriptions[topic][1]
+            if handler in handlers:
+                handlers.remove(handler)
+                self._matcher.remove(topic, handler)
+
+            unsubscribe_required: bool = len(handlers) == 0
+            if unsubscribe_required:
+                del self._subscriptions[topic]
+
+        if unsubscribe_required and self._mqtt.is_connected():
+            logging.info(f"{self.__class__.__name__}: Unsubscribing from topic: {topic}")
+            self._mqtt.unsubscribe(topic)
+
+    def _connect(self) -> None:
+        # define MQTT callback methods
+        self._mqtt.on_connect = self._on_connect
+        self._mqtt.on_message = self._on_message
+
+        # set username and password if provided
+        if self._mqtt_username is not None and self._mqtt_password is not None:
+            self._mqtt.username_pw_set(username=self._mqtt_username, password=self._mqtt_password)
+
+        # finally connect to the broker ...
+        logging.info(f"{self.__class__.__name__}: Connecting to MQTT broker at {self._mqtt_host}:{self._mqtt_port} ...")
+        self._mqtt.connect(self._mqtt_host, int(self._mqtt_port))
+
+    def _on_connect(self, client, userdata, flags, rc, properties):
+        if not rc.is_failure:
+            with self._lock:
+                subscriptions: list[tuple[str, int]] = [(topic, s[0]) for topic, s in self._subscriptions.items()]
+
+            for topic, qos in subscriptions:
+                logging.info(f"{self.__class__.__name__}: Subscribing to topic: {topic}")
+                self._mqtt.subscribe(topic, qos=qos)
+
+            with self._lock:
+                connect_handlers: list[Callable[[], None]] = list(self._connect_handlers)
+
+            for handler in connect_handlers:
+                try:
+                    handler()
+                except Exception as ex:
+                    logging.error(str(ex))
+        else:
+            raise RuntimeError("Failed to connect to the IoM MQTT broker.")
+
+    def _on_message(self, client, userdata, message):
+        with self._lock:
+            handlers: list[Callable[[str, bytes], None]] = self._matcher.match(message.topic)
+
+        for handler in handlers:
+            try:
+                handler(message.topic, message.payload)
+            except Exception as ex:
+                logging.error(str(ex))
+
+
+class AsyncMqttConnection(MqttConnection):
+
+    def __init__(self, config: dict) -> None:
+        super().__init__(config)
+
+        self._loop: asyncio.AbstractEventLoop|None = None
+        self._misc_task: asyncio.Task|None = None
+
+    async def start(self) -> None:
+        with self._lock:
+            if self._started:
+                return
+            
+            self._started = True
+
+        # the MQTT network loop is driven by the event loop
+        # instead of running an own network thread per connection
+        self._loop = asyncio.get_running_loop()
+
+        self._mqtt.on_socket_open = self._on_socket_open
+        self._mqtt.on_socket_close = self._on_socket_close
+        self._mqtt.on_socket_register_write = self._on_socket_register_write
+        self._mqtt.on_socket_unregister_write = self._on_socket_unregister_write
+
+        self._connect()
+
+        self._misc_task = self._loop.create_task(self._misc_loop())
+
+    def terminate(self) -> None:
+        with self._lock:
+            self._started = False
+
+        if self._misc_task is not None:
+            self._misc_task.cancel()
+            self._misc_task = None
+
+        logging.info(f"{self.__class__.__name__}: Shutting down MQTT connection to {self._mqtt_host}:{self._mqtt_port} ...")
+        self._mqtt.disconnect()
+
+    async def _misc_loop(self) -> None:
+        # run periodic MQTT tasks like keepalive pings,
+        # reconnect if the connection was lost
+        while True:
+            if self._mqtt.loop_misc() == mqtt.MQTT_ERR_NO_CONN:
+                try:
+                    logging.info(f"{self.__class__.__name__}: Reconnecting to MQTT broker at {self._mqtt_host}:{self._mqtt_port} ...")
+                    self._mqtt.reconnect()
+                except Exception as ex:
+                    logging.error(ex)
+
+            await asyncio.sleep(1)
+
+    def _on_socket_open(self, client, userdata, sock):
+        self._loop.add_reader(sock, client.loop_read)
+
+    def _on_socket_close(self, client, userdata, sock):
+        self._loop.remove_reader(sock)
+
+    def _on_socket_register_write(self, client, userdata, sock):
+        self._loop.add_writer(sock, client.loop_write)
+
+    def _on_socket_unregister_write(self, client, userdata, sock):
+        self._loop.remove_writer(sock)
+
+
+class MqttConnectionPool:
+
+    def __init__(self, connection_class: type[MqttConnection] = MqttConnection) -> None:
+        self._connection_class: type[MqttConnection] = connection_class
+
+        # connections per broker, instances sharing the same broker
+        # config block share the same (small) pool of connections
+        self._connections: dict[tuple, list[MqttConnection]] = dict()
+        self._lock: Lock = Lock()
+
+    def acquire(self, config: dict) -> MqttConnection:
+        # the pool settings are part of the key, otherwise the first instance using a broker
+        # would silently decide the number of connections and their queue limit for all others
+        key: tuple = (config['host'], int(config['port']), config['username'], config['password'], config['connections'], config['max_queued'])
+
+        with self._lock:
+            connections: list[MqttConnection] = self._connections.setdefault(key, list())
+            if len(connections) < config['connections']:
+                connection: MqttConnection = self._connection_class(config)
+                connections.append(connection)
+            else:
+                connection: MqttConnection = min(connections, key=lambda c: c.references)
+
+            connection.acquire()
+
+        return connection
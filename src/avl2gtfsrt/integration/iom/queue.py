@@ -0,0 +1,220 @@
+import logging
+import sqlite3
+
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from paho.mqtt import client as mqtt
+from threading import Lock
+
+from avl2gtfsrt.integration.iom.connection import MqttConnection
+from avl2gtfsrt.integration.metrics import QUEUE_DEPTH, QUEUE_DROPPED
+
+
+@dataclass
+class QueuedMessage:
+    topic: str
+    payload: str|bytes
+    qos: int
+    retain: bool
+    key: str|None = None
+
+class SpillStore:
+
+    def __init__(self, path: str) -> None:
+        # messages are spilled in order, messages with key are coalesced by their key
+        self._connection: sqlite3.Connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT UNIQUE, topic TEXT NOT NULL, payload BLOB NOT NULL, qos INTEGER NOT NULL, retain INTEGER NOT NULL)')
+        self._connection.commit()
+
+        self._count: int = self._connection.execute('SELECT COUNT(*) FROM outbox').fetchone()[0]
+        self._control_count: int = self._connection.execute('SELECT COUNT(*) FROM outbox WHERE key IS NULL').fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def control_count(self) -> int:
+        return self._control_count
+
+    def push(self, message: QueuedMessage) -> None:
+        payload: bytes = message.payload.encode('utf-8') if isinstance(message.payload, str) else message.payload
+
+        if message.key is not None:
+            replaced: int = self._connection.execute('DELETE FROM outbox WHERE key = ?', (message.key,)).rowcount
+            self._count = self._count - replaced
+        else:
+            self._control_count = self._control_count + 1
+
+        self._connection.execute(
+            'INSERT INTO outbox (key, topic, payload, qos, retain) VALUES (?, ?, ?, ?, ?)',
+            (message.key, message.topic, payload, message.qos, int(message.retain))
+        )
+
+        self._connection.commit()
+        self._count = self._count + 1
+
+    def messages(self, control: bool) -> list[tuple[int, QueuedMessage]]:
+        # either control messages or coalesced messages, each in their order
+        rows: list[tuple] = self._connection.execute(f"SELECT id, key, topic, payload, qos, retain FROM outbox WHERE key IS {'' if control else 'NOT '}NULL ORDER BY id").fetchall()
+        return [(row[0], QueuedMessage(topic=row[2], payload=row[3], qos=row[4], retain=bool(row[5]), key=row[1])) for row in rows]
+
+    def remove(self, message_id: int, message: QueuedMessage) -> None:
+        self._connection.execute('DELETE FROM outbox WHERE id = ?', (message_id,))
+        self._connection.commit()
+
+        self._count = self._count - 1
+        if message.key is None:
+            self._control_count = self._control_count - 1
+
+    def close(self) -> None:
+        self._connection.close()
+
+class PublishQueue:
+
+    def __init__(self, instance_id: str, connection: MqttConnection, size: int = 1000, spill: str|None = None) -> None:
+        self.instance_id: str = instance_id
+        self.size: int = size
+
+        self._connection: MqttConnection = connection
+        self._lock: Lock = Lock()
+
+        # control messages like log-on/log-off are never dropped,
+        # messages with key (e.g. GNSS updates) are coalesced, the latest message per key wins
+        self._control: deque[QueuedMessage] = deque()
+        self._latest: OrderedDict[str, QueuedMessage] = OrderedDict()
+
+        # messages exceeding the size are spilled to disk instead of being dropped if enabled
+        self._spill: SpillStore|None = SpillStore(spill) if spill is not None else None
+
+        self._dropped: int = 0
+        self._dropping: bool = False
+
+        self._dropped_counter = QUEUE_DROPPED.labels(self.instance_id)
+        QUEUE_DEPTH.labels(self.instance_id).track(self.__len__)
+
+    def __len__(self) -> int:
+        return len(self._control) + len(self._latest) + (len(self._spill) if self._spill is not None else 0)
+
+    @property
+    def dropped(self) -> int:
+        return self._dropped
+
+    def publish(self, topic: str, payload: str|bytes, qos: int = 0, retain: bool = False, key: str|None = None) -> None:
+        message: QueuedMessage = QueuedMessage(topic=topic, payload=payload, qos=qos, retain=retain, key=key)
+
+        with self._lock:
+            if key is None:
+                self._enqueue_control(message)
+            else:
+                self._enqueue_latest(message)
+
+        self.flush()
+
+    def flush(self) -> None:
+        # messages are handed over to the connection only while it is connected,
+        # otherwise they're kept here and the latest state is replayed after reconnecting
+        with self._lock:
+            if not self._connection.is_connected():
+                return
+
+            # control messages are published before the coalesced ones, e.g. log-ons before positions,
+            # spilled messages are older than the ones in memory and are published first
+            if not self._flush_spill(True):
+                return
+
+            while len(self._control) > 0:
+                if not self._send(self._control[0]):
+                    return
+
+                self._control.popleft()
+
+            if not self._flush_spill(False):
+                return
+
+            while len(self._latest) > 0:
+                key, message = next(iter(self._latest.items()))
+                if not self._send(message):
+                    return
+
+                del self._latest[key]
+
+            self._dropping = False
+
+    def close(self) -> None:
+        with self._lock:
+            if self._spill is None:
+                if len(self._control) > 0 or len(self._latest) > 0:
+                    logging.warning(f"{self.instance_id}/{self.__class__.__name__}: Discarding {len(self._control) + len(self._latest)} unpublished message(s).")
+            else:
+                # unpublished messages are kept on disk for the next start
+                while len(self._control) > 0:
+                    self._spill.push(self._control.popleft())
+
+                while len(self._latest) > 0:
+                    self._spill.push(self._latest.popitem(last=False)[1])
+
+                self._spill.close()
+
+            self._control.clear()
+            self._latest.clear()
+
+    def _enqueue_control(self, message: QueuedMessage) -> None:
+        # control messages go to disk as soon as the memory is full, together with the ones
+        # in memory and all following ones until the disk is drained, in order to keep their order
+        if self._spill is not None and (self._spill.control_count > 0 or self._is_full()):
+            while len(self._control) > 0:
+                self._spill.push(self._control.popleft())
+
+            self._spill.push(message)
+        else:
+            self._control.append(message)
+
+    def _enqueue_latest(self, message: QueuedMessage) -> None:
+        # a queued message with the same key is replaced and moved to the end
+        replaced: QueuedMessage|None = self._latest.pop(message.key, None)
+        if replaced is None and self._is_full() and len(self._latest) > 0:
+            _, oldest = self._latest.popitem(last=False)
+            if self._spill is not None:
+                self._spill.push(oldest)
+            else:
+                # warn once until the queue was flushed again
+                if not self._dropping:
+                    logging.warning(f"{self.instance_id}/{self.__class__.__name__}: Queue full, dropping oldest messages.")
+                    self._dropping = True
+
+                self._dropped = self._dropped + 1
+                self._dropped_counter.inc()
+                logging.debug(f"{self.instance_id}/{self.__class__.__name__}: Dropped message in topic {oldest.topic}.")
+
+        self._latest[message.key] = message
+
+    def _flush_spill(self, control: bool) -> bool:
+        if self._spill is None or len(self._spill) == 0:
+            return True
+        
+        for message_id, message in self._spill.messages(control):
+            # outdated spilled messages are superseded by the latest one in memory
+            if message.key is not None and message.key in self._latest:
+                self._spill.remove(message_id, message)
+                continue
+
+            if not self._send(message):
+                return False
+
+            self._spill.remove(message_id, message)
+
+        return True
+
+    def _is_full(self) -> bool:
+        return len(self._control) + len(self._latest) >= self.size
+
+    def _send(self, message: QueuedMessage) -> bool:
+        result: mqtt.MQTTMessageInfo = self._connection.publish(message.topic, message.payload, message.qos, message.retain)
+
+        # QoS 1/2 messages are kept by the client once accepted, even if the connection is lost meanwhile,
+        # QoS 0 messages are lost without connection and are kept here therefore
+        if result.rc == mqtt.MQTT_ERR_QUEUE_SIZE or (result.rc == mqtt.MQTT_ERR_NO_CONN and message.qos == 0):
+            return False
+
+        return True
@@ -0,0 +1,300 @@
+import bisect
+import logging
+
+from abc import ABC, abstractmethod
+from threading import Lock, Thread
+from typing import Any, Callable
+from urllib.parse import urlparse
+
+
+class MetricsRegistry:
+
+    def __init__(self) -> None:
+        self._metrics: list['Metric'] = list()
+        self._lock: Lock = Lock()
+
+    def register(self, metric: 'Metric') -> None:
+        with self._lock:
+            self._metrics.append(metric)
+
+    def collect(self) -> list[tuple[str, str, str, list[str]]]:
+        # name, documentation, type and sample lines of each metric,
+        # plain data in order to be sent across processes
+        with self._lock:
+            metrics: list[Metric] = list(self._metrics)
+
+        return [(metric.name, metric.documentation, metric.type, metric.expose()) for metric in metrics]
+
+    def remove_label(self, label_name: str, label_value: str) -> None:
+        # drop all children with this label value, e.g. of a removed instance
+        with self._lock:
+            metrics: list[Metric] = list(self._metrics)
+
+        for metric in metrics:
+            metric.remove_matching(label_name, label_value)
+
+    def expose(self) -> str:
+        # Prometheus text exposition format
+        lines: list[str] = list()
+        for name, documentation, metric_type, samples in self.collect():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.extend(samples)
+
+        return '\n'.join(lines) + '\n'
+
+REGISTRY: MetricsRegistry = MetricsRegistry()
+
+class Metric(ABC):
+    type: str = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = (), registry: MetricsRegistry = REGISTRY) -> None:
+        self.name: str = name
+        self.documentation: str = documentation
+        self.label_names: tuple[str, ...] = labels
+
+        # one child per combination of label values, callers on the hot path
+        # should keep their children instead of looking them up again
+        self._children: dict[tuple[str, ...], Any] = dict()
+        self._lock: Lock = Lock()
+
+        registry.register(self)
+
+    def labels(self, *label_values: str) -> Any:
+        if len(label_values) != len(self.label_names):
+            raise ValueError(f"Metric {self.name} requires labels {self.label_names}!")
+
+        key: tuple[str, ...] = tuple(str(v) for v in label_values)
+        with self._lock:
+            child: Any = self._children.get(key)
+            if child is None:
+                child = self._create_child()
+                self._children[key] = child
+
+        return child
+
+    def remove(self, *label_values: str) -> None:
+        with self._lock:
+            self._children.pop(tuple(str(v) for v in label_values), None)
+
+    def remove_matching(self, label_name: str, label_value: str) -> None:
+        if label_name not in self.label_names:
+            return
+
+        index: int = self.label_names.index(label_name)
+        with self._lock:
+            for key in [k for k in self._children.keys() if k[index] == str(label_value)]:
+                del self._children[key]
+
+    def expose(self) -> list[str]:
+        with self._lock:
+            children: list[tuple[tuple[str, ...], Any]] = list(self._children.items())
+
+        lines: list[str] = list()
+        for label_values, child in children:
+            for suffix, extra_labels, value in child.samples():
+                labels: str = self._format_labels(tuple(zip(self.label_names, label_values)) + extra_labels)
+                lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+
+        return lines
+
+    @abstractmethod
+    def _create_child(self) -> Any:
+        pass
+
+    def _format_labels(self, labels: tuple[tuple[str, str], ...]) -> str:
+        if len(labels) == 0:
+            return ''
+
+        return '{' + ','.join(f"{name}=\"{_escape_label_value(value)}\"" for name, value in labels) + '}'
+
+class Counter(Metric):
+    type: str = 'counter'
+
+    def _create_child(self) -> '_CounterChild':
+        return _CounterChild()
+
+class Gauge(Metric):
+    type: str = 'gauge'
+
+    def _create_child(self) -> '_GaugeChild':
+        return _GaugeChild()
+
+class Histogram(Metric):
+    type: str = 'histogram'
+
+    DEFAULT_BUCKETS: tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS, registry: MetricsRegistry = REGISTRY) -> None:
+        self.buckets: tuple[float, ...] = tuple(sorted(buckets))
+        super().__init__(name, documentation, labels, registry)
+
+    def _create_child(self) -> '_HistogramChild':
+        return _HistogramChild(self.buckets)
+
+class _CounterChild:
+    __slots__ = ('_value', '_lock')
+
+    def __init__(self) -> None:
+        self._value: float = 0.0
+        self._lock: Lock = Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value = self._value + amount
+
+    def samples(self) -> list[tuple[str, tuple, float]]:
+        return [('_total', (), self._value)]
+
+class _GaugeChild:
+    __slots__ = ('_value', '_function')
+
+    def __init__(self) -> None:
+        self._value: float = 0.0
+        self._function: Callable[[], float]|None = None
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def track(self, function: Callable[[], float]) -> None:
+        # the value is determined by the function at each scrape
+        self._function = function
+
+    def samples(self) -> list[tuple[str, tuple, float]]:
+        if self._function is not None:
+            try:
+                return [('', (), float(self._function()))]
+            except Exception:
+                return []
+
+        return [('', (), self._value)]
+
+class _HistogramChild:
+    __slots__ = ('_buckets', '_counts', '_sum', '_lock')
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self._buckets: tuple[float, ...] = buckets
+        self._counts: list[int] = [0] * (len(buckets) + 1)
+        self._sum: float = 0.0
+        self._lock: Lock = Lock()
+
+    def observe(self, value: float) -> None:
+        index: int = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            self._counts[index] = self._counts[index] + 1
+            self._sum = self._sum + value
+
+    def samples(self) -> list[tuple[str, tuple, float]]:
+        with self._lock:
+            counts: list[int] = list(self._counts)
+            total: float = self._sum
+
+        samples: list[tuple[str, tuple, float]] = list()
+        cumulative: int = 0
+        for bucket, count in zip(self._buckets + (float('inf'),), counts):
+            cumulative = cumulative + count
+            samples.append(('_bucket', (('le', _format_value(bucket)),), cumulative))
+
+        samples.append(('_sum', (), total))
+        samples.append(('_count', (), cumulative))
+
+        return samples
+
+class MetricsServer:
+
+    def __init__(self, endpoint: str, registry: MetricsRegistry = REGISTRY) -> None:
+        self._registry: MetricsRegistry = registry
+
+        endpoint_url = urlparse(endpoint)
+
+        self._host: str = endpoint_url.hostname or '127.0.0.1'
+        self._port: int = endpoint_url.port or 9100
+        self._path: str = endpoint_url.path.rstrip('/') or '/metrics'
+
+        # uvicorn is imported when the server is started only
+        self._server: Any = None
+        self._thread: Thread|None = None
+
+    def start(self) -> None:
+        logging.info(f"{self.__class__.__name__}: Serving metrics on {self._host}:{self._port}{self._path} ...")
+
+        import uvicorn
+
+        self._server = uvicorn.Server(uvicorn.Config(
+            self._app,
+            host=self._host,
+            port=self._port,
+            interface='asgi3',
+            lifespan='off',
+            access_log=False,
+            log_level='warning',
+            timeout_graceful_shutdown=1
+        ))
+
+        self._thread = Thread(target=self._server.run, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.should_exit = True
+
+        if self._thread is not None:
+            self._thread.join(2)
+            self._thread = None
+
+    async def _app(self, scope: dict, receive, send) -> None:
+        if scope['type'] != 'http':
+            return
+
+        if scope['path'].rstrip('/') != self._path or scope['method'] != 'GET':
+            status: int = 404
+            body: bytes = b'Not found\n'
+        else:
+            status: int = 200
+            body: bytes = self._registry.expose().encode('utf-8')
+
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [
+                (b'content-type', b'text/plain; version=0.0.4; charset=utf-8'),
+                (b'content-length', str(len(body)).encode('ascii'))
+            ]
+        })
+
+        await send({
+            'type': 'http.response.body',
+            'body': body
+        })
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+
+    return repr(float(value))
+
+def _escape_label_value(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+# metrics of all instances
+POLL_DURATION: Histogram = Histogram('avl2gtfsrt_poll_duration_seconds', 'Duration of a poll cycle.', ('instance',))
+POLL_LAG: Gauge = Gauge('avl2gtfsrt_poll_lag_seconds', 'Delay of the last poll behind its deadline.', ('instance',))
+
+HTTP_REQUEST_DURATION: Histogram = Histogram('avl2gtfsrt_http_request_duration_seconds', 'Duration of HTTP requests to the provider API.', ('instance', 'endpoint'))
+HTTP_REQUEST_ERRORS: Counter = Counter('avl2gtfsrt_http_request_errors', 'Failed HTTP requests to the provider API.', ('instance', 'endpoint'))
+
+POSITIONS_RECEIVED: Counter = Counter('avl2gtfsrt_positions_received', 'Positions delivered by the adapter.', ('instance',))
+POSITIONS_PUBLISHED: Counter = Counter('avl2gtfsrt_positions_published', 'GNSS position updates published.', ('instance',))
+POSITIONS_FILTERED: Counter = Counter('avl2gtfsrt_positions_filtered', 'Positions not published, i.e. unchanged, suppressed by the filter or outdated.', ('instance', 'reason'))
+POSITIONS_REJECTED: Counter = Counter('avl2gtfsrt_positions_rejected', 'Positions rejected as implausible, i.e. stale or jumping.', ('instance', 'reason'))
+POSITION_AGE: Histogram = Histogram('avl2gtfsrt_position_age_seconds', 'Age of positions at publish time.', ('instance',), (1.0, 2.5, 5.0, 10.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0))
+
+IOM_REQUEST_DURATION: Histogram = Histogram('avl2gtfsrt_iom_request_duration_seconds', 'Round-trip time of IoM requests like log-on/log-off.', ('instance',))
+IOM_REQUEST_TIMEOUTS: Counter = Counter('avl2gtfsrt_iom_request_timeouts', 'IoM requests without response in time.', ('instance',))
+IOM_PENDING_REQUESTS: Gauge = Gauge('avl2gtfsrt_iom_pending_requests', 'IoM requests waiting for their response.', ('instance',))
+
+QUEUE_DEPTH: Gauge = Gauge('avl2gtfsrt_queue_depth', 'Messages waiting in the outbound queue.', ('instance',))
+QUEUE_DROPPED: Counter = Counter('avl2gtfsrt_queue_dropped', 'Messages dropped by the full outbound queue.', ('instance',))
+
+WORKER_UP: Gauge = Gauge('avl2gtfsrt_worker_up', 'Whether the worker process is running.', ('worker',))
+WORKER_RESTARTS: Counter = Counter('avl2gtfsrt_worker_restarts', 'Restarts of crashed or unresponsive worker processes.', ('worker',))
@@ -0,0 +1,162 @@
+import math
+
+from array import array
+from dataclasses import replace
+
+from avl2gtfsrt.integration.common.shared import haversine_distance, initial_bearing
+from avl2gtfsrt.integration.model.types import VehiclePosition
+
+class PositionHistory:
+
+    def __init__(self, config: dict) -> None:
+        # number of recent fixes per vehicle, 0 disables the history
+        self.size: int = config['size']
+        self._clear()
+
+        self.configure(config)
+
+    def configure(self, config: dict) -> None:
+        # parameters may change at runtime, the history is only cleared if its size changed
+        self.max_speed: float = config['max_speed']
+        self.min_distance: float = config['min_distance']
+
+        if config['size'] != self.size:
+            self.size = config['size']
+            self._clear()
+
+    def add(self, vehicle_position: VehiclePosition) -> tuple[VehiclePosition|None, str|None]:
+        # returns the position with bearing and velocity derived from the recent fixes,
+        # or None and the reason if the position is rejected as implausible
+        if self.size == 0:
+            return vehicle_position, None
+
+        slot: int|None = self._slots.get(vehicle_position.vehicle.id)
+        if slot is None:
+            self._reset(self._allocate(vehicle_position.vehicle.id), vehicle_position)
+            return vehicle_position, None
+
+        size: int = self.size
+        base: int = slot * size
+        last: int = base + self._heads[slot]
+
+        # positions older than the last fix arrived out of order, repeated fixes change nothing
+        elapsed: int = vehicle_position.timestamp - self._timestamps[last]
+        if elapsed < 0:
+            return None, 'stale'
+
+        if elapsed == 0:
+            return self._derive(slot, vehicle_position), None
+
+        distance: float = haversine_distance(self._latitudes[last], self._longitudes[last], vehicle_position.latitude, vehicle_position.longitude)
+
+        # jumps faster than the max. speed are GNSS errors, unless the vehicle stays at the new place,
+        # then the previous fixes were wrong and the history starts over from here
+        if self.max_speed > 0 and distance / elapsed > self.max_speed:
+            self._rejections[slot] = self._rejections[slot] + 1
+            if self._rejections[slot] < size:
+                return None, 'jump'
+
+            self._reset(slot, vehicle_position)
+            return vehicle_position, None
+
+        self._rejections[slot] = 0
+
+        # the oldest fix is overwritten if the ring is full,
+        # so its successor's distance leaves the path of the window
+        head: int = (self._heads[slot] + 1) % size
+        count: int = self._counts[slot]
+        if count == size:
+            self._paths[slot] = max(0.0, self._paths[slot] - self._distances[base + (head + 1) % size])
+        else:
+            count = count + 1
+            self._counts[slot] = count
+
+        index: int = base + head
+        self._latitudes[index] = vehicle_position.latitude
+        self._longitudes[index] = vehicle_position.longitude
+        self._timestamps[index] = vehicle_position.timestamp
+        self._distances[index] = distance
+
+        self._heads[slot] = head
+        self._paths[slot] = self._paths[slot] + distance
+
+        # the bearing of standing vehicles is kept, as it's only GNSS jitter
+        if distance >= self.min_distance:
+            self._bearings[slot] = initial_bearing(self._latitudes[last], self._longitudes[last], vehicle_position.latitude, vehicle_position.longitude)
+
+        return self._derive(slot, vehicle_position), None
+
+    def remove(self, vehicle_id: any) -> None:
+        slot: int|None = self._slots.pop(vehicle_id, None)
+        if slot is not None:
+            self._free_slots.append(slot)
+
+    def _derive(self, slot: int, vehicle_position: VehiclePosition) -> VehiclePosition:
+        count: int = self._counts[slot]
+        if count < 2:
+            return vehicle_position
+
+        # velocity is the path length over the time span of the window in m/s
+        oldest: int = slot * self.size + (self._heads[slot] - count + 1) % self.size
+        duration: int = vehicle_position.timestamp - self._timestamps[oldest]
+
+        bearing: float = self._bearings[slot]
+
+        return replace(
+            vehicle_position,
+            bearing=round(bearing, 1) if not math.isnan(bearing) else None,
+            velocity=round(self._paths[slot] / duration, 2) if duration > 0 else None
+        )
+
+    def _allocate(self, vehicle_id: any) -> int:
+        # slots of removed vehicles are reused, the columns only grow for new slots
+        if len(self._free_slots) > 0:
+            slot: int = self._free_slots.pop()
+        else:
+            slot: int = len(self._heads)
+
+            self._latitudes.extend([0.0] * self.size)
+            self._longitudes.extend([0.0] * self.size)
+            self._timestamps.extend([0] * self.size)
+            self._distances.extend([0.0] * self.size)
+
+            self._heads.append(0)
+            self._counts.append(0)
+            self._rejections.append(0)
+            self._paths.append(0.0)
+            self._bearings.append(math.nan)
+
+        self._slots[vehicle_id] = slot
+
+        return slot
+
+    def _reset(self, slot: int, vehicle_position: VehiclePosition) -> None:
+        index: int = slot * self.size
+
+        self._latitudes[index] = vehicle_position.latitude
+        self._longitudes[index] = vehicle_position.longitude
+        self._timestamps[index] = vehicle_position.timestamp
+        self._distances[index] = 0.0
+
+        self._heads[slot] = 0
+        self._counts[slot] = 1
+        self._rejections[slot] = 0
+        self._paths[slot] = 0.0
+        self._bearings[slot] = math.nan
+
+    def _clear(self) -> None:
+        # the recent fixes of all vehicles are kept in flat columns with one ring of fixed size per vehicle,
+        # the state of the rings and the derived values are kept in columns with one row per vehicle
+        self._slots: dict[any, int] = dict()
+        self._free_slots: list[int] = list()
+
+        self._latitudes: array = array('d')
+        self._longitudes: array = array('d')
+        self._timestamps: array = array('q')
+        self._distances: array = array('d')
+
+        self._heads: array = array('l')
+        self._counts: array = array('l')
+        self._rejections: array = array('l')
+        self._paths: array = array('d')
+        self._bearings: array = array('d')
@@ -0,0 +1,44 @@
+from typing import Iterable, Iterator
+
+from avl2gtfsrt.integration.model.types import Vehicle
+
+class VehicleRegistry:
+
+    def __init__(self) -> None:
+        # vehicles keyed by their device ID
+        self._vehicles: dict[any, Vehicle] = dict()
+
+    def __len__(self) -> int:
+        return len(self._vehicles)
+
+    def __iter__(self) -> Iterator[Vehicle]:
+        return iter(self._vehicles.values())
+
+    def __contains__(self, vehicle: Vehicle) -> bool:
+        return isinstance(vehicle, Vehicle) and vehicle.id in self._vehicles
+
+    def ids(self) -> list[any]:
+        return list(self._vehicles.keys())
+
+    def get(self, vehicle_id: any) -> Vehicle|None:
+        return self._vehicles.get(vehicle_id)
+
+    def add(self, vehicle: Vehicle) -> Vehicle:
+        # existing vehicles are kept in order to keep their state
+        return self._vehicles.setdefault(vehicle.id, vehicle)
+
+    def remove(self, vehicle_id: any) -> Vehicle|None:
+        return self._vehicles.pop(vehicle_id, None)
+
+    def sync(self, vehicles: Iterable[Vehicle]) -> tuple[list[Vehicle], list[Vehicle]]:
+        # diff the registry against the actual vehicles in linear time,
+        # returns the added and the removed vehicles
+        actual_vehicles: dict[any, Vehicle] = {v.id: v for v in vehicles}
+
+        removed_vehicles: list[Vehicle] = [self._vehicles.pop(vehicle_id) for vehicle_id in self._vehicles.keys() - actual_vehicles.keys()]
+        added_vehicles: list[Vehicle] = [v for vehicle_id, v in actual_vehicles.items() if vehicle_id not in self._vehicles]
+
+        for vehicle in added_vehicles:
+            self._vehicles[vehicle.id] = vehicle
+
+        return added_vehicles, removed_vehicles
@@ -0,0 +1,136 @@
+from array import array
+from typing import Iterator
+
+from avl2gtfsrt.integration.model.types import Vehicle, VehiclePosition
+
+class PositionMap:
+
+    def __init__(self) -> None:
+        # last position per vehicle ID
+        self._positions: dict[any, VehiclePosition] = dict()
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __iter__(self) -> Iterator[VehiclePosition]:
+        return iter(self._positions.values())
+
+    def __contains__(self, vehicle_id: any) -> bool:
+        return vehicle_id in self._positions
+
+    def get(self, vehicle_id: any) -> VehiclePosition|None:
+        return self._positions.get(vehicle_id)
+
+    def update(self, vehicle_position: VehiclePosition) -> None:
+        self._positions[vehicle_position.vehicle.id] = vehicle_position
+
+    def remove(self, vehicle_id: any) -> None:
+        self._positions.pop(vehicle_id, None)
+
+    def changed(self, vehicle_positions: list[VehiclePosition]) -> list[bool]:
+        # a position is changed if the vehicle is unknown yet or
+        # the position differs from the last one in time or place
+        result: list[bool] = list()
+        for vehicle_position in vehicle_positions:
+            last_position: VehiclePosition|None = self._positions.get(vehicle_position.vehicle.id)
+            result.append(
+                last_position is None
+                or last_position.timestamp != vehicle_position.timestamp
+                or last_position.latitude != vehicle_position.latitude
+                or last_position.longitude != vehicle_position.longitude
+            )
+
+        return result
+
+    def older_than(self, timestamp: int) -> list[Vehicle]:
+        return [p.vehicle for p in self._positions.values() if p.timestamp < timestamp]
+
+class PositionTable(PositionMap):
+
+    def __init__(self) -> None:
+        # last position per vehicle in columns instead of one object per vehicle,
+        # rows are updated in place and looked up by the vehicle ID
+        self._index: dict[any, int] = dict()
+        self._vehicles: list[Vehicle] = list()
+
+        self.latitudes: array = array('d')
+        self.longitudes: array = array('d')
+        self.timestamps: array = array('q')
+
+    def __len__(self) -> int:
+        return len(self._vehicles)
+
+    def __iter__(self) -> Iterator[VehiclePosition]:
+        for row in range(len(self._vehicles)):
+            yield self._row(row)
+
+    def __contains__(self, vehicle_id: any) -> bool:
+        return vehicle_id in self._index
+
+    def get(self, vehicle_id: any) -> VehiclePosition|None:
+        row: int|None = self._index.get(vehicle_id)
+        if row is None:
+            return None
+
+        return self._row(row)
+
+    def update(self, vehicle_position: VehiclePosition) -> None:
+        row: int|None = self._index.get(vehicle_position.vehicle.id)
+        if row is None:
+            self._index[vehicle_position.vehicle.id] = len(self._vehicles)
+
+            self._vehicles.append(vehicle_position.vehicle)
+            self.latitudes.append(vehicle_position.latitude)
+            self.longitudes.append(vehicle_position.longitude)
+            self.timestamps.append(vehicle_position.timestamp)
+        else:
+            self._vehicles[row] = vehicle_position.vehicle
+            self.latitudes[row] = vehicle_position.latitude
+            self.longitudes[row] = vehicle_position.longitude
+            self.timestamps[row] = vehicle_position.timestamp
+
+    def remove(self, vehicle_id: any) -> None:
+        row: int|None = self._index.pop(vehicle_id, None)
+        if row is None:
+            return
+
+        # the last row is moved into the gap, so the columns stay dense
+        last_row: int = len(self._vehicles) - 1
+        if row != last_row:
+            self._vehicles[row] = self._vehicles[last_row]
+            self.latitudes[row] = self.latitudes[last_row]
+            self.longitudes[row] = self.longitudes[last_row]
+            self.timestamps[row] = self.timestamps[last_row]
+
+            self._index[self._vehicles[row].id] = row
+
+        self._vehicles.pop()
+        self.latitudes.pop()
+        self.longitudes.pop()
+        self.timestamps.pop()
+
+    def changed(self, vehicle_positions: list[VehiclePosition]) -> list[bool]:
+        # compare the whole batch column by column against the rows of the vehicles,
+        # unknown vehicles are marked by row -1 and always changed
+        index: dict[any, int] = self._index
+        rows: list[int] = [index.get(p.vehicle.id, -1) for p in vehicle_positions]
+
+        timestamps: array = self.timestamps
+        latitudes: array = self.latitudes
+        longitudes: array = self.longitudes
+
+        return [
+            r < 0 or timestamps[r] != p.timestamp or latitudes[r] != p.latitude or longitudes[r] != p.longitude
+            for r, p in zip(rows, vehicle_positions)
+        ]
+
+    def older_than(self, timestamp: int) -> list[Vehicle]:
+        return [self._vehicles[row] for row, t in enumerate(self.timestamps) if t < timestamp]
+
+    def _row(self, row: int) -> VehiclePosition:
+        return VehiclePosition(
+            vehicle=self._vehicles[row],
+            latitude=self.latitudes[row],
+            longitude=self.longitudes[row],
+            timestamp=self.timestamps[row]
+        )
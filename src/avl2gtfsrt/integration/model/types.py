@@ -1,6 +1,6 @@
 from dataclasses import dataclass, field
 
-@dataclass
+@dataclass(slots=True)
 class Vehicle:
     id: any
     vehicle_ref: str
@@ -12,15 +12,22 @@ class Vehicle:
         else:
             return False
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class VehiclePosition:
     vehicle: Vehicle
     latitude: float
     longitude: float
     timestamp: int
 
+    # derived from the recent positions of the vehicle, if known
+    bearing: float|None = None
+    velocity: float|None = None
+
     def __eq__(self, value):
         if isinstance(value, VehiclePosition):
             return self.vehicle == value.vehicle and self.timestamp == value.timestamp
         else:
-            return False
\ No newline at end of file
+            return False
+
+    def __hash__(self):
+        return hash((self.vehicle.id, self.timestamp))
@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import random
+import time
+import zlib
+
+from dataclasses import dataclass, field
+from threading import Event, Lock
+
+
+@dataclass
+class Schedule:
+    interval: float
+    deadline: float
+    lag: float = 0.0
+    skipped: int = 0
+    cancelled: bool = False
+    triggered: bool = False
+    wakeup: Event = field(default_factory=Event)
+    async_wakeup: asyncio.Event|None = None
+    loop: asyncio.AbstractEventLoop|None = None
+
+class Scheduler:
+
+    def __init__(self, config: dict) -> None:
+        self.spread: bool = config['spread']
+        self.jitter: float = config['jitter']
+
+        self._schedules: dict[str, Schedule] = dict()
+        self._lock: Lock = Lock()
+
+    def register(self, instance_id: str, interval: float, phase: float|None = None) -> None:
+        # instances without explicit phase are spread over their interval
+        # by their ID, so they don't hit the provider APIs at the same moment
+        if phase is None:
+            phase = (zlib.crc32(instance_id.encode('utf-8')) % 1000) / 1000 * interval if self.spread else 0.0
+
+        with self._lock:
+            self._schedules[instance_id] = Schedule(
+                interval=interval,
+                deadline=time.monotonic() + phase - interval
+            )
+
+    def unregister(self, instance_id: str) -> None:
+        self.cancel(instance_id)
+
+        with self._lock:
+            self._schedules.pop(instance_id, None)
+
+    def cancel(self, instance_id: str) -> None:
+        # wake up a waiting instance immediately
+        schedule: Schedule|None = self._schedules.get(instance_id)
+        if schedule is not None:
+            schedule.cancelled = True
+            self._wakeup(schedule)
+
+    def trigger(self, instance_id: str) -> None:
+        # start the next poll of an instance immediately, e.g. when data were pushed,
+        # triggers arriving while the instance is polling are coalesced into one
+        schedule: Schedule|None = self._schedules.get(instance_id)
+        if schedule is not None and not schedule.cancelled:
+            schedule.triggered = True
+            self._wakeup(schedule)
+
+    def lag(self, instance_id: str) -> float:
+        schedule: Schedule|None = self._schedules.get(instance_id)
+        return schedule.lag if schedule is not None else 0.0
+    
+    def lags(self) -> dict[str, float]:
+        with self._lock:
+            return {instance_id: s.lag for instance_id, s in self._schedules.items()}
+
+    def wait(self, instance_id: str) -> bool:
+        schedule: Schedule = self._schedules[instance_id]
+        due: float = time.monotonic() + self._next_delay(instance_id, schedule)
+
+        # wakeups without pending trigger or cancel are spurious, e.g. by a trigger covered by the last poll already,
+        # the instance keeps waiting for its deadline then
+        while True:
+            delay: float = due - time.monotonic()
+            if delay <= 0 or not schedule.wakeup.wait(delay):
+                return self._fire(instance_id, schedule)
+
+            if self._consume_wakeup(schedule):
+                return self._fire_triggered(instance_id, schedule)
+
+    async def wait_async(self, instance_id: str) -> bool:
+        schedule: Schedule = self._schedules[instance_id]
+        if schedule.async_wakeup is None:
+            schedule.async_wakeup = asyncio.Event()
+            schedule.loop = asyncio.get_running_loop()
+
+            # wake up for cancels and triggers arrived before
+            if schedule.wakeup.is_set():
+                schedule.async_wakeup.set()
+
+        due: float = time.monotonic() + self._next_delay(instance_id, schedule)
+        
+        while True:
+            delay: float = due - time.monotonic()
+            if delay <= 0:
+                return self._fire(instance_id, schedule)
+
+            try:
+                await asyncio.wait_for(schedule.async_wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                return self._fire(instance_id, schedule)
+
+            if self._consume_wakeup(schedule):
+                return self._fire_triggered(instance_id, schedule)
+
+    def _next_delay(self, instance_id: str, schedule: Schedule) -> float:
+        # deadlines are on a fixed grid, poll durations don't add up to the interval
+        now: float = time.monotonic()
+        deadline: float = schedule.deadline + schedule.interval
+
+        # coalesce all ticks missed by an overrunning poll into one
+        if deadline < now:
+            missed: int = int((now - deadline) // schedule.interval)
+            if missed > 0:
+                logging.warning(f"{instance_id}/{self.__class__.__name__}: Poll overran its interval, skipping {missed} tick(s).")
+
+                schedule.skipped = schedule.skipped + missed
+                deadline = deadline + missed * schedule.interval
+
+        schedule.deadline = deadline
+
+        jitter: float = random.uniform(0, self.jitter) if self.jitter > 0 else 0.0
+
+        return deadline + jitter - now
+    
+    def _wakeup(self, schedule: Schedule) -> None:
+        schedule.wakeup.set()
+
+        # asyncio events are not thread-safe, they're set within their own loop
+        if schedule.async_wakeup is not None and schedule.loop is not None:
+            schedule.loop.call_soon_threadsafe(schedule.async_wakeup.set)
+
+    def _consume_wakeup(self, schedule: Schedule) -> bool:
+        # the events are cleared before checking the flags,
+        # so triggers arriving meanwhile wake up the next wait again
+        schedule.wakeup.clear()
+        if schedule.async_wakeup is not None:
+            schedule.async_wakeup.clear()
+
+        return schedule.cancelled or schedule.triggered
+
+    def _clear_trigger(self, schedule: Schedule) -> None:
+        schedule.triggered = False
+        schedule.wakeup.clear()
+        if schedule.async_wakeup is not None:
+            schedule.async_wakeup.clear()
+
+    def _fire_triggered(self, instance_id: str, schedule: Schedule) -> bool:
+        # only cancelled schedules stop the instance
+        if schedule.cancelled:
+            return False
+        
+        self._clear_trigger(schedule)
+
+        # the pending deadline is kept for the next wait,
+        # triggered polls don't shift the grid of the instance
+        schedule.deadline = schedule.deadline - schedule.interval
+        schedule.lag = 0.0
+
+        logging.debug(f"{instance_id}/{self.__class__.__name__}: Poll triggered.")
+
+        return True
+    
+    def _fire(self, instance_id: str, schedule: Schedule) -> bool:
+        if schedule.cancelled:
+            return False
+        
+        # pending triggers are covered by this poll
+        self._clear_trigger(schedule)
+
+        schedule.lag = max(0.0, time.monotonic() - schedule.deadline)
+        logging.debug(f"{instance_id}/{self.__class__.__name__}: Poll started with lag of {schedule.lag:.3f}s.")
+
+        return True
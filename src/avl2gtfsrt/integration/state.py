@@ -0,0 +1,61 @@
+import json
+import logging
+import sqlite3
+import time
+
+from threading import Lock
+
+
+class StateStore:
+
+    def __init__(self, config: dict) -> None:
+        self.path: str = config['path']
+        self.interval: float = config['interval']
+        self.max_age: float = config['max_age']
+
+        # one connection shared by all instances, writes are serialized by the lock
+        self._lock: Lock = Lock()
+        self._connection: sqlite3.Connection = sqlite3.connect(self.path, check_same_thread=False)
+
+        with self._lock:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS instance_state (instance_id TEXT PRIMARY KEY, state TEXT NOT NULL, updated REAL NOT NULL)')
+            self._connection.commit()
+
+    def load(self, instance_id: str) -> dict|None:
+        with self._lock:
+            row: tuple|None = self._connection.execute('SELECT state, updated FROM instance_state WHERE instance_id = ?', (instance_id,)).fetchone()
+
+        if row is None:
+            return None
+
+        # outdated snapshots are ignored, the instance starts from scratch then
+        state, updated = row
+        if self.max_age > 0 and time.time() - updated > self.max_age:
+            logging.info(f"{instance_id}/{self.__class__.__name__}: State snapshot is older than {self.max_age}s, ignoring it.")
+            return None
+
+        try:
+            return json.loads(state)
+        except ValueError as ex:
+            logging.error(f"{instance_id}/{self.__class__.__name__}: Failed to load state snapshot: {ex}")
+            return None
+
+    def save(self, instance_id: str, state: dict) -> None:
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO instance_state (instance_id, state, updated) VALUES (?, ?, ?)',
+                (instance_id, json.dumps(state), time.time())
+            )
+
+            self._connection.commit()
+
+    def delete(self, instance_id: str) -> None:
+        with self._lock:
+            self._connection.execute('DELETE FROM instance_state WHERE instance_id = ?', (instance_id,))
+            self._connection.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,337 @@
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import time
+
+from threading import Event, Thread
+
+from avl2gtfsrt.integration.config import Configuration
+from avl2gtfsrt.integration.instancemanager import RELOAD_KEYS, InstanceManager
+from avl2gtfsrt.integration.metrics import REGISTRY, WORKER_RESTARTS, WORKER_UP, MetricsRegistry, MetricsServer
+
+
+class Worker:
+
+    def __init__(self, index: int) -> None:
+        self.index: int = index
+        self.name: str = f"worker-{index}"
+        self.instances: list[dict] = list()
+
+        self.process: multiprocessing.Process|None = None
+        self.control: multiprocessing.Queue|None = None
+        self.started: float = 0.0
+        self.reported: float = 0.0
+        self.restart_at: float|None = None
+        self.restart_delay: float = 0.0
+
+        # last health report per instance ID
+        self.health: dict[str, dict] = dict()
+
+class WorkerMetricsRegistry(MetricsRegistry):
+
+    def __init__(self, registry: MetricsRegistry) -> None:
+        super().__init__()
+
+        self._registry: MetricsRegistry = registry
+
+        # last metrics reported by each worker
+        self._workers: dict[int, list[tuple[str, str, str, list[str]]]] = dict()
+
+    def update(self, worker_index: int, metrics: list[tuple[str, str, str, list[str]]]) -> None:
+        with self._lock:
+            self._workers[worker_index] = metrics
+
+    def remove(self, worker_index: int) -> None:
+        with self._lock:
+            self._workers.pop(worker_index, None)
+
+    def collect(self) -> list[tuple[str, str, str, list[str]]]:
+        # samples of all workers are merged into one family per metric,
+        # they don't collide as they're labelled by their instance
+        with self._lock:
+            workers: list[list[tuple[str, str, str, list[str]]]] = list(self._workers.values())
+
+        families: dict[str, tuple[str, str, str, list[str]]] = dict()
+        for name, documentation, metric_type, samples in self._registry.collect() + [m for w in workers for m in w]:
+            family: tuple[str, str, str, list[str]] = families.setdefault(name, (name, documentation, metric_type, list()))
+            family[3].extend(samples)
+
+        return list(families.values())
+
+class Supervisor:
+
+    def __init__(self, config_filename: str, config: dict|None = None) -> None:
+        self._config_filename: str = config_filename
+
+        if config is None:
+            logging.info(f"{self.__class__.__name__}: Loading configuration file ...")
+            config = Configuration.load(config_filename)
+
+        self._config: dict = Configuration.default_config(config)
+
+        # spawned workers start with a fresh interpreter,
+        # nothing of the supervisors threads is inherited this way
+        self._context: multiprocessing.context.SpawnContext = multiprocessing.get_context('spawn')
+        self._health: multiprocessing.Queue = self._context.Queue()
+
+        count: int = self._config['workers']['count']
+        if count == 'auto':
+            count = os.cpu_count() or 1
+
+        count = max(1, min(count, len(self._config['instances'])))
+
+        self._workers: list[Worker] = [Worker(index) for index in range(count)]
+        self._assign(self._config['instances'])
+
+        # metrics are collected from the workers and served by the supervisor, if enabled
+        self._metrics_registry: WorkerMetricsRegistry = WorkerMetricsRegistry(REGISTRY)
+        self._metrics: MetricsServer|None = MetricsServer(self._config['metrics']['endpoint'], self._metrics_registry) if self._config['metrics']['endpoint'] is not None else None
+
+        # keep track of stopping flag
+        self._should_run = Event()
+        self._should_run.set()
+
+        # reloads are requested by SIGHUP or modifications of the config file
+        self._should_reload = Event()
+        self._config_mtime: float|None = self._get_config_mtime()
+
+    def run(self) -> None:
+        # register signal handlers for graceful shutdown
+        signal.signal(signal.SIGINT, self._signal_handler)
+        signal.signal(signal.SIGTERM, self._signal_handler)
+        signal.signal(signal.SIGHUP, self._reload_handler)
+
+        if self._metrics is not None:
+            self._metrics.start()
+
+        for worker in self._workers:
+            self._start_worker(worker)
+
+        try:
+            while self._should_run.is_set():
+                self._collect_health(1.0)
+                self._supervise()
+                self._check_reload()
+        except KeyboardInterrupt:
+            pass
+
+        self.stop()
+
+        if self._metrics is not None:
+            self._metrics.stop()
+
+    def stop(self) -> None:
+        # forward SIGTERM to all workers at once, each of them
+        # shuts down its instances within the shutdown timeout
+        for worker in self._workers:
+            if worker.process is not None and worker.process.is_alive():
+                logging.info(f"{self.__class__.__name__}: Shutting down {worker.name} ...")
+                worker.process.terminate()
+
+        # workers get some extra time for starting up their shutdown and exiting
+        shutdown_timeout: float = self._config['shutdown_timeout'] + 5
+        shutdown_deadline: float = time.monotonic() + shutdown_timeout
+
+        for worker in self._workers:
+            if worker.process is None:
+                continue
+
+            worker.process.join(max(0.0, shutdown_deadline - time.monotonic()))
+            if worker.process.is_alive():
+                logging.warning(f"{self.__class__.__name__}: {worker.name} did not shut down within {shutdown_timeout}s, killing it.")
+                worker.process.kill()
+                worker.process.join()
+
+            WORKER_UP.labels(worker.name).set(0)
+
+    def _assign(self, instances: list[dict]) -> None:
+        # heaviest instances first, each to the worker with the lowest weight so far
+        weights: list[float] = [sum(i['weight'] for i in w.instances) for w in self._workers]
+
+        for instance in sorted(instances, key=lambda i: i['weight'], reverse=True):
+            index: int = weights.index(min(weights))
+
+            self._workers[index].instances.append(instance)
+            weights[index] = weights[index] + instance['weight']
+
+            logging.info(f"{self.__class__.__name__}: Assigned instance \"{instance['id']}\" to {self._workers[index].name}.")
+
+    def _worker_config(self, worker: Worker) -> dict:
+        # workers serve no metrics on their own, they're reported to the supervisor instead
+        return dict(self._config, instances=worker.instances, metrics={'endpoint': None})
+
+    def _start_worker(self, worker: Worker) -> None:
+        worker.control = self._context.Queue()
+        worker.process = self._context.Process(
+            target=_run_worker,
+            args=(worker.index, self._worker_config(worker), self._health, worker.control, self._config['workers']['health_interval'], self._metrics is not None, logging.getLogger().level),
+            name=worker.name
+        )
+
+        worker.process.start()
+
+        worker.started = time.monotonic()
+        worker.reported = worker.started
+        worker.restart_at = None
+        worker.health = dict()
+
+        WORKER_UP.labels(worker.name).set(1)
+
+        logging.info(f"{self.__class__.__name__}: Started {worker.name} with PID {worker.process.pid}.")
+
+    def _supervise(self) -> None:
+        now: float = time.monotonic()
+        health_timeout: float = self._config['workers']['health_timeout']
+
+        for worker in self._workers:
+            if worker.process.is_alive():
+                # a hanging worker would not react to SIGTERM either
+                if health_timeout > 0 and now - worker.reported > health_timeout:
+                    logging.error(f"{self.__class__.__name__}: {worker.name} did not report its health within {health_timeout}s, killing it.")
+                    worker.process.kill()
+
+                continue
+
+            if not self._should_run.is_set():
+                return
+
+            if worker.restart_at is None:
+                # workers crashing again right after their start are restarted with an increasing delay
+                restart_delay: float = self._config['workers']['restart_delay']
+                if now - worker.started < 60:
+                    worker.restart_delay = min(max(worker.restart_delay * 2, restart_delay), 60)
+                else:
+                    worker.restart_delay = restart_delay
+
+                logging.error(f"{self.__class__.__name__}: {worker.name} exited with code {worker.process.exitcode}, restarting it in {worker.restart_delay}s ...")
+
+                worker.restart_at = now + worker.restart_delay
+
+                WORKER_UP.labels(worker.name).set(0)
+                self._metrics_registry.remove(worker.index)
+
+            elif now >= worker.restart_at:
+                WORKER_RESTARTS.labels(worker.name).inc()
+                self._start_worker(worker)
+
+    def _check_reload(self) -> None:
+        if self._config['reload']['watch']:
+            config_mtime: float|None = self._get_config_mtime()
+            if config_mtime != self._config_mtime:
+                self._config_mtime = config_mtime
+                self._should_reload.set()
+
+        if not self._should_reload.is_set():
+            return
+
+        self._should_reload.clear()
+
+        logging.info(f"{self.__class__.__name__}: Reloading configuration file ...")
+        try:
+            config: dict = Configuration.load(self._config_filename)
+        except Exception as ex:
+            logging.error(f"{self.__class__.__name__}: Failed to reload configuration, keeping the current one: {ex}")
+            return
+
+        ignored_keys: set[str] = Configuration.changed_keys(self._config, config) - RELOAD_KEYS
+        if len(ignored_keys) > 0:
+            logging.warning(f"{self.__class__.__name__}: Changes of {sorted(ignored_keys)} require a restart and are ignored.")
+
+        self._config = dict(self._config, **{k: config[k] for k in RELOAD_KEYS})
+
+        # instances stay in their worker, new instances are assigned to the workers with the lowest weight,
+        # each worker diffs its instances on its own then
+        actual_configs: dict[str, dict] = {i['id']: i for i in self._config['instances']}
+        current_instances: dict[Worker, list[dict]] = {w: w.instances for w in self._workers}
+
+        for worker in self._workers:
+            worker.instances = [actual_configs[i['id']] for i in worker.instances if i['id'] in actual_configs]
+
+        assigned_instance_ids: set[str] = {i['id'] for w in self._workers for i in w.instances}
+        self._assign([i for i in self._config['instances'] if i['id'] not in assigned_instance_ids])
+
+        for worker in self._workers:
+            if worker.instances != current_instances[worker] and worker.process is not None and worker.process.is_alive():
+                worker.control.put(self._worker_config(worker))
+
+    def _collect_health(self, timeout: float) -> None:
+        try:
+            report: dict = self._health.get(timeout=timeout)
+        except queue.Empty:
+            return
+
+        while True:
+            self._apply_health(report)
+
+            try:
+                report = self._health.get_nowait()
+            except queue.Empty:
+                return
+
+    def _apply_health(self, report: dict) -> None:
+        worker: Worker = self._workers[report['worker']]
+
+        # reports of a previous process of this worker are outdated
+        if worker.process is None or worker.process.pid != report['pid']:
+            return
+
+        # instances are reported as not alive until they're started,
+        # so only instances stopping afterwards are of interest
+        for instance_id, health in report['instances'].items():
+            was_alive: bool = worker.health.get(instance_id, {}).get('alive', False)
+            if was_alive and not health['alive']:
+                logging.error(f"{self.__class__.__name__}: Instance \"{instance_id}\" in {worker.name} is not running anymore.")
+
+        worker.health = report['instances']
+        worker.reported = time.monotonic()
+
+        if report['metrics'] is not None:
+            self._metrics_registry.update(worker.index, report['metrics'])
+
+    def _get_config_mtime(self) -> float|None:
+        try:
+            return os.stat(self._config_filename).st_mtime
+        except OSError:
+            return None
+
+    def _signal_handler(self, signum, frame):
+        logging.info(f'{self.__class__.__name__}: Received signal {signum}')
+        self._should_run.clear()
+
+    def _reload_handler(self, signum, frame):
+        logging.info(f'{self.__class__.__name__}: Received signal {signum}')
+        self._should_reload.set()
+
+def _run_worker(index: int, config: dict, health: multiprocessing.Queue, control: multiprocessing.Queue, health_interval: float, report_metrics: bool, log_level: int) -> None:
+    logging.basicConfig(format=f"[%(levelname)s] %(asctime)s worker-{index}: %(message)s", level=log_level)
+
+    # the worker must not block on exit for reports the supervisor did not receive anymore
+    health.cancel_join_thread()
+
+    # the worker knows only its own instances, so it never loads the config file itself
+    manager: InstanceManager = InstanceManager(None, config)
+
+    reporter: Thread = Thread(target=_report_health, args=(index, manager, health, health_interval, report_metrics), daemon=True)
+    reporter.start()
+
+    receiver: Thread = Thread(target=_receive_config, args=(manager, control), daemon=True)
+    receiver.start()
+
+    manager.run()
+
+def _receive_config(manager: InstanceManager, control: multiprocessing.Queue) -> None:
+    while True:
+        manager.reload(control.get())
+
+def _report_health(index: int, manager: InstanceManager, health: multiprocessing.Queue, health_interval: float, report_metrics: bool) -> None:
+    while True:
+        health.put({
+            'worker': index,
+            'pid': os.getpid(),
+            'instances': manager.health(),
+            'metrics': REGISTRY.collect() if report_metrics else None
+        })
+
+        time.sleep(health_interval)
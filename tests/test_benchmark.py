@@ -0,0 +1,50 @@
+import pytest
+
+from avl2gtfsrt.integration.benchmark.runner import BenchmarkResult, BenchmarkThresholds
+
+
+def create_result(throughput: float = 100.0, latency_p95: float = 0.02, memory_per_vehicle: float|None = 2048.0) -> BenchmarkResult:
+    return BenchmarkResult(
+        vehicles=100,
+        duration=10.0,
+        published=1000,
+        throughput=throughput,
+        latency_p50=0.01,
+        latency_p95=latency_p95,
+        latency_p99=0.03,
+        latency_max=0.04,
+        poll_cycles=10,
+        poll_cycle_mean=0.05,
+        poll_cycle_p95=0.1,
+        log_on_requests=100,
+        provider_requests=10,
+        provider_bytes=10240,
+        memory_total=204800 if memory_per_vehicle is not None else None,
+        memory_per_vehicle=memory_per_vehicle
+    )
+
+def test_no_thresholds_pass() -> None:
+    assert BenchmarkThresholds().check(create_result()) == []
+
+def test_thresholds_detect_regressions() -> None:
+    thresholds: BenchmarkThresholds = BenchmarkThresholds(min_throughput=90.0, max_latency_p95=0.025, max_memory_per_vehicle=3072.0)
+
+    assert thresholds.check(create_result()) == []
+    assert len(thresholds.check(create_result(throughput=80.0))) == 1
+    assert len(thresholds.check(create_result(latency_p95=0.03))) == 1
+    assert len(thresholds.check(create_result(throughput=80.0, latency_p95=0.03, memory_per_vehicle=4096.0))) == 3
+
+def test_unmeasured_memory_is_not_checked() -> None:
+    thresholds: BenchmarkThresholds = BenchmarkThresholds(max_memory_per_vehicle=1024.0)
+
+    assert thresholds.check(create_result(memory_per_vehicle=None)) == []
+
+def test_thresholds_from_baseline() -> None:
+    thresholds: BenchmarkThresholds = BenchmarkThresholds.from_baseline(create_result(), 0.2)
+
+    assert thresholds.min_throughput == pytest.approx(80.0)
+    assert thresholds.max_latency_p95 == pytest.approx(0.024)
+    assert thresholds.max_memory_per_vehicle == pytest.approx(2457.6)
+
+    assert thresholds.check(create_result(throughput=85.0, latency_p95=0.022)) == []
+    assert len(thresholds.check(create_result(throughput=75.0))) == 1
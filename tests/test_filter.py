@@ -0,0 +1,80 @@
+import pytest
+
+from avl2gtfsrt.integration import filter as filter_module
+from avl2gtfsrt.integration.filter import PositionFilter
+from avl2gtfsrt.integration.model.types import VehiclePosition, Vehicle
+
+
+class Clock:
+
+    def __init__(self) -> None:
+        self.now: float = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock: Clock = Clock()
+    monkeypatch.setattr(filter_module.time, 'monotonic', clock)
+
+    return clock
+
+def create_position(timestamp: int, latitude: float = 48.0, longitude: float = 11.0) -> VehiclePosition:
+    return VehiclePosition(vehicle=Vehicle(id=1, vehicle_ref='1'), latitude=latitude, longitude=longitude, timestamp=timestamp)
+
+def test_first_position_is_published(clock: Clock) -> None:
+    position_filter: PositionFilter = PositionFilter({'distance': 10, 'min_interval': 30, 'max_silence': 0})
+
+    assert position_filter.should_publish(create_position(100))
+
+def test_distance_drops_jitter(clock: Clock) -> None:
+    position_filter: PositionFilter = PositionFilter({'distance': 10, 'min_interval': 0, 'max_silence': 0})
+    position_filter.mark_published(create_position(100))
+
+    # ~1m and ~111m north of the published position
+    assert not position_filter.should_publish(create_position(110, latitude=48.00001))
+    assert position_filter.should_publish(create_position(110, latitude=48.001))
+
+def test_min_interval_holds_back_moving_vehicle(clock: Clock) -> None:
+    position_filter: PositionFilter = PositionFilter({'distance': 0, 'min_interval': 30, 'max_silence': 0})
+    position_filter.mark_published(create_position(100))
+
+    assert not position_filter.should_publish(create_position(120, latitude=48.001))
+    assert position_filter.should_publish(create_position(130, latitude=48.001))
+
+def test_max_silence_publishes_standing_vehicle(clock: Clock) -> None:
+    position_filter: PositionFilter = PositionFilter({'distance': 10, 'min_interval': 0, 'max_silence': 60})
+    position_filter.mark_published(create_position(100))
+
+    clock.now = clock.now + 59
+    assert not position_filter.should_publish(create_position(159))
+
+    clock.now = clock.now + 1
+    assert position_filter.should_publish(create_position(160))
+
+def test_max_silence_overrides_min_interval(clock: Clock) -> None:
+    # providers repeat the last fix of a standing vehicle, its measurement time doesn't advance,
+    # so it's always within the min. interval, but must be published as heartbeat anyway
+    position_filter: PositionFilter = PositionFilter({'distance': 10, 'min_interval': 30, 'max_silence': 60})
+    position_filter.mark_published(create_position(100))
+
+    clock.now = clock.now + 59
+    assert not position_filter.should_publish(create_position(100))
+
+    clock.now = clock.now + 1
+    assert position_filter.should_publish(create_position(100))
+
+def test_min_interval_applies_between_heartbeats(clock: Clock) -> None:
+    position_filter: PositionFilter = PositionFilter({'distance': 10, 'min_interval': 30, 'max_silence': 60})
+    position_filter.mark_published(create_position(100))
+
+    clock.now = clock.now + 10
+    assert not position_filter.should_publish(create_position(110, latitude=48.001))
+
+def test_forget_publishes_again(clock: Clock) -> None:
+    position_filter: PositionFilter = PositionFilter({'distance': 10, 'min_interval': 30, 'max_silence': 0})
+    position_filter.mark_published(create_position(100))
+    position_filter.forget(1)
+
+    assert position_filter.should_publish(create_position(100))
@@ -0,0 +1,244 @@
+import asyncio
+import json
+import pytest
+import requests
+import socket
+import time
+
+from avl2gtfsrt.integration.adapter.pushadapter import PushPosition
+from avl2gtfsrt.integration.adapter.webhook.adapter import WebhookAdapter
+from avl2gtfsrt.integration.config import Configuration
+from avl2gtfsrt.integration.model.types import VehiclePosition
+
+
+def create_adapter(port: int = 8080, password: str|None = 'secret', max_body_size: int = 1024, buffer_size: int = 100, adapter_class: type[WebhookAdapter] = WebhookAdapter) -> WebhookAdapter:
+    config: dict = Configuration.default_config({
+        'instances': [{
+            'id': 'test',
+            'adapter': {
+                'type': 'webhook',
+                'endpoint': f"http://127.0.0.1:{port}/positions",
+                'password': password,
+                'push': {
+                    'buffer_size': buffer_size,
+                    'max_body_size': max_body_size
+                }
+            },
+            'broker': {
+                'host': 'localhost'
+            },
+            'vdv435': {
+                'organisation': 'test',
+                'itcs': 1
+            }
+        }]
+    })
+
+    return adapter_class('test', config['instances'][0]['adapter'])
+
+def create_body(*positions: dict) -> bytes:
+    return json.dumps({'positions': list(positions)}).encode('utf-8')
+
+def create_position(id: int = 1, timestamp: int = 1700000000, **values) -> dict:
+    return {'id': id, 'latitude': 48.1, 'longitude': 11.5, 'timestamp': timestamp, **values}
+
+def call_app(adapter: WebhookAdapter, body: bytes|list[bytes] = b'', method: str = 'POST', path: str = '/positions', token: str|None = 'secret') -> tuple[int, dict]:
+    # the ASGI app is called directly, the request body may be split into several messages
+    chunks: list[bytes] = body if isinstance(body, list) else [body]
+    messages: list[dict] = [{'type': 'http.request', 'body': c, 'more_body': i < len(chunks) - 1} for i, c in enumerate(chunks)]
+    sent: list[dict] = list()
+
+    headers: list[tuple[bytes, bytes]] = [(b'content-type', b'application/json')]
+    if token is not None:
+        headers.append((b'authorization', f"Bearer {token}".encode('utf-8')))
+
+    async def receive() -> dict:
+        return messages.pop(0)
+
+    async def send(message: dict) -> None:
+        sent.append(message)
+
+    asyncio.run(adapter._app({'type': 'http', 'method': method, 'path': path, 'headers': headers}, receive, send))
+
+    return sent[0]['status'], json.loads(sent[1]['body'])
+
+def received_positions(adapter: WebhookAdapter) -> list[VehiclePosition]:
+    # the buffer is read without starting the ingestion server
+    with adapter._lock:
+        positions: list[VehiclePosition] = list(adapter._buffer)
+        adapter._buffer.clear()
+
+    return positions
+
+def test_accepts_valid_positions() -> None:
+    adapter: WebhookAdapter = create_adapter()
+
+    status, data = call_app(adapter, create_body(create_position(1), create_position(2, vehicle_ref='bus-2')))
+
+    assert status == 202
+    assert data == {'accepted': 2, 'duplicates': 0}
+
+    positions: list[VehiclePosition] = received_positions(adapter)
+    assert [(p.vehicle.id, p.vehicle.vehicle_ref) for p in positions] == [('1', '1'), ('2', 'bus-2')]
+    assert {v.id for v in adapter._vehicles} == {'1', '2'}
+
+@pytest.mark.parametrize('token', [None, 'wrong', 'secret2'])
+def test_rejects_missing_or_wrong_token(token: str|None) -> None:
+    adapter: WebhookAdapter = create_adapter()
+
+    status, _ = call_app(adapter, create_body(create_position()), token=token)
+
+    assert status == 401
+    assert len(received_positions(adapter)) == 0
+
+def test_accepts_any_client_without_password() -> None:
+    adapter: WebhookAdapter = create_adapter(password=None)
+
+    status, _ = call_app(adapter, create_body(create_position()), token=None)
+
+    assert status == 202
+
+def test_rejects_other_paths_and_methods() -> None:
+    adapter: WebhookAdapter = create_adapter()
+
+    assert call_app(adapter, path='/other')[0] == 404
+    assert call_app(adapter, method='GET')[0] == 405
+
+def test_rejects_body_too_large() -> None:
+    adapter: WebhookAdapter = create_adapter(max_body_size=100)
+
+    body: bytes = create_body(*[create_position(i) for i in range(10)])
+
+    assert call_app(adapter, body)[0] == 413
+    assert call_app(adapter, [body[:60], body[60:]])[0] == 413
+    assert len(received_positions(adapter)) == 0
+
+def test_accepts_body_in_several_messages() -> None:
+    adapter: WebhookAdapter = create_adapter()
+
+    body: bytes = create_body(create_position())
+
+    assert call_app(adapter, [body[:10], body[10:]]) == (202, {'accepted': 1, 'duplicates': 0})
+
+@pytest.mark.parametrize('position', [
+    create_position(latitude=91.0),
+    create_position(longitude=-181.0),
+    create_position(timestamp=-1),
+    create_position(timestamp=1700000000000),
+    {'id': 1, 'latitude': 48.1, 'longitude': 11.5}
+])
+def test_rejects_invalid_positions(position: dict) -> None:
+    adapter: WebhookAdapter = create_adapter()
+
+    status, data = call_app(adapter, create_body(create_position(2), position))
+
+    # the whole batch is rejected, so the client can fix and resend it
+    assert status == 422
+    assert data['error'] == 'Invalid positions'
+    assert len(received_positions(adapter)) == 0
+    assert adapter._high_water_marks == dict()
+
+def test_rejects_invalid_json() -> None:
+    adapter: WebhookAdapter = create_adapter()
+
+    assert call_app(adapter, b'{"positions": [')[0] == 422
+
+def test_rejects_unparsable_body() -> None:
+    class FailingAdapter(WebhookAdapter):
+
+        def parse(self, body: bytes) -> list[PushPosition]:
+            raise ValueError('Unsupported format')
+
+    adapter: WebhookAdapter = create_adapter(adapter_class=FailingAdapter)
+
+    assert call_app(adapter, b'<positions/>') == (400, {'error': 'Unsupported format'})
+
+def test_drops_duplicates_and_outdated_positions() -> None:
+    adapter: WebhookAdapter = create_adapter()
+
+    assert call_app(adapter, create_body(create_position(1, 1700000010))) == (202, {'accepted': 1, 'duplicates': 0})
+
+    # resent and older positions of the device are duplicates, other devices are independent
+    status, data = call_app(adapter, create_body(
+        create_position(1, 1700000010),
+        create_position(1, 1700000005),
+        create_position(1, 1700000020),
+        create_position(2, 1700000005)
+    ))
+
+    assert status == 202
+    assert data == {'accepted': 2, 'duplicates': 2}
+    assert adapter._high_water_marks == {'1': 1700000020, '2': 1700000005}
+
+def test_ingests_positions_in_order_of_timestamps() -> None:
+    adapter: WebhookAdapter = create_adapter()
+
+    status, data = call_app(adapter, create_body(create_position(1, 1700000020), create_position(1, 1700000010)))
+
+    # out of order positions of the same batch are sorted, not dropped as duplicates
+    assert (status, data) == (202, {'accepted': 2, 'duplicates': 0})
+    assert [p.timestamp for p in received_positions(adapter)] == [1700000010, 1700000020]
+
+def test_high_water_marks_survive_restart() -> None:
+    adapter: WebhookAdapter = create_adapter()
+    call_app(adapter, create_body(create_position(1, 1700000010)))
+
+    state: dict = json.loads(json.dumps(adapter.get_state()))
+    vehicles: list = list(adapter._vehicles)
+
+    restarted: WebhookAdapter = create_adapter()
+    restarted.set_state(state, vehicles)
+
+    assert call_app(restarted, create_body(create_position(1, 1700000010))) == (202, {'accepted': 0, 'duplicates': 1})
+    assert call_app(restarted, create_body(create_position(1, 1700000011))) == (202, {'accepted': 1, 'duplicates': 0})
+
+def test_triggers_poll_for_accepted_positions_only() -> None:
+    adapter: WebhookAdapter = create_adapter()
+
+    notifications: list[bool] = list()
+    adapter.set_notify(lambda: notifications.append(True))
+
+    call_app(adapter, create_body(create_position(1, 1700000010)))
+    assert len(notifications) == 1
+
+    call_app(adapter, create_body(create_position(1, 1700000010)))
+    assert len(notifications) == 1
+
+    call_app(adapter, create_body(create_position(latitude=100.0)))
+    assert len(notifications) == 1
+
+def test_full_buffer_drops_oldest_positions() -> None:
+    adapter: WebhookAdapter = create_adapter(buffer_size=2)
+
+    assert call_app(adapter, create_body(*[create_position(i) for i in range(3)]))[0] == 202
+    assert [p.vehicle.id for p in received_positions(adapter)] == ['1', '2']
+
+def test_ingestion_server() -> None:
+    # the adapter serves the app on its endpoint, checked with a local HTTP client
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port: int = s.getsockname()[1]
+
+    adapter: WebhookAdapter = create_adapter(port=port)
+    try:
+        adapter.init()
+
+        url: str = f"http://127.0.0.1:{port}/positions"
+        for _ in range(50):
+            try:
+                requests.get(url, timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.1)
+
+        response: requests.Response = requests.post(url, data=create_body(create_position()), headers={'Authorization': 'Bearer secret'}, timeout=5)
+        assert response.status_code == 202
+        assert response.json() == {'accepted': 1, 'duplicates': 0}
+
+        response = requests.post(url, data=create_body(create_position(2)), timeout=5)
+        assert response.status_code == 401
+
+        positions: list[VehiclePosition] = adapter.get_vehicle_positions()
+        assert [p.vehicle.id for p in positions] == ['1']
+    finally:
+        adapter.close()
@@ -0,0 +1,186 @@
+import asyncio
+import pytest
+import threading
+import time
+
+from avl2gtfsrt.integration import scheduler as scheduler_module
+from avl2gtfsrt.integration.scheduler import Scheduler
+
+
+class Clock:
+
+    def __init__(self) -> None:
+        self.now: float = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock: Clock = Clock()
+    monkeypatch.setattr(scheduler_module.time, 'monotonic', clock)
+
+    return clock
+
+def create_scheduler(spread: bool = False) -> Scheduler:
+    return Scheduler({'spread': spread, 'jitter': 0})
+
+def test_first_poll_is_due_at_phase(clock: Clock) -> None:
+    scheduler: Scheduler = create_scheduler()
+    scheduler.register('a', 10, phase=3)
+
+    assert scheduler._next_delay('a', scheduler._schedules['a']) == pytest.approx(3)
+
+def test_spread_phase_is_stable_and_within_interval(clock: Clock) -> None:
+    scheduler: Scheduler = create_scheduler(spread=True)
+    scheduler.register('a', 10)
+    scheduler.register('b', 10)
+
+    delays: list[float] = [scheduler._next_delay(i, scheduler._schedules[i]) for i in ['a', 'b']]
+
+    assert all(0 <= d < 10 for d in delays)
+    assert delays[0] != delays[1]
+
+def test_deadlines_are_on_fixed_grid(clock: Clock) -> None:
+    scheduler: Scheduler = create_scheduler()
+    scheduler.register('a', 10, phase=0)
+
+    assert scheduler.wait('a')
+    assert scheduler.lag('a') == 0.0
+
+    # the poll duration doesn't add up to the interval
+    clock.now = clock.now + 4
+    assert scheduler._next_delay('a', scheduler._schedules['a']) == pytest.approx(6)
+
+def test_overrunning_poll_coalesces_missed_ticks(clock: Clock) -> None:
+    scheduler: Scheduler = create_scheduler()
+    scheduler.register('a', 10, phase=0)
+
+    assert scheduler.wait('a')
+
+    # the poll took 25s, the ticks at 1010 and 1020 are coalesced into an immediate poll
+    clock.now = 1025.0
+    assert scheduler.wait('a')
+
+    schedule = scheduler._schedules['a']
+    assert schedule.skipped == 1
+    assert schedule.deadline == pytest.approx(1020)
+    assert scheduler.lag('a') == pytest.approx(5)
+
+    # the grid continues at 1030
+    assert scheduler._next_delay('a', schedule) == pytest.approx(5)
+
+def test_trigger_starts_poll_without_shifting_grid(clock: Clock) -> None:
+    scheduler: Scheduler = create_scheduler()
+    scheduler.register('a', 10, phase=0)
+
+    assert scheduler.wait('a')
+
+    clock.now = clock.now + 2
+    scheduler.trigger('a')
+
+    assert scheduler.wait('a')
+    assert not scheduler._schedules['a'].triggered
+    assert not scheduler._schedules['a'].wakeup.is_set()
+
+    # the next regular poll is still due at 1010
+    assert scheduler._next_delay('a', scheduler._schedules['a']) == pytest.approx(8)
+
+def test_triggers_are_coalesced_into_one_poll(clock: Clock) -> None:
+    scheduler: Scheduler = create_scheduler()
+    scheduler.register('a', 10, phase=0)
+
+    scheduler.trigger('a')
+    scheduler.trigger('a')
+
+    # the due poll covers both triggers
+    assert scheduler.wait('a')
+    assert not scheduler._schedules['a'].triggered
+
+def test_cancel_stops_waiting_instance() -> None:
+    scheduler: Scheduler = create_scheduler()
+    scheduler.register('a', 60, phase=0)
+
+    assert scheduler.wait('a')
+
+    threading.Timer(0.05, scheduler.cancel, ('a',)).start()
+
+    start: float = time.monotonic()
+    assert not scheduler.wait('a')
+    assert time.monotonic() - start < 5
+
+def test_trigger_after_cancel_is_ignored(clock: Clock) -> None:
+    scheduler: Scheduler = create_scheduler()
+    scheduler.register('a', 10, phase=0)
+
+    scheduler.cancel('a')
+    scheduler.trigger('a')
+
+    assert not scheduler._schedules['a'].triggered
+    assert not scheduler.wait('a')
+
+def test_spurious_wakeup_keeps_waiting() -> None:
+    scheduler: Scheduler = create_scheduler()
+    scheduler.register('a', 0.2, phase=0)
+
+    assert scheduler.wait('a')
+
+    # wakeup without pending trigger, e.g. by a trigger covered by the last poll already
+    scheduler._schedules['a'].wakeup.set()
+
+    start: float = time.monotonic()
+    assert scheduler.wait('a')
+    assert time.monotonic() - start >= 0.15
+
+def test_spurious_async_wakeup_keeps_waiting() -> None:
+    scheduler: Scheduler = create_scheduler()
+    scheduler.register('a', 0.2, phase=0)
+
+    async def run() -> tuple[bool, float]:
+        assert await scheduler.wait_async('a')
+
+        # the callback of a trigger from another thread runs after the trigger was cleared by a poll
+        schedule = scheduler._schedules['a']
+        asyncio.get_running_loop().call_soon(schedule.async_wakeup.set)
+
+        start: float = time.monotonic()
+        result: bool = await scheduler.wait_async('a')
+
+        return result, time.monotonic() - start
+
+    result, duration = asyncio.run(run())
+
+    assert result
+    assert duration >= 0.15
+
+def test_async_trigger_from_other_thread() -> None:
+    scheduler: Scheduler = create_scheduler()
+    scheduler.register('a', 60, phase=0)
+
+    async def run() -> tuple[bool, float]:
+        assert await scheduler.wait_async('a')
+
+        threading.Timer(0.05, scheduler.trigger, ('a',)).start()
+
+        start: float = time.monotonic()
+        result: bool = await scheduler.wait_async('a')
+
+        return result, time.monotonic() - start
+
+    result, duration = asyncio.run(run())
+
+    assert result
+    assert duration < 5
+
+def test_async_cancel_stops_waiting_instance() -> None:
+    scheduler: Scheduler = create_scheduler()
+    scheduler.register('a', 60, phase=0)
+
+    async def run() -> bool:
+        assert await scheduler.wait_async('a')
+
+        threading.Timer(0.05, scheduler.cancel, ('a',)).start()
+
+        return await scheduler.wait_async('a')
+
+    assert not asyncio.run(run())